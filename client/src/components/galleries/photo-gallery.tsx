@@ -1,5 +1,5 @@
-import { useState, useEffect } from "react";
-import { useQuery, useMutation, useQueryClient } from "@tanstack/react-query";
+import { useState, useEffect, useRef } from "react";
+import { useQuery, useInfiniteQuery, useMutation, useQueryClient } from "@tanstack/react-query";
 import { toast } from "sonner";
 import { Heart, Loader2, ExternalLink, Download } from "lucide-react";
 import { cn } from "@/lib/utils";
@@ -20,6 +20,11 @@ interface Photo {
   updated_at: string;
 }
 
+interface PhotoPage {
+  photos: Photo[];
+  next_cursor: string | null;
+}
+
 interface PhotoGalleryProps {
   galleryId: number;
   clientView?: boolean;
@@ -31,20 +36,50 @@ export function PhotoGallery({ galleryId, clientView = false }: PhotoGalleryProp
   const { user } = useAuth();
   const queryClient = useQueryClient();
 
-  // Fetch photos for the gallery
-  const { data: photos, isLoading, error } = useQuery({
+  const loadMoreRef = useRef<HTMLDivElement>(null);
+
+  // Fetch photos for the gallery a page at a time
+  const {
+    data,
+    isLoading,
+    error,
+    fetchNextPage,
+    hasNextPage,
+    isFetchingNextPage,
+  } = useInfiniteQuery({
     queryKey: ["gallery-photos", galleryId],
-    queryFn: async () => {
+    queryFn: async ({ pageParam }) => {
       try {
-        const response = await apiRequest("GET", `/api/photos/gallery/${galleryId}`);
+        const params = pageParam ? `?cursor=${encodeURIComponent(pageParam)}` : "";
+        const response = await apiRequest("GET", `/api/photos/gallery/${galleryId}${params}`);
         const data = await response.json();
-        return data as Photo[];
+        return data as PhotoPage;
       } catch (error) {
         console.error("Error fetching photos:", error);
         throw error;
       }
     },
+    initialPageParam: null as string | null,
+    getNextPageParam: (lastPage) => lastPage.next_cursor,
   });
+  const photos = data?.pages.flatMap((page) => page.photos);
+
+  // Load the next page when the end of the grid scrolls into view
+  useEffect(() => {
+    const sentinel = loadMoreRef.current;
+    if (!sentinel || !hasNextPage) return;
+
+    const observer = new IntersectionObserver(
+      (entries) => {
+        if (entries[0].isIntersecting && !isFetchingNextPage) {
+          fetchNextPage();
+        }
+      },
+      { rootMargin: "600px" }
+    );
+    observer.observe(sentinel);
+    return () => observer.disconnect();
+  }, [hasNextPage, isFetchingNextPage, fetchNextPage]);
 
   // Fetch user's favorited photos
   const { data: userFavorites } = useQuery({
@@ -231,6 +266,12 @@ export function PhotoGallery({ galleryId, clientView = false }: PhotoGalleryProp
         ))}
       </div>
 
+      {hasNextPage && (
+        <div ref={loadMoreRef} className="flex justify-center py-6">
+          {isFetchingNextPage && <Loader2 className="h-6 w-6 animate-spin text-gray-400" />}
+        </div>
+      )}
+
       {/* Lightbox */}
       {lightboxOpen && selectedPhoto && (
         <div 
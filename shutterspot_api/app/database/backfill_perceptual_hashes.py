@@ -0,0 +1,86 @@
+"""
+One-off backfill of perceptual hashes and near-duplicate flags for photos
+synced before hashing was added.
+
+Run from the shutterspot_api directory:
+    python -m app.database.backfill_perceptual_hashes
+
+Hashes are computed from the stored grid thumbnails, so nothing is
+downloaded from Drive. The backfill is idempotent and works in batches.
+"""
+from sqlalchemy import update
+from sqlalchemy.orm import Session
+
+from app.database.database import SessionLocal
+from app.database.models import Photo
+from app.services.blob_store import BlobStore, blob_store
+from app.services.perceptual_hash import dhash, find_near_duplicates
+
+BATCH_SIZE = 500
+
+
+def backfill_hashes(db: Session, store: BlobStore = blob_store) -> int:
+    """
+    Hash every photo that has a thumbnail but no perceptual hash.
+
+    Returns:
+        Number of photos hashed
+    """
+    hashed = 0
+    last_id = 0
+    while True:
+        rows = db.query(Photo.id, Photo.thumbnail_hash).filter(
+            Photo.id > last_id,
+            Photo.thumbnail_hash != None,
+            Photo.perceptual_hash == None
+        ).order_by(Photo.id).limit(BATCH_SIZE).all()
+        if not rows:
+            return hashed
+
+        updates = []
+        for photo_id, digest in rows:
+            try:
+                updates.append({'id': photo_id, 'perceptual_hash': dhash(store.read(digest))})
+            except Exception as e:
+                print(f"Skipping photo {photo_id}: {e}")
+        if updates:
+            db.execute(update(Photo), updates)
+        db.commit()
+
+        hashed += len(updates)
+        last_id = rows[-1][0]
+
+
+def flag_duplicates(db: Session) -> int:
+    """
+    Recompute the near-duplicate flags of every gallery.
+
+    Returns:
+        Number of photos flagged as duplicates
+    """
+    flagged = 0
+    gallery_ids = [gallery_id for gallery_id, in db.query(Photo.gallery_id).filter(
+        Photo.perceptual_hash != None
+    ).distinct()]
+    for gallery_id in gallery_ids:
+        rows = db.query(Photo.id, Photo.perceptual_hash).filter(
+            Photo.gallery_id == gallery_id,
+            Photo.perceptual_hash != None
+        ).order_by(Photo.id).all()
+        duplicates = find_near_duplicates([row[0] for row in rows], [row[1] for row in rows])
+
+        db.execute(update(Photo).where(Photo.gallery_id == gallery_id).values(duplicate_of=None))
+        if duplicates:
+            db.execute(update(Photo), [
+                {'id': photo_id, 'duplicate_of': original_id}
+                for photo_id, original_id, _ in duplicates
+            ])
+        db.commit()
+        flagged += len(duplicates)
+    return flagged
+
+
+if __name__ == "__main__":
+    with SessionLocal() as db:
+        print(f"Hashed {backfill_hashes(db)} photos")
+        print(f"Flagged {flag_duplicates(db)} near-duplicates")
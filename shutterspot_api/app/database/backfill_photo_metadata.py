@@ -0,0 +1,67 @@
+"""
+One-off backfill of capture metadata for photos synced before it was stored.
+
+Run from the shutterspot_api directory:
+    python -m app.database.backfill_photo_metadata
+
+Originals are not downloaded again: the metadata comes from Drive's
+imageMediaMetadata, fetched in batch requests. The backfill is idempotent
+and works in batches.
+"""
+from sqlalchemy import update
+from sqlalchemy.orm import Session
+
+from app.database.database import SessionLocal
+from app.database.models import DriveConnection, Photo
+from app.services.drive_sync import METADATA_FIELDS, drive_image_metadata
+from app.services.google_drive import GoogleDriveService, MEDIA_METADATA_FIELD
+
+BATCH_SIZE = 500
+
+
+def backfill_metadata(db: Session, drive: GoogleDriveService) -> int:
+    """
+    Fill in capture metadata for Drive photos that have none.
+
+    Returns:
+        Number of photos updated
+    """
+    updated = 0
+    last_id = 0
+    while True:
+        rows = db.query(Photo.id, Photo.drive_file_id, DriveConnection.user_id).join(
+            DriveConnection, DriveConnection.gallery_id == Photo.gallery_id
+        ).filter(
+            Photo.id > last_id,
+            Photo.drive_file_id != None,
+            Photo.captured_at == None,
+            Photo.width == None
+        ).order_by(Photo.id).limit(BATCH_SIZE).all()
+        if not rows:
+            return updated
+
+        by_user = {}
+        for photo_id, file_id, user_id in rows:
+            by_user.setdefault(user_id, {})[file_id] = photo_id
+
+        updates = []
+        for user_id, photos in by_user.items():
+            files = drive.get_files(user_id, list(photos), fields=('id', MEDIA_METADATA_FIELD))
+            for file_id, file in files.items():
+                if isinstance(file, Exception):
+                    print(f"Skipping Drive file {file_id}: {file}")
+                    continue
+                metadata = drive_image_metadata(file)
+                if any(metadata[key] is not None for key in METADATA_FIELDS):
+                    updates.append({'id': photos[file_id], **metadata})
+        if updates:
+            db.execute(update(Photo), updates)
+        db.commit()
+
+        updated += len(updates)
+        last_id = rows[-1][0]
+
+
+if __name__ == "__main__":
+    with SessionLocal() as db:
+        print(f"Updated {backfill_metadata(db, GoogleDriveService())} photos")
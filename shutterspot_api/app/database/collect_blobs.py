@@ -0,0 +1,19 @@
+"""
+Remove blobs that no row references any more.
+
+Run from the shutterspot_api directory, e.g. hourly from cron:
+    python -m app.database.collect_blobs
+
+Releasing a thumbnail only drops its reference count; this deletes the
+blob rows and files whose count has reached zero. Blobs touched within
+the last GC_GRACE_PERIOD are kept, so it is safe to run while syncs are
+writing new thumbnails.
+"""
+from app.database.database import SessionLocal
+from app.services.blob_store import blob_store
+
+
+if __name__ == "__main__":
+    with SessionLocal() as db:
+        removed = blob_store.collect_garbage(db)
+        print(f"Removed {len(removed)} unreferenced blobs")
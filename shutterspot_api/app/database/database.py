@@ -1,13 +1,163 @@
-from sqlalchemy import create_engine
+"""
+Database engines and sessions.
+Engines come from ``create_db_engine``: SQLite databases run in WAL mode
+with tuned pragmas so readers and the sync writers do not block each
+other, and server databases such as Postgres get a sized, pre-pinged
+connection pool. GET routes use a separate read-only engine
+(``get_read_db``), which can point at a replica via DATABASE_READ_URL.
+Routers ported to ``async def`` use the async engines behind
+``get_async_db`` and ``get_async_read_db`` (aiosqlite or asyncpg), which
+share the same URLs and tuning; the sync sessions keep working alongside.
+"""
+import os
+from typing import Any, Dict, Optional
+
+from sqlalchemy import create_engine, event
+from sqlalchemy.engine import Engine, make_url
+from sqlalchemy.ext.asyncio import AsyncEngine, AsyncSession, async_sessionmaker, create_async_engine
 from sqlalchemy.ext.declarative import declarative_base
 from sqlalchemy.orm import sessionmaker
+from sqlalchemy.pool import AsyncAdaptedQueuePool
+
+SQLALCHEMY_DATABASE_URL = os.getenv("DATABASE_URL", "sqlite:///./shutterspot.db")
+# Optional read replica for GET routes; defaults to the primary database
+SQLALCHEMY_READ_DATABASE_URL = os.getenv("DATABASE_READ_URL") or SQLALCHEMY_DATABASE_URL
+
+# Connection pool settings for server databases
+POOL_SIZE = int(os.getenv("DATABASE_POOL_SIZE", "10"))
+MAX_OVERFLOW = int(os.getenv("DATABASE_MAX_OVERFLOW", "20"))
+POOL_TIMEOUT = 30
+POOL_RECYCLE = 30 * 60
+
+# SQLite pragmas applied to every connection. WAL lets readers proceed
+# while a sync writes; NORMAL synchronous is durable in WAL mode except
+# for the last transactions on power loss.
+SQLITE_PRAGMAS: Dict[str, Any] = {
+    "journal_mode": "WAL",
+    "synchronous": "NORMAL",
+    "busy_timeout": 5000,  # ms to wait for a lock before failing
+    "cache_size": -64000,  # negative means KiB, i.e. 64 MB of page cache
+    "mmap_size": 256 * 1024 * 1024,
+    "temp_store": "MEMORY",
+}
+
+
+# Async drivers for the URLs' sync dialects
+ASYNC_DRIVERS = {
+    "sqlite": "aiosqlite",
+    "postgresql": "asyncpg",
+}
+
+
+def _engine_options(backend: str, kwargs: Dict[str, Any]) -> Dict[str, Any]:
+    if backend == "sqlite":
+        options = {"connect_args": {"check_same_thread": False}}
+    else:
+        options = {
+            "pool_size": POOL_SIZE,
+            "max_overflow": MAX_OVERFLOW,
+            "pool_timeout": POOL_TIMEOUT,
+            "pool_recycle": POOL_RECYCLE,
+            "pool_pre_ping": True,
+        }
+    options.update(kwargs)
+    return options
+
+
+def _configure_connections(
+    engine: Engine,
+    backend: str,
+    read_only: bool,
+    pragmas: Optional[Dict[str, Any]]
+) -> None:
+    """Set up every new connection of ``engine``: SQLite pragmas and read-only mode."""
+    if backend == "sqlite":
+        pragmas = SQLITE_PRAGMAS if pragmas is None else pragmas
+
+        @event.listens_for(engine, "connect")
+        def set_sqlite_pragmas(dbapi_connection, connection_record):
+            cursor = dbapi_connection.cursor()
+            for name, value in pragmas.items():
+                cursor.execute(f"PRAGMA {name} = {value}")
+            if read_only:
+                cursor.execute("PRAGMA query_only = ON")
+            cursor.close()
+
+    elif read_only and backend == "postgresql":
+        @event.listens_for(engine, "connect")
+        def set_read_only(dbapi_connection, connection_record):
+            cursor = dbapi_connection.cursor()
+            cursor.execute("SET SESSION CHARACTERISTICS AS TRANSACTION READ ONLY")
+            cursor.close()
+
+
+def create_db_engine(
+    url: str,
+    read_only: bool = False,
+    pragmas: Optional[Dict[str, Any]] = None,
+    **kwargs
+) -> Engine:
+    """
+    Create an engine tuned for the database behind ``url``.
+
+    Args:
+        url: SQLAlchemy database URL
+        read_only: Reject writes on this engine's connections
+        pragmas: SQLite pragmas to apply; defaults to SQLITE_PRAGMAS
+        **kwargs: Extra arguments for ``create_engine``
+
+    Returns:
+        The configured Engine
+    """
+    backend = make_url(url).get_backend_name()
+    engine = create_engine(url, **_engine_options(backend, kwargs))
+    _configure_connections(engine, backend, read_only, pragmas)
+    return engine
 
-SQLALCHEMY_DATABASE_URL = "sqlite:///./shutterspot.db"
 
-engine = create_engine(
-    SQLALCHEMY_DATABASE_URL, connect_args={"check_same_thread": False}
-)
+def create_async_db_engine(
+    url: str,
+    read_only: bool = False,
+    pragmas: Optional[Dict[str, Any]] = None,
+    **kwargs
+) -> AsyncEngine:
+    """
+    Create an async engine for the database behind ``url``, tuned like ``create_db_engine``.
+
+    A sync URL such as ``sqlite:///./shutterspot.db`` is switched to the
+    backend's async driver; URLs that already name a driver are used as is.
+
+    Args:
+        url: SQLAlchemy database URL
+        read_only: Reject writes on this engine's connections
+        pragmas: SQLite pragmas to apply; defaults to SQLITE_PRAGMAS
+        **kwargs: Extra arguments for ``create_async_engine``
+
+    Returns:
+        The configured AsyncEngine
+    """
+    parsed = make_url(url)
+    backend = parsed.get_backend_name()
+    if backend in ASYNC_DRIVERS and parsed.get_driver_name() != ASYNC_DRIVERS[backend]:
+        parsed = parsed.set(drivername=f"{backend}+{ASYNC_DRIVERS[backend]}")
+    if backend == "sqlite" and parsed.database not in (None, "", ":memory:"):
+        # aiosqlite defaults to a new connection, and a new round of pragmas, per session
+        kwargs.setdefault("poolclass", AsyncAdaptedQueuePool)
+    engine = create_async_engine(parsed, **_engine_options(backend, kwargs))
+    _configure_connections(engine.sync_engine, backend, read_only, pragmas)
+    return engine
+
+
+engine = create_db_engine(SQLALCHEMY_DATABASE_URL)
+read_engine = create_db_engine(SQLALCHEMY_READ_DATABASE_URL, read_only=True)
 SessionLocal = sessionmaker(autocommit=False, autoflush=False, bind=engine)
+ReadSessionLocal = sessionmaker(autocommit=False, autoflush=False, bind=read_engine)
+
+async_engine = create_async_db_engine(SQLALCHEMY_DATABASE_URL)
+async_read_engine = create_async_db_engine(SQLALCHEMY_READ_DATABASE_URL, read_only=True)
+# Objects stay loaded after commit; lazy loads are not possible on async sessions
+AsyncSessionLocal = async_sessionmaker(async_engine, autoflush=False, expire_on_commit=False)
+AsyncReadSessionLocal = async_sessionmaker(async_read_engine, autoflush=False, expire_on_commit=False)
 
 Base = declarative_base()
 
@@ -18,3 +168,20 @@ def get_db():
         yield db
     finally:
         db.close()
+
+# Dependency for routes that only read; these never wait behind sync writes
+def get_read_db():
+    db = ReadSessionLocal()
+    try:
+        yield db
+    finally:
+        db.close()
+
+# Async dependencies for routers ported to async def
+async def get_async_db():
+    async with AsyncSessionLocal() as db:
+        yield db
+
+async def get_async_read_db():
+    async with AsyncReadSessionLocal() as db:
+        yield db
@@ -0,0 +1,115 @@
+"""
+Bring the database schema up to date with the versioned migrations.
+
+Run from the shutterspot_api directory before starting the app, e.g. as a
+deploy step:
+    python -m app.database.migrate
+
+The app does not create tables at startup. Migrations live in
+app/database/migrations and are managed with Alembic; new ones are
+generated with ``alembic revision --autogenerate -m "..."``. Databases
+that have tables but no migration history, i.e. were created before
+migrations were introduced, are stamped at the baseline revision first,
+but only if they have every table, column and index of the baseline
+schema; otherwise the script stops and lists what is missing.
+"""
+import os
+from typing import List, Optional
+
+from alembic import command
+from alembic.autogenerate import compare_metadata
+from alembic.config import Config
+from alembic.runtime.migration import MigrationContext
+from sqlalchemy import MetaData, create_engine, inspect
+from sqlalchemy.engine import Connection
+
+from app.database.database import engine
+
+API_ROOT = os.path.dirname(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+# Schema the app created with create_all before migrations were introduced
+BASELINE_REVISION = "0001"
+# Differences from the baseline that mean a database cannot be stamped at it;
+# extra tables, columns and indexes, and type differences, are tolerated
+MISSING_SCHEMA_OPS = ("add_table", "add_column", "add_index")
+
+
+def alembic_config(connection: Optional[Connection] = None) -> Config:
+    """
+    Alembic configuration for the app's migrations.
+
+    Args:
+        connection: Run on this connection instead of one to DATABASE_URL
+    """
+    config = Config(os.path.join(API_ROOT, "alembic.ini"))
+    config.set_main_option("script_location", os.path.join(API_ROOT, "app", "database", "migrations"))
+    if connection is not None:
+        config.attributes["connection"] = connection
+        config.attributes["configure_logger"] = False
+    return config
+
+
+def baseline_metadata() -> MetaData:
+    """The schema at BASELINE_REVISION, built in a scratch SQLite database and reflected."""
+    scratch = create_engine("sqlite://")
+    metadata = MetaData()
+    with scratch.begin() as connection:
+        command.upgrade(alembic_config(connection), BASELINE_REVISION)
+        metadata.reflect(connection)
+    scratch.dispose()
+    metadata.remove(metadata.tables["alembic_version"])
+    return metadata
+
+
+def _describe(diff) -> str:
+    if diff[0] == "add_table":
+        return f"table {diff[1].name}"
+    if diff[0] == "add_column":
+        return f"column {diff[2]}.{diff[3].name}"
+    return f"index {diff[1].name} on {diff[1].table.name}"
+
+
+def missing_from_baseline(connection: Connection) -> List[str]:
+    """
+    Compare a database with the baseline schema.
+
+    Returns:
+        Descriptions of the baseline tables, columns and indexes the database lacks
+    """
+    context = MigrationContext.configure(connection, opts={"compare_type": False})
+    diffs = [
+        diff for diff in compare_metadata(context, baseline_metadata())
+        # Changes to existing columns come back as lists of tuples
+        if isinstance(diff, tuple) and diff[0] in MISSING_SCHEMA_OPS
+    ]
+    # A missing table's indexes go without saying
+    missing_tables = {diff[1].name for diff in diffs if diff[0] == "add_table"}
+    return [
+        _describe(diff) for diff in diffs
+        if not (diff[0] == "add_index" and diff[1].table.name in missing_tables)
+    ]
+
+
+def migrate(connection: Connection, revision: str = "head") -> None:
+    """
+    Upgrade the database behind ``connection`` to ``revision``.
+
+    Raises:
+        RuntimeError: The database predates migrations and does not match the baseline schema
+    """
+    config = alembic_config(connection)
+    tables = set(inspect(connection).get_table_names()) - {"alembic_version"}
+    if tables and MigrationContext.configure(connection).get_current_revision() is None:
+        missing = missing_from_baseline(connection)
+        if missing:
+            raise RuntimeError(
+                f"Database has no migration history and is missing {', '.join(missing)}; "
+                "it cannot be adopted at the baseline revision"
+            )
+        command.stamp(config, BASELINE_REVISION)
+    command.upgrade(config, revision)
+
+
+if __name__ == "__main__":
+    with engine.begin() as connection:
+        migrate(connection)
+    print("Database schema is up to date")
@@ -0,0 +1,66 @@
+"""
+Alembic environment for the ShutterSpot schema.
+Migrations run against DATABASE_URL through the tuned engine factory, or
+against a connection handed in by the caller (``config.attributes``),
+which is how the migrate and query plan scripts drive them. SQLite
+migrations use batch mode, since SQLite cannot alter most table parts.
+"""
+from logging.config import fileConfig
+
+from alembic import context
+from sqlalchemy import pool
+
+from app.database.database import SQLALCHEMY_DATABASE_URL, create_db_engine
+from app.database.models import Base
+
+config = context.config
+
+if config.config_file_name is not None and config.attributes.get("configure_logger", True):
+    fileConfig(config.config_file_name)
+
+target_metadata = Base.metadata
+
+
+def run_migrations_offline() -> None:
+    """Emit the migration SQL instead of running it."""
+    context.configure(
+        url=config.get_main_option("sqlalchemy.url") or SQLALCHEMY_DATABASE_URL,
+        target_metadata=target_metadata,
+        literal_binds=True,
+        render_as_batch=True,
+        dialect_opts={"paramstyle": "named"},
+    )
+
+    with context.begin_transaction():
+        context.run_migrations()
+
+
+def run_migrations(connection) -> None:
+    context.configure(
+        connection=connection,
+        target_metadata=target_metadata,
+        render_as_batch=connection.dialect.name == "sqlite",
+    )
+
+    with context.begin_transaction():
+        context.run_migrations()
+
+
+def run_migrations_online() -> None:
+    """Run the migrations on a live connection."""
+    connection = config.attributes.get("connection")
+    if connection is not None:
+        run_migrations(connection)
+        return
+
+    url = config.get_main_option("sqlalchemy.url") or SQLALCHEMY_DATABASE_URL
+    engine = create_db_engine(url, poolclass=pool.NullPool)
+    with engine.connect() as connection:
+        run_migrations(connection)
+    engine.dispose()
+
+
+if context.is_offline_mode():
+    run_migrations_offline()
+else:
+    run_migrations_online()
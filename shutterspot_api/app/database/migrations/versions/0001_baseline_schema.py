@@ -0,0 +1,310 @@
+"""Baseline schema
+
+The schema the app created with ``Base.metadata.create_all`` before
+migrations were introduced. Databases created then are stamped at this
+revision by ``python -m app.database.migrate`` instead of being created
+again; the schema changes made since are the later revisions.
+
+Revision ID: 0001
+Revises: 
+Create Date: 2026-10-17 00:54:21.584680
+
+"""
+from typing import Sequence, Union
+
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision: str = '0001'
+down_revision: Union[str, None] = None
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+
+def upgrade() -> None:
+    op.create_table('clients',
+    sa.Column('id', sa.Integer(), nullable=False),
+    sa.Column('name', sa.String(), nullable=True),
+    sa.Column('email', sa.String(), nullable=True),
+    sa.Column('phone', sa.String(), nullable=True),
+    sa.Column('address', sa.String(), nullable=True),
+    sa.Column('notes', sa.Text(), nullable=True),
+    sa.Column('created_at', sa.DateTime(), server_default=sa.func.now(), nullable=True),
+    sa.Column('updated_at', sa.DateTime(), server_default=sa.func.now(), nullable=True),
+    sa.PrimaryKeyConstraint('id')
+    )
+    with op.batch_alter_table('clients', schema=None) as batch_op:
+        batch_op.create_index(batch_op.f('ix_clients_email'), ['email'], unique=True)
+        batch_op.create_index(batch_op.f('ix_clients_id'), ['id'], unique=False)
+        batch_op.create_index(batch_op.f('ix_clients_name'), ['name'], unique=False)
+
+    op.create_table('email_templates',
+    sa.Column('id', sa.Integer(), nullable=False),
+    sa.Column('name', sa.String(), nullable=True),
+    sa.Column('subject', sa.String(), nullable=True),
+    sa.Column('body', sa.Text(), nullable=True),
+    sa.Column('category', sa.String(), nullable=True),
+    sa.Column('content', sa.Text(), nullable=True),
+    sa.Column('created_at', sa.DateTime(), server_default=sa.func.now(), nullable=True),
+    sa.Column('updated_at', sa.DateTime(), server_default=sa.func.now(), nullable=True),
+    sa.PrimaryKeyConstraint('id')
+    )
+    with op.batch_alter_table('email_templates', schema=None) as batch_op:
+        batch_op.create_index(batch_op.f('ix_email_templates_category'), ['category'], unique=False)
+        batch_op.create_index(batch_op.f('ix_email_templates_id'), ['id'], unique=False)
+        batch_op.create_index(batch_op.f('ix_email_templates_name'), ['name'], unique=False)
+
+    op.create_table('users',
+    sa.Column('id', sa.Integer(), nullable=False),
+    sa.Column('username', sa.String(), nullable=True),
+    sa.Column('email', sa.String(), nullable=True),
+    sa.Column('hashed_password', sa.String(), nullable=True),
+    sa.Column('name', sa.String(), nullable=True),
+    sa.Column('role', sa.String(), nullable=True),
+    sa.Column('settings', sa.JSON(), nullable=True),
+    sa.Column('created_at', sa.DateTime(), server_default=sa.func.now(), nullable=True),
+    sa.Column('updated_at', sa.DateTime(), server_default=sa.func.now(), nullable=True),
+    sa.PrimaryKeyConstraint('id')
+    )
+    with op.batch_alter_table('users', schema=None) as batch_op:
+        batch_op.create_index(batch_op.f('ix_users_email'), ['email'], unique=True)
+        batch_op.create_index(batch_op.f('ix_users_id'), ['id'], unique=False)
+        batch_op.create_index(batch_op.f('ix_users_username'), ['username'], unique=True)
+
+    op.create_table('workflows',
+    sa.Column('id', sa.Integer(), nullable=False),
+    sa.Column('name', sa.String(), nullable=True),
+    sa.Column('triggers', sa.JSON(), nullable=True),
+    sa.Column('actions', sa.JSON(), nullable=True),
+    sa.Column('is_active', sa.Boolean(), nullable=True),
+    sa.Column('created_at', sa.DateTime(), server_default=sa.func.now(), nullable=True),
+    sa.Column('updated_at', sa.DateTime(), server_default=sa.func.now(), nullable=True),
+    sa.PrimaryKeyConstraint('id')
+    )
+    with op.batch_alter_table('workflows', schema=None) as batch_op:
+        batch_op.create_index(batch_op.f('ix_workflows_id'), ['id'], unique=False)
+        batch_op.create_index(batch_op.f('ix_workflows_name'), ['name'], unique=False)
+
+    op.create_table('activities',
+    sa.Column('id', sa.Integer(), nullable=False),
+    sa.Column('type', sa.String(), nullable=True),
+    sa.Column('description', sa.Text(), nullable=True),
+    sa.Column('timestamp', sa.DateTime(), server_default=sa.func.now(), nullable=True),
+    sa.Column('user_id', sa.Integer(), nullable=True),
+    sa.Column('entity_id', sa.Integer(), nullable=True),
+    sa.Column('entity_type', sa.String(), nullable=True),
+    sa.ForeignKeyConstraint(['user_id'], ['users.id'], ),
+    sa.PrimaryKeyConstraint('id')
+    )
+    with op.batch_alter_table('activities', schema=None) as batch_op:
+        batch_op.create_index(batch_op.f('ix_activities_id'), ['id'], unique=False)
+        batch_op.create_index(batch_op.f('ix_activities_type'), ['type'], unique=False)
+
+    op.create_table('proposals',
+    sa.Column('id', sa.Integer(), nullable=False),
+    sa.Column('client_id', sa.Integer(), nullable=True),
+    sa.Column('title', sa.String(), nullable=True),
+    sa.Column('packages', sa.JSON(), nullable=True),
+    sa.Column('valid_until', sa.Date(), nullable=True),
+    sa.Column('amount', sa.Float(), nullable=True),
+    sa.Column('status', sa.String(), nullable=True),
+    sa.Column('message', sa.Text(), nullable=True),
+    sa.Column('expiry_date', sa.Date(), nullable=True),
+    sa.Column('created_at', sa.DateTime(), server_default=sa.func.now(), nullable=True),
+    sa.Column('updated_at', sa.DateTime(), server_default=sa.func.now(), nullable=True),
+    sa.ForeignKeyConstraint(['client_id'], ['clients.id'], ),
+    sa.PrimaryKeyConstraint('id')
+    )
+    with op.batch_alter_table('proposals', schema=None) as batch_op:
+        batch_op.create_index(batch_op.f('ix_proposals_id'), ['id'], unique=False)
+        batch_op.create_index(batch_op.f('ix_proposals_title'), ['title'], unique=False)
+
+    op.create_table('shoots',
+    sa.Column('id', sa.Integer(), nullable=False),
+    sa.Column('client_id', sa.Integer(), nullable=True),
+    sa.Column('title', sa.String(), nullable=True),
+    sa.Column('date', sa.Date(), nullable=True),
+    sa.Column('start_time', sa.String(), nullable=True),
+    sa.Column('end_time', sa.String(), nullable=True),
+    sa.Column('location', sa.String(), nullable=True),
+    sa.Column('type', sa.String(), nullable=True),
+    sa.Column('package', sa.String(), nullable=True),
+    sa.Column('status', sa.String(), nullable=True),
+    sa.Column('notes', sa.Text(), nullable=True),
+    sa.Column('created_at', sa.DateTime(), server_default=sa.func.now(), nullable=True),
+    sa.Column('updated_at', sa.DateTime(), server_default=sa.func.now(), nullable=True),
+    sa.ForeignKeyConstraint(['client_id'], ['clients.id'], ),
+    sa.PrimaryKeyConstraint('id')
+    )
+    with op.batch_alter_table('shoots', schema=None) as batch_op:
+        batch_op.create_index(batch_op.f('ix_shoots_id'), ['id'], unique=False)
+        batch_op.create_index(batch_op.f('ix_shoots_title'), ['title'], unique=False)
+
+    op.create_table('tasks',
+    sa.Column('id', sa.Integer(), nullable=False),
+    sa.Column('title', sa.String(), nullable=True),
+    sa.Column('description', sa.Text(), nullable=True),
+    sa.Column('due_date', sa.Date(), nullable=True),
+    sa.Column('priority', sa.String(), nullable=True),
+    sa.Column('status', sa.String(), nullable=True),
+    sa.Column('assigned_to', sa.Integer(), nullable=True),
+    sa.Column('created_at', sa.DateTime(), server_default=sa.func.now(), nullable=True),
+    sa.Column('updated_at', sa.DateTime(), server_default=sa.func.now(), nullable=True),
+    sa.ForeignKeyConstraint(['assigned_to'], ['users.id'], ),
+    sa.PrimaryKeyConstraint('id')
+    )
+    with op.batch_alter_table('tasks', schema=None) as batch_op:
+        batch_op.create_index(batch_op.f('ix_tasks_id'), ['id'], unique=False)
+        batch_op.create_index(batch_op.f('ix_tasks_title'), ['title'], unique=False)
+
+    op.create_table('galleries',
+    sa.Column('id', sa.Integer(), nullable=False),
+    sa.Column('client_id', sa.Integer(), nullable=True),
+    sa.Column('shoot_id', sa.Integer(), nullable=True),
+    sa.Column('title', sa.String(), nullable=True),
+    sa.Column('description', sa.Text(), nullable=True),
+    sa.Column('password', sa.String(), nullable=True),
+    sa.Column('expiry_date', sa.Date(), nullable=True),
+    sa.Column('images', sa.JSON(), nullable=True),
+    sa.Column('status', sa.String(), nullable=True),
+    sa.Column('created_at', sa.DateTime(), server_default=sa.func.now(), nullable=True),
+    sa.Column('updated_at', sa.DateTime(), server_default=sa.func.now(), nullable=True),
+    sa.ForeignKeyConstraint(['client_id'], ['clients.id'], ),
+    sa.ForeignKeyConstraint(['shoot_id'], ['shoots.id'], ),
+    sa.PrimaryKeyConstraint('id')
+    )
+    with op.batch_alter_table('galleries', schema=None) as batch_op:
+        batch_op.create_index(batch_op.f('ix_galleries_id'), ['id'], unique=False)
+        batch_op.create_index(batch_op.f('ix_galleries_title'), ['title'], unique=False)
+
+    op.create_table('invoices',
+    sa.Column('id', sa.Integer(), nullable=False),
+    sa.Column('client_id', sa.Integer(), nullable=True),
+    sa.Column('shoot_id', sa.Integer(), nullable=True),
+    sa.Column('invoice_number', sa.String(), nullable=True),
+    sa.Column('items', sa.JSON(), nullable=True),
+    sa.Column('subtotal', sa.String(), nullable=True),
+    sa.Column('tax', sa.String(), nullable=True),
+    sa.Column('total', sa.String(), nullable=True),
+    sa.Column('due_date', sa.Date(), nullable=True),
+    sa.Column('amount', sa.Float(), nullable=True),
+    sa.Column('status', sa.String(), nullable=True),
+    sa.Column('created_at', sa.DateTime(), server_default=sa.func.now(), nullable=True),
+    sa.Column('updated_at', sa.DateTime(), server_default=sa.func.now(), nullable=True),
+    sa.ForeignKeyConstraint(['client_id'], ['clients.id'], ),
+    sa.ForeignKeyConstraint(['shoot_id'], ['shoots.id'], ),
+    sa.PrimaryKeyConstraint('id')
+    )
+    with op.batch_alter_table('invoices', schema=None) as batch_op:
+        batch_op.create_index(batch_op.f('ix_invoices_id'), ['id'], unique=False)
+        batch_op.create_index(batch_op.f('ix_invoices_invoice_number'), ['invoice_number'], unique=True)
+
+    op.create_table('drive_connections',
+    sa.Column('id', sa.Integer(), nullable=False),
+    sa.Column('user_id', sa.Integer(), nullable=True),
+    sa.Column('gallery_id', sa.Integer(), nullable=True),
+    sa.Column('drive_folder_id', sa.String(), nullable=False),
+    sa.Column('drive_folder_name', sa.String(), nullable=True),
+    sa.Column('auto_sync', sa.Boolean(), nullable=True),
+    sa.Column('last_synced', sa.DateTime(), nullable=True),
+    sa.Column('created_at', sa.DateTime(), server_default=sa.func.now(), nullable=True),
+    sa.Column('updated_at', sa.DateTime(), server_default=sa.func.now(), nullable=True),
+    sa.ForeignKeyConstraint(['gallery_id'], ['galleries.id'], ),
+    sa.ForeignKeyConstraint(['user_id'], ['users.id'], ),
+    sa.PrimaryKeyConstraint('id')
+    )
+    with op.batch_alter_table('drive_connections', schema=None) as batch_op:
+        batch_op.create_index(batch_op.f('ix_drive_connections_id'), ['id'], unique=False)
+
+    op.create_table('photos',
+    sa.Column('id', sa.Integer(), nullable=False),
+    sa.Column('gallery_id', sa.Integer(), nullable=True),
+    sa.Column('filename', sa.String(), nullable=False),
+    sa.Column('drive_file_id', sa.String(), nullable=True),
+    sa.Column('drive_modified', sa.String(), nullable=True),
+    sa.Column('thumbnail', sa.LargeBinary(), nullable=True),
+    sa.Column('url', sa.String(), nullable=True),
+    sa.Column('favorites_count', sa.Integer(), nullable=True),
+    sa.Column('created_at', sa.DateTime(), server_default=sa.func.now(), nullable=True),
+    sa.Column('updated_at', sa.DateTime(), server_default=sa.func.now(), nullable=True),
+    sa.ForeignKeyConstraint(['gallery_id'], ['galleries.id'], ),
+    sa.PrimaryKeyConstraint('id')
+    )
+    with op.batch_alter_table('photos', schema=None) as batch_op:
+        batch_op.create_index(batch_op.f('ix_photos_id'), ['id'], unique=False)
+
+    op.create_table('photo_favorites',
+    sa.Column('photo_id', sa.Integer(), nullable=False),
+    sa.Column('user_id', sa.Integer(), nullable=False),
+    sa.Column('created_at', sa.DateTime(), server_default=sa.func.now(), nullable=True),
+    sa.ForeignKeyConstraint(['photo_id'], ['photos.id'], ),
+    sa.ForeignKeyConstraint(['user_id'], ['users.id'], ),
+    sa.PrimaryKeyConstraint('photo_id', 'user_id')
+    )
+
+
+def downgrade() -> None:
+    op.drop_table('photo_favorites')
+    with op.batch_alter_table('photos', schema=None) as batch_op:
+        batch_op.drop_index(batch_op.f('ix_photos_id'))
+
+    op.drop_table('photos')
+    with op.batch_alter_table('drive_connections', schema=None) as batch_op:
+        batch_op.drop_index(batch_op.f('ix_drive_connections_id'))
+
+    op.drop_table('drive_connections')
+    with op.batch_alter_table('invoices', schema=None) as batch_op:
+        batch_op.drop_index(batch_op.f('ix_invoices_invoice_number'))
+        batch_op.drop_index(batch_op.f('ix_invoices_id'))
+
+    op.drop_table('invoices')
+    with op.batch_alter_table('galleries', schema=None) as batch_op:
+        batch_op.drop_index(batch_op.f('ix_galleries_title'))
+        batch_op.drop_index(batch_op.f('ix_galleries_id'))
+
+    op.drop_table('galleries')
+    with op.batch_alter_table('tasks', schema=None) as batch_op:
+        batch_op.drop_index(batch_op.f('ix_tasks_title'))
+        batch_op.drop_index(batch_op.f('ix_tasks_id'))
+
+    op.drop_table('tasks')
+    with op.batch_alter_table('shoots', schema=None) as batch_op:
+        batch_op.drop_index(batch_op.f('ix_shoots_title'))
+        batch_op.drop_index(batch_op.f('ix_shoots_id'))
+
+    op.drop_table('shoots')
+    with op.batch_alter_table('proposals', schema=None) as batch_op:
+        batch_op.drop_index(batch_op.f('ix_proposals_title'))
+        batch_op.drop_index(batch_op.f('ix_proposals_id'))
+
+    op.drop_table('proposals')
+    with op.batch_alter_table('activities', schema=None) as batch_op:
+        batch_op.drop_index(batch_op.f('ix_activities_type'))
+        batch_op.drop_index(batch_op.f('ix_activities_id'))
+
+    op.drop_table('activities')
+    with op.batch_alter_table('workflows', schema=None) as batch_op:
+        batch_op.drop_index(batch_op.f('ix_workflows_name'))
+        batch_op.drop_index(batch_op.f('ix_workflows_id'))
+
+    op.drop_table('workflows')
+    with op.batch_alter_table('users', schema=None) as batch_op:
+        batch_op.drop_index(batch_op.f('ix_users_username'))
+        batch_op.drop_index(batch_op.f('ix_users_id'))
+        batch_op.drop_index(batch_op.f('ix_users_email'))
+
+    op.drop_table('users')
+    with op.batch_alter_table('email_templates', schema=None) as batch_op:
+        batch_op.drop_index(batch_op.f('ix_email_templates_name'))
+        batch_op.drop_index(batch_op.f('ix_email_templates_id'))
+        batch_op.drop_index(batch_op.f('ix_email_templates_category'))
+
+    op.drop_table('email_templates')
+    with op.batch_alter_table('clients', schema=None) as batch_op:
+        batch_op.drop_index(batch_op.f('ix_clients_name'))
+        batch_op.drop_index(batch_op.f('ix_clients_id'))
+        batch_op.drop_index(batch_op.f('ix_clients_email'))
+
+    op.drop_table('clients')
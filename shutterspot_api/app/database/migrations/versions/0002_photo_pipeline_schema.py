@@ -0,0 +1,261 @@
+"""Photo pipeline schema
+
+Tables and columns for the Drive sync pipeline: the blob store that holds
+thumbnails and derivatives, background sync jobs and their checkpoints,
+per-gallery favorite rollups, recursive and scheduled syncs, and the
+capture metadata, perceptual hashes and pagination indexes of photos.
+
+Thumbnails stored in photos.thumbnail are moved into the blob store and
+the column is dropped; the favorite rollup is built from photo_favorites.
+
+Revision ID: 0002
+Revises: 0001
+Create Date: 2026-10-17 00:54:30.118204
+
+"""
+from typing import Sequence, Union
+
+from alembic import op
+import sqlalchemy as sa
+
+from app.services.blob_store import blob_store
+
+
+# revision identifiers, used by Alembic.
+revision: str = '0002'
+down_revision: Union[str, None] = '0001'
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+# Thumbnails moved to the blob store per batch
+BATCH_SIZE = 200
+
+
+def upgrade() -> None:
+    op.create_table('blobs',
+    sa.Column('hash', sa.String(length=64), nullable=False),
+    sa.Column('size', sa.Integer(), nullable=False),
+    sa.Column('ref_count', sa.Integer(), nullable=False),
+    sa.Column('created_at', sa.DateTime(), server_default=sa.func.now(), nullable=True),
+    sa.PrimaryKeyConstraint('hash')
+    )
+    op.create_table('gallery_favorite_selections',
+    sa.Column('gallery_id', sa.Integer(), nullable=False),
+    sa.Column('user_id', sa.Integer(), nullable=False),
+    sa.Column('selected_count', sa.Integer(), nullable=False),
+    sa.Column('updated_at', sa.DateTime(), server_default=sa.func.now(), nullable=True),
+    sa.ForeignKeyConstraint(['gallery_id'], ['galleries.id'], ),
+    sa.ForeignKeyConstraint(['user_id'], ['users.id'], ),
+    sa.PrimaryKeyConstraint('gallery_id', 'user_id')
+    )
+    op.create_table('photo_derivatives',
+    sa.Column('id', sa.Integer(), nullable=False),
+    sa.Column('photo_id', sa.Integer(), nullable=True),
+    sa.Column('variant', sa.String(), nullable=False),
+    sa.Column('format', sa.String(), nullable=False),
+    sa.Column('width', sa.Integer(), nullable=True),
+    sa.Column('height', sa.Integer(), nullable=True),
+    sa.Column('blob_hash', sa.String(length=64), nullable=False),
+    sa.Column('size', sa.Integer(), nullable=True),
+    sa.Column('created_at', sa.DateTime(), server_default=sa.func.now(), nullable=True),
+    sa.ForeignKeyConstraint(['photo_id'], ['photos.id'], ),
+    sa.PrimaryKeyConstraint('id')
+    )
+    with op.batch_alter_table('photo_derivatives', schema=None) as batch_op:
+        batch_op.create_index(batch_op.f('ix_photo_derivatives_id'), ['id'], unique=False)
+        batch_op.create_index(batch_op.f('ix_photo_derivatives_photo_id'), ['photo_id'], unique=False)
+
+    op.create_table('sync_checkpoints',
+    sa.Column('id', sa.Integer(), nullable=False),
+    sa.Column('connection_id', sa.Integer(), nullable=True),
+    sa.Column('run_id', sa.String(length=32), nullable=False),
+    sa.Column('mode', sa.String(), nullable=False),
+    sa.Column('start_page_token', sa.String(), nullable=True),
+    sa.Column('list_page_token', sa.String(), nullable=True),
+    sa.Column('listing_complete', sa.Boolean(), nullable=True),
+    sa.Column('folders', sa.JSON(), nullable=True),
+    sa.Column('last_file_id', sa.String(), nullable=True),
+    sa.Column('pending', sa.JSON(), nullable=True),
+    sa.Column('errors', sa.JSON(), nullable=True),
+    sa.Column('created_at', sa.DateTime(), server_default=sa.func.now(), nullable=True),
+    sa.Column('updated_at', sa.DateTime(), server_default=sa.func.now(), nullable=True),
+    sa.ForeignKeyConstraint(['connection_id'], ['drive_connections.id'], ),
+    sa.PrimaryKeyConstraint('id'),
+    sa.UniqueConstraint('connection_id')
+    )
+    with op.batch_alter_table('sync_checkpoints', schema=None) as batch_op:
+        batch_op.create_index(batch_op.f('ix_sync_checkpoints_id'), ['id'], unique=False)
+
+    op.create_table('sync_jobs',
+    sa.Column('id', sa.Integer(), nullable=False),
+    sa.Column('connection_id', sa.Integer(), nullable=True),
+    sa.Column('user_id', sa.Integer(), nullable=True),
+    sa.Column('status', sa.String(), nullable=True),
+    sa.Column('full_rescan', sa.Boolean(), nullable=True),
+    sa.Column('attempts', sa.Integer(), nullable=True),
+    sa.Column('run_after', sa.DateTime(), nullable=True),
+    sa.Column('worker_id', sa.String(), nullable=True),
+    sa.Column('files_listed', sa.Integer(), nullable=True),
+    sa.Column('files_processed', sa.Integer(), nullable=True),
+    sa.Column('photos_count', sa.Integer(), nullable=True),
+    sa.Column('removed_count', sa.Integer(), nullable=True),
+    sa.Column('errors', sa.JSON(), nullable=True),
+    sa.Column('error', sa.Text(), nullable=True),
+    sa.Column('created_at', sa.DateTime(), server_default=sa.func.now(), nullable=True),
+    sa.Column('started_at', sa.DateTime(), nullable=True),
+    sa.Column('heartbeat_at', sa.DateTime(), nullable=True),
+    sa.Column('finished_at', sa.DateTime(), nullable=True),
+    sa.Column('updated_at', sa.DateTime(), server_default=sa.func.now(), nullable=True),
+    sa.ForeignKeyConstraint(['connection_id'], ['drive_connections.id'], ),
+    sa.ForeignKeyConstraint(['user_id'], ['users.id'], ),
+    sa.PrimaryKeyConstraint('id')
+    )
+    with op.batch_alter_table('sync_jobs', schema=None) as batch_op:
+        batch_op.create_index(batch_op.f('ix_sync_jobs_connection_id'), ['connection_id'], unique=False)
+        batch_op.create_index(batch_op.f('ix_sync_jobs_id'), ['id'], unique=False)
+        batch_op.create_index(batch_op.f('ix_sync_jobs_status'), ['status'], unique=False)
+
+    with op.batch_alter_table('drive_connections', schema=None) as batch_op:
+        batch_op.add_column(sa.Column('recursive', sa.Boolean(), nullable=True))
+        batch_op.add_column(sa.Column('folder_tree', sa.JSON(), nullable=True))
+        batch_op.add_column(sa.Column('changes_page_token', sa.String(), nullable=True))
+        batch_op.add_column(sa.Column('next_sync_at', sa.DateTime(), nullable=True))
+        batch_op.add_column(sa.Column('last_viewed_at', sa.DateTime(), nullable=True))
+        batch_op.create_index(batch_op.f('ix_drive_connections_next_sync_at'), ['next_sync_at'], unique=False)
+
+    with op.batch_alter_table('photos', schema=None) as batch_op:
+        batch_op.add_column(sa.Column('folder_path', sa.String(), nullable=True))
+        batch_op.add_column(sa.Column('thumbnail_hash', sa.String(length=64), nullable=True))
+        batch_op.add_column(sa.Column('thumbnail_size', sa.Integer(), nullable=True))
+        batch_op.add_column(sa.Column('perceptual_hash', sa.BigInteger(), nullable=True))
+        batch_op.add_column(sa.Column('duplicate_of', sa.Integer(), nullable=True))
+        batch_op.add_column(sa.Column('captured_at', sa.DateTime(), nullable=True))
+        batch_op.add_column(sa.Column('camera_make', sa.String(), nullable=True))
+        batch_op.add_column(sa.Column('camera_model', sa.String(), nullable=True))
+        batch_op.add_column(sa.Column('lens_model', sa.String(), nullable=True))
+        batch_op.add_column(sa.Column('orientation', sa.Integer(), nullable=True))
+        batch_op.add_column(sa.Column('width', sa.Integer(), nullable=True))
+        batch_op.add_column(sa.Column('height', sa.Integer(), nullable=True))
+        batch_op.add_column(sa.Column('original_size', sa.BigInteger(), nullable=True))
+        batch_op.add_column(sa.Column('original_crc32', sa.BigInteger(), nullable=True))
+        batch_op.add_column(sa.Column('derivative_variants', sa.JSON(), nullable=True))
+        batch_op.add_column(sa.Column('sync_run', sa.String(length=32), nullable=True))
+        batch_op.create_index('ix_photos_gallery_camera', ['gallery_id', 'camera_model'], unique=False)
+        batch_op.create_index('ix_photos_gallery_captured', ['gallery_id', 'captured_at', 'id'], unique=False)
+        batch_op.create_index('ix_photos_gallery_favorites', ['gallery_id', 'favorites_count', 'id'], unique=False)
+        batch_op.create_index('ix_photos_gallery_id', ['gallery_id', 'id'], unique=False)
+        batch_op.create_index('ix_photos_gallery_lens', ['gallery_id', 'lens_model'], unique=False)
+        batch_op.create_foreign_key('fk_photos_duplicate_of', 'photos', ['duplicate_of'], ['id'])
+
+    _move_thumbnails_to_blob_store()
+    with op.batch_alter_table('photos', schema=None) as batch_op:
+        batch_op.drop_column('thumbnail')
+
+    op.execute(
+        "INSERT INTO gallery_favorite_selections (gallery_id, user_id, selected_count, updated_at)"
+        " SELECT photos.gallery_id, photo_favorites.user_id, COUNT(*), CURRENT_TIMESTAMP"
+        " FROM photo_favorites JOIN photos ON photos.id = photo_favorites.photo_id"
+        " WHERE photos.gallery_id IS NOT NULL"
+        " GROUP BY photos.gallery_id, photo_favorites.user_id"
+    )
+
+
+def _move_thumbnails_to_blob_store() -> None:
+    """Write every stored thumbnail to the blob store and point its photo at the blob."""
+    bind = op.get_bind()
+    last_id = 0
+    while True:
+        rows = bind.execute(sa.text(
+            "SELECT id, thumbnail FROM photos"
+            " WHERE id > :last_id AND thumbnail IS NOT NULL"
+            " ORDER BY id LIMIT :limit"
+        ), {'last_id': last_id, 'limit': BATCH_SIZE}).all()
+        if not rows:
+            break
+        bind.execute(
+            sa.text("UPDATE photos SET thumbnail_hash = :digest, thumbnail_size = :size WHERE id = :id"),
+            [{'id': photo_id, 'digest': blob_store.write(data), 'size': len(data)} for photo_id, data in rows]
+        )
+        last_id = rows[-1][0]
+
+    # One reference per photo pointing at each blob
+    bind.execute(sa.text(
+        "INSERT INTO blobs (hash, size, ref_count)"
+        " SELECT thumbnail_hash, MAX(thumbnail_size), COUNT(*) FROM photos"
+        " WHERE thumbnail_hash IS NOT NULL GROUP BY thumbnail_hash"
+    ))
+
+
+def _restore_thumbnails_from_blob_store() -> None:
+    """Copy thumbnails back from the blob store into photos.thumbnail."""
+    bind = op.get_bind()
+    last_id = 0
+    while True:
+        rows = bind.execute(sa.text(
+            "SELECT id, thumbnail_hash FROM photos"
+            " WHERE id > :last_id AND thumbnail_hash IS NOT NULL"
+            " ORDER BY id LIMIT :limit"
+        ), {'last_id': last_id, 'limit': BATCH_SIZE}).all()
+        if not rows:
+            break
+        bind.execute(
+            sa.text("UPDATE photos SET thumbnail = :data WHERE id = :id"),
+            [{'id': photo_id, 'data': blob_store.read(digest)} for photo_id, digest in rows]
+        )
+        last_id = rows[-1][0]
+
+
+def downgrade() -> None:
+    with op.batch_alter_table('photos', schema=None) as batch_op:
+        batch_op.add_column(sa.Column('thumbnail', sa.LargeBinary(), nullable=True))
+    _restore_thumbnails_from_blob_store()
+
+    with op.batch_alter_table('photos', schema=None) as batch_op:
+        batch_op.drop_constraint('fk_photos_duplicate_of', type_='foreignkey')
+        batch_op.drop_index('ix_photos_gallery_lens')
+        batch_op.drop_index('ix_photos_gallery_id')
+        batch_op.drop_index('ix_photos_gallery_favorites')
+        batch_op.drop_index('ix_photos_gallery_captured')
+        batch_op.drop_index('ix_photos_gallery_camera')
+        batch_op.drop_column('sync_run')
+        batch_op.drop_column('derivative_variants')
+        batch_op.drop_column('original_crc32')
+        batch_op.drop_column('original_size')
+        batch_op.drop_column('height')
+        batch_op.drop_column('width')
+        batch_op.drop_column('orientation')
+        batch_op.drop_column('lens_model')
+        batch_op.drop_column('camera_model')
+        batch_op.drop_column('camera_make')
+        batch_op.drop_column('captured_at')
+        batch_op.drop_column('duplicate_of')
+        batch_op.drop_column('perceptual_hash')
+        batch_op.drop_column('thumbnail_size')
+        batch_op.drop_column('thumbnail_hash')
+        batch_op.drop_column('folder_path')
+
+    with op.batch_alter_table('drive_connections', schema=None) as batch_op:
+        batch_op.drop_index(batch_op.f('ix_drive_connections_next_sync_at'))
+        batch_op.drop_column('last_viewed_at')
+        batch_op.drop_column('next_sync_at')
+        batch_op.drop_column('changes_page_token')
+        batch_op.drop_column('folder_tree')
+        batch_op.drop_column('recursive')
+
+    with op.batch_alter_table('sync_jobs', schema=None) as batch_op:
+        batch_op.drop_index(batch_op.f('ix_sync_jobs_status'))
+        batch_op.drop_index(batch_op.f('ix_sync_jobs_id'))
+        batch_op.drop_index(batch_op.f('ix_sync_jobs_connection_id'))
+
+    op.drop_table('sync_jobs')
+    with op.batch_alter_table('sync_checkpoints', schema=None) as batch_op:
+        batch_op.drop_index(batch_op.f('ix_sync_checkpoints_id'))
+
+    op.drop_table('sync_checkpoints')
+    with op.batch_alter_table('photo_derivatives', schema=None) as batch_op:
+        batch_op.drop_index(batch_op.f('ix_photo_derivatives_photo_id'))
+        batch_op.drop_index(batch_op.f('ix_photo_derivatives_id'))
+
+    op.drop_table('photo_derivatives')
+    op.drop_table('gallery_favorite_selections')
+    op.drop_table('blobs')
@@ -0,0 +1,55 @@
+"""Hot lookup indexes
+
+Indexes for the lookups that scanned whole tables: a client's shoots and
+proposals, upcoming shoots, a user's favorites, a gallery's Drive
+connections, and the sync's match of Drive files to a gallery's photos,
+which is also made unique.
+
+Revision ID: 0003
+Revises: 0002
+Create Date: 2026-10-17 00:54:36.435301
+
+"""
+from typing import Sequence, Union
+
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision: str = '0003'
+down_revision: Union[str, None] = '0002'
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+
+def upgrade() -> None:
+    op.create_index('ix_shoots_client_id', 'shoots', ['client_id'], unique=False)
+    op.create_index('ix_shoots_date', 'shoots', ['date'], unique=False)
+    op.create_index('ix_proposals_client_id', 'proposals', ['client_id'], unique=False)
+    op.create_index('ix_photo_favorites_user', 'photo_favorites', ['user_id', 'photo_id'], unique=False)
+    op.create_index('ix_drive_connections_gallery_id', 'drive_connections', ['gallery_id'], unique=False)
+
+    # A Drive file imported twice into a gallery would make the unique index fail
+    duplicates = op.get_bind().execute(sa.text(
+        "SELECT gallery_id, drive_file_id, COUNT(*) FROM photos"
+        " WHERE drive_file_id IS NOT NULL"
+        " GROUP BY gallery_id, drive_file_id HAVING COUNT(*) > 1"
+    )).all()
+    if duplicates:
+        gallery_id, drive_file_id, count = duplicates[0]
+        raise RuntimeError(
+            f"{len(duplicates)} Drive files are imported more than once into a gallery"
+            f" (e.g. {drive_file_id} {count} times in gallery {gallery_id});"
+            " delete the extra photos and run the migration again"
+        )
+    op.create_index('ix_photos_gallery_drive_file', 'photos', ['gallery_id', 'drive_file_id'], unique=True)
+
+
+def downgrade() -> None:
+    op.drop_index('ix_photos_gallery_drive_file', table_name='photos')
+    op.drop_index('ix_drive_connections_gallery_id', table_name='drive_connections')
+    op.drop_index('ix_photo_favorites_user', table_name='photo_favorites')
+    op.drop_index('ix_proposals_client_id', table_name='proposals')
+    op.drop_index('ix_shoots_date', table_name='shoots')
+    op.drop_index('ix_shoots_client_id', table_name='shoots')
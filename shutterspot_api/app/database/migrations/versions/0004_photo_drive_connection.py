@@ -0,0 +1,48 @@
+"""Photo Drive connection
+
+Records which Drive connection synced each photo, so that a sync only
+removes the photos of its own folder when a gallery has several
+connections.
+
+Photos of galleries with a single connection are assigned to it. Photos
+of galleries with several connections are left unassigned until a sync of
+the connection whose folder lists them claims them.
+
+Revision ID: 0004
+Revises: 0003
+Create Date: 2026-10-17 09:12:41.508217
+
+"""
+from typing import Sequence, Union
+
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision: str = '0004'
+down_revision: Union[str, None] = '0003'
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+
+def upgrade() -> None:
+    with op.batch_alter_table('photos', schema=None) as batch_op:
+        batch_op.add_column(sa.Column('connection_id', sa.Integer(), nullable=True))
+        batch_op.create_index('ix_photos_connection', ['connection_id', 'sync_run'], unique=False)
+        batch_op.create_foreign_key('fk_photos_connection_id', 'drive_connections', ['connection_id'], ['id'])
+
+    op.execute(
+        "UPDATE photos SET connection_id = ("
+        "SELECT MIN(drive_connections.id) FROM drive_connections"
+        " WHERE drive_connections.gallery_id = photos.gallery_id)"
+        " WHERE drive_file_id IS NOT NULL AND gallery_id IN ("
+        "SELECT gallery_id FROM drive_connections GROUP BY gallery_id HAVING COUNT(*) = 1)"
+    )
+
+
+def downgrade() -> None:
+    with op.batch_alter_table('photos', schema=None) as batch_op:
+        batch_op.drop_constraint('fk_photos_connection_id', type_='foreignkey')
+        batch_op.drop_index('ix_photos_connection')
+        batch_op.drop_column('connection_id')
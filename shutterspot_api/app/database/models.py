@@ -1,16 +1,17 @@
-from sqlalchemy import Boolean, Column, ForeignKey, Integer, String, Float, Date, DateTime, JSON, Text, LargeBinary, Table
-from sqlalchemy.ext.declarative import declarative_base
+from sqlalchemy import BigInteger, Boolean, Column, ForeignKey, Index, Integer, String, Float, Date, DateTime, JSON, Text, Table
 from sqlalchemy.orm import relationship
 from sqlalchemy.sql import func
 
-Base = declarative_base()
+from app.database.database import Base
 
 # Association table for photo favorites
 photo_favorites = Table('photo_favorites',
     Base.metadata,
     Column('photo_id', Integer, ForeignKey('photos.id'), primary_key=True),
     Column('user_id', Integer, ForeignKey('users.id'), primary_key=True),
-    Column('created_at', DateTime, server_default=func.now())
+    Column('created_at', DateTime, server_default=func.now()),
+    # A user's favorites, e.g. their favorites page and gallery downloads
+    Index('ix_photo_favorites_user', 'user_id', 'photo_id')
 )
 
 class User(Base):
@@ -54,9 +55,9 @@ class Shoot(Base):
     __tablename__ = "shoots"
 
     id = Column(Integer, primary_key=True, index=True)
-    client_id = Column(Integer, ForeignKey("clients.id"))
+    client_id = Column(Integer, ForeignKey("clients.id"), index=True)
     title = Column(String, index=True)
-    date = Column(Date)
+    date = Column(Date, index=True)
     start_time = Column(String)
     end_time = Column(String)
     location = Column(String)
@@ -76,7 +77,7 @@ class Proposal(Base):
     __tablename__ = "proposals"
 
     id = Column(Integer, primary_key=True, index=True)
-    client_id = Column(Integer, ForeignKey("clients.id"))
+    client_id = Column(Integer, ForeignKey("clients.id"), index=True)
     title = Column(String, index=True)
     packages = Column(JSON)
     valid_until = Column(Date, nullable=True)
@@ -194,16 +195,77 @@ class Photo(Base):
     gallery_id = Column(Integer, ForeignKey("galleries.id"))
     filename = Column(String, nullable=False)
     drive_file_id = Column(String, nullable=True)  # Google Drive file ID
+    connection_id = Column(Integer, ForeignKey("drive_connections.id"), nullable=True)  # Drive connection that synced the file
     drive_modified = Column(String, nullable=True)  # Google Drive modified time
-    thumbnail = Column(LargeBinary, nullable=True)  # Stored thumbnail image
+    folder_path = Column(String, nullable=True)  # Sub-folder path within the synced folder, e.g. "Reception/Portraits"
+    thumbnail_hash = Column(String(64), nullable=True)  # Blob store digest of the thumbnail image
+    thumbnail_size = Column(Integer, nullable=True)  # Thumbnail size in bytes
+    perceptual_hash = Column(BigInteger, nullable=True)  # 64-bit dHash of the thumbnail
+    duplicate_of = Column(Integer, ForeignKey("photos.id"), nullable=True)  # Earlier photo this one nearly duplicates
+    captured_at = Column(DateTime, nullable=True)  # EXIF DateTimeOriginal, camera local time
+    camera_make = Column(String, nullable=True)
+    camera_model = Column(String, nullable=True)
+    lens_model = Column(String, nullable=True)
+    orientation = Column(Integer, nullable=True)  # EXIF orientation, 1-8
+    width = Column(Integer, nullable=True)  # Original image dimensions
+    height = Column(Integer, nullable=True)
+    original_size = Column(BigInteger, nullable=True)  # Size of the Drive original in bytes
+    original_crc32 = Column(BigInteger, nullable=True)  # CRC-32 of the original, cached by archive downloads
+    derivative_variants = Column(JSON, nullable=True)  # Rendered derivatives, e.g. {"thumb": ["webp", "jpeg"]}
     url = Column(String, nullable=True)  # URL to the full-size image
     favorites_count = Column(Integer, default=0)  # Counter for favorites
+    sync_run = Column(String(32), nullable=True)  # Last full folder listing that saw the file
     created_at = Column(DateTime, server_default=func.now())
     updated_at = Column(DateTime, server_default=func.now(), onupdate=func.now())
 
     # Relationships
     gallery = relationship("Gallery", back_populates="photos")
     favorited_by = relationship("User", secondary=photo_favorites, back_populates="favorited_photos")
+    derivatives = relationship("PhotoDerivative", back_populates="photo", cascade="all, delete-orphan")
+
+    __table_args__ = (
+        # Keyset pagination of gallery listings, in sync order and by capture time
+        Index("ix_photos_gallery_id", "gallery_id", "id"),
+        Index("ix_photos_gallery_captured", "gallery_id", "captured_at", "id"),
+        Index("ix_photos_gallery_camera", "gallery_id", "camera_model"),
+        Index("ix_photos_gallery_lens", "gallery_id", "lens_model"),
+        # Most-favorited photos of a gallery, read backwards
+        Index("ix_photos_gallery_favorites", "gallery_id", "favorites_count", "id"),
+        # The sync matches Drive files to photos per gallery; a file is imported once
+        Index("ix_photos_gallery_drive_file", "gallery_id", "drive_file_id", unique=True),
+        # A connection's photos, removed when a full listing no longer sees them
+        Index("ix_photos_connection", "connection_id", "sync_run"),
+    )
+
+
+class GalleryFavoriteSelection(Base):
+    __tablename__ = "gallery_favorite_selections"
+
+    # Rollup of photo_favorites: how many photos each user selected in a gallery
+    gallery_id = Column(Integer, ForeignKey("galleries.id"), primary_key=True)
+    user_id = Column(Integer, ForeignKey("users.id"), primary_key=True)
+    selected_count = Column(Integer, nullable=False, default=0)
+    updated_at = Column(DateTime, server_default=func.now(), onupdate=func.now())
+
+    # Relationships
+    user = relationship("User")
+
+
+class PhotoDerivative(Base):
+    __tablename__ = "photo_derivatives"
+
+    id = Column(Integer, primary_key=True, index=True)
+    photo_id = Column(Integer, ForeignKey("photos.id"), index=True)
+    variant = Column(String, nullable=False)  # Derivative size name, e.g. thumb, lightbox, social
+    format = Column(String, nullable=False)  # Encoding, e.g. webp, jpeg
+    width = Column(Integer)
+    height = Column(Integer)
+    blob_hash = Column(String(64), nullable=False)  # Blob store digest of the encoded image
+    size = Column(Integer)  # Encoded size in bytes
+    created_at = Column(DateTime, server_default=func.now())
+
+    # Relationships
+    photo = relationship("Photo", back_populates="derivatives")
 
 
 class DriveConnection(Base):
@@ -211,14 +273,73 @@ class DriveConnection(Base):
 
     id = Column(Integer, primary_key=True, index=True)
     user_id = Column(Integer, ForeignKey("users.id"))
-    gallery_id = Column(Integer, ForeignKey("galleries.id"))
+    gallery_id = Column(Integer, ForeignKey("galleries.id"), index=True)
     drive_folder_id = Column(String, nullable=False)  # Google Drive folder ID
     drive_folder_name = Column(String, nullable=True)  # Google Drive folder name
     auto_sync = Column(Boolean, default=True)  # Whether to auto-sync
+    recursive = Column(Boolean, default=False)  # Whether to sync sub-folders too
+    folder_tree = Column(JSON, nullable=True)  # Folder ID -> path of the tree seen by the last full sync
     last_synced = Column(DateTime, nullable=True)  # Last time the folder was synced
+    changes_page_token = Column(String, nullable=True)  # Drive changes feed position after the last sync
+    next_sync_at = Column(DateTime, nullable=True, index=True)  # When the scheduler next syncs the folder
+    last_viewed_at = Column(DateTime, nullable=True)  # Last time a client viewed the gallery
     created_at = Column(DateTime, server_default=func.now())
     updated_at = Column(DateTime, server_default=func.now(), onupdate=func.now())
 
     # Relationships
     user = relationship("User", back_populates="drive_connections")
     gallery = relationship("Gallery", back_populates="drive_connections")
+
+
+class SyncCheckpoint(Base):
+    __tablename__ = "sync_checkpoints"
+
+    id = Column(Integer, primary_key=True, index=True)
+    connection_id = Column(Integer, ForeignKey("drive_connections.id"), unique=True)
+    run_id = Column(String(32), nullable=False)  # Marks the photos seen by this run
+    mode = Column(String, nullable=False)  # full or changes
+    start_page_token = Column(String, nullable=True)  # Changes feed position taken before listing
+    list_page_token = Column(String, nullable=True)  # files().list page being processed
+    listing_complete = Column(Boolean, default=False)  # Every page has been listed
+    folders = Column(JSON, nullable=True)  # Folder ID -> path of the tree being listed
+    last_file_id = Column(String, nullable=True)  # Last file fully processed
+    pending = Column(JSON, nullable=True)  # Listed files whose download or render was unfinished
+    errors = Column(JSON, nullable=True)  # Per-file errors so far
+    created_at = Column(DateTime, server_default=func.now())
+    updated_at = Column(DateTime, server_default=func.now(), onupdate=func.now())
+
+
+class Blob(Base):
+    __tablename__ = "blobs"
+
+    hash = Column(String(64), primary_key=True)  # SHA-256 hex digest of the contents
+    size = Column(Integer, nullable=False)
+    ref_count = Column(Integer, nullable=False, default=0)  # Rows referencing this blob
+    created_at = Column(DateTime, server_default=func.now())
+
+
+class SyncJob(Base):
+    __tablename__ = "sync_jobs"
+
+    id = Column(Integer, primary_key=True, index=True)
+    connection_id = Column(Integer, ForeignKey("drive_connections.id"), index=True)
+    user_id = Column(Integer, ForeignKey("users.id"))
+    status = Column(String, default="queued", index=True)  # queued, running, succeeded or failed
+    full_rescan = Column(Boolean, default=False)  # Ignore the changes feed for this run
+    attempts = Column(Integer, default=0)  # Runs cut short by Drive rate limits
+    run_after = Column(DateTime, nullable=True)  # Not claimed before this time
+    worker_id = Column(String, nullable=True)  # Worker that claimed the job
+    files_listed = Column(Integer, default=0)  # Drive files seen so far
+    files_processed = Column(Integer, default=0)  # Files inserted, updated or failed so far
+    photos_count = Column(Integer, nullable=True)  # Photos created or updated
+    removed_count = Column(Integer, nullable=True)  # Photos removed
+    errors = Column(JSON, nullable=True)  # Per-file errors
+    error = Column(Text, nullable=True)  # Error that failed the whole job
+    created_at = Column(DateTime, server_default=func.now())
+    started_at = Column(DateTime, nullable=True)
+    heartbeat_at = Column(DateTime, nullable=True)  # Last sign of life from the worker
+    finished_at = Column(DateTime, nullable=True)
+    updated_at = Column(DateTime, server_default=func.now(), onupdate=func.now())
+
+    # Relationships
+    connection = relationship("DriveConnection")
@@ -0,0 +1,20 @@
+"""
+Reconcile denormalized favorite counts with the photo_favorites table.
+
+Run from the shutterspot_api directory, e.g. nightly from cron:
+    python -m app.database.reconcile_favorites
+
+Rebuilds Photo.favorites_count and the per-gallery selection rollup with
+set-based GROUP BY queries, one gallery per transaction. Each gallery's
+photos are locked while it is recounted, so favorites clicked meanwhile
+wait for the recount instead of being lost or counted twice.
+"""
+from app.database.database import SessionLocal
+from app.services.favorites import reconcile_favorites
+
+
+if __name__ == "__main__":
+    with SessionLocal() as db:
+        corrected, rebuilt = reconcile_favorites(db)
+        print(f"Corrected favorites count of {corrected} photos")
+        print(f"Rebuilt {rebuilt} gallery selection rows")
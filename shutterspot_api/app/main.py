@@ -1,10 +1,10 @@
 from fastapi import FastAPI
 from fastapi.middleware.cors import CORSMiddleware
-from app.database.database import engine, Base
-from app.routers import clients, shoots, proposals, client_shoots, client_proposals, drive, photos
+from app.database.database import async_engine, async_read_engine
+from app.routers import clients, shoots, proposals, client_shoots, client_proposals, drive, photos, galleries, metrics
+from app.services.query_stats import QueryStatsMiddleware
 
-# Create the database tables
-Base.metadata.create_all(bind=engine)
+# The schema is managed by migrations: run `python -m app.database.migrate` before starting
 
 # Create FastAPI app
 app = FastAPI(title="ShutterSpot API", description="API for ShutterSpot photography business management system")
@@ -16,8 +16,12 @@ app.add_middleware(
     allow_credentials=True,
     allow_methods=["*"],
     allow_headers=["*"],
+    expose_headers=["X-DB-Query-Count", "X-DB-Time-Ms", "X-DB-Slowest-Ms", "X-DB-Slowest-Query", "Server-Timing"],
 )
 
+# Count and time each request's SQL statements (headers only in debug mode)
+app.add_middleware(QueryStatsMiddleware)
+
 # Include routers
 app.include_router(clients.router, prefix="/api", tags=["clients"])
 app.include_router(shoots.router, prefix="/api", tags=["shoots"])
@@ -26,6 +30,24 @@ app.include_router(client_shoots.router, prefix="/api", tags=["client_shoots"])
 app.include_router(client_proposals.router, prefix="/api", tags=["client_proposals"])
 app.include_router(drive.router)
 app.include_router(photos.router)
+app.include_router(galleries.router)
+app.include_router(metrics.router)
+
+@app.on_event("startup")
+def start_sync_jobs():
+    drive.sync_jobs.start()
+    drive.sync_scheduler.start()
+
+@app.on_event("shutdown")
+def stop_sync_jobs():
+    drive.sync_scheduler.stop(timeout=30)
+    drive.sync_jobs.stop(timeout=30)
+    drive.drive_service.sync_engine.shutdown()
+
+@app.on_event("shutdown")
+async def close_async_engines():
+    await async_engine.dispose()
+    await async_read_engine.dispose()
 
 @app.get("/")
 async def root():
@@ -2,7 +2,7 @@ from fastapi import APIRouter, Depends, HTTPException
 from sqlalchemy.orm import Session
 from typing import List
 
-from ..database.database import get_db
+from ..database.database import get_read_db
 from ..database.models import Shoot, Client
 from ..schemas.shoot import Shoot as ShootSchema
 
@@ -13,7 +13,7 @@ router = APIRouter(
 
 
 @router.get("/{client_id}/shoots", response_model=List[ShootSchema])
-def get_shoots_by_client(client_id: int, db: Session = Depends(get_db)):
+def get_shoots_by_client(client_id: int, db: Session = Depends(get_read_db)):
     """Get all shoots for a specific client"""
     # Verify client exists
     client = db.query(Client).filter(Client.id == client_id).first()
@@ -1,8 +1,10 @@
 from fastapi import APIRouter, Depends, HTTPException, status
+from sqlalchemy import select
+from sqlalchemy.ext.asyncio import AsyncSession
 from sqlalchemy.orm import Session
 from typing import List
 
-from ..database.database import get_db
+from ..database.database import get_db, get_async_read_db
 from ..database.models import Client
 from ..schemas.client import Client as ClientSchema, ClientCreate, ClientUpdate
 
@@ -13,16 +15,16 @@ router = APIRouter(
 
 
 @router.get("/", response_model=List[ClientSchema])
-def get_clients(db: Session = Depends(get_db)):
+async def get_clients(db: AsyncSession = Depends(get_async_read_db)):
     """Get all clients"""
-    clients = db.query(Client).all()
+    clients = (await db.scalars(select(Client))).all()
     return clients
 
 
 @router.get("/{client_id}", response_model=ClientSchema)
-def get_client(client_id: int, db: Session = Depends(get_db)):
+async def get_client(client_id: int, db: AsyncSession = Depends(get_async_read_db)):
     """Get a specific client by ID"""
-    client = db.query(Client).filter(Client.id == client_id).first()
+    client = await db.get(Client, client_id)
     if client is None:
         raise HTTPException(status_code=404, detail="Client not found")
     return client
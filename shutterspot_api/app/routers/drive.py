@@ -1,9 +1,14 @@
+import asyncio
+import json
+
 from fastapi import APIRouter, Depends, HTTPException, status, Response
+from fastapi.responses import StreamingResponse
+from sqlalchemy import select
 from sqlalchemy.orm import Session
 from typing import List
 
-from app.database.database import get_db
-from app.database.models import User, DriveConnection, Gallery
+from app.database.database import get_db, get_read_db, AsyncSessionLocal
+from app.database.models import User, DriveConnection, Gallery, Photo, SyncJob
 from app.schemas.drive import (
     DriveConnectionCreate, 
     DriveConnectionUpdate, 
@@ -11,9 +16,12 @@ from app.schemas.drive import (
     DriveAuthResponse,
     DriveAuthComplete,
     DriveFolderListResponse,
-    DriveFolderResponse
+    DriveFolderResponse,
+    SyncJobResponse
 )
 from app.services.google_drive import GoogleDriveService
+from app.services.sync_jobs import SyncJobQueue, FINISHED_STATUSES
+from app.services.sync_scheduler import SyncScheduler
 from app.auth.auth import get_current_user
 
 router = APIRouter(
@@ -23,6 +31,11 @@ router = APIRouter(
 )
 
 drive_service = GoogleDriveService()
+sync_jobs = SyncJobQueue(drive_service)
+sync_scheduler = SyncScheduler(sync_jobs)
+
+# How often the job event stream checks for progress
+JOB_EVENTS_INTERVAL = 1.0
 
 @router.post("/auth", response_model=DriveAuthResponse)
 def initiate_drive_auth(
@@ -78,6 +91,15 @@ def list_drive_folders(
             detail=f"Failed to list folders: {str(e)}"
         )
 
+@router.get("/metrics")
+def get_drive_metrics(
+    current_user: User = Depends(get_current_user)
+):
+    """
+    Get request, retry and throttling counters for the Drive API client.
+    """
+    return drive_service.requests.metrics.snapshot()
+
 @router.post("/connections", response_model=DriveConnectionResponse)
 def create_drive_connection(
     connection: DriveConnectionCreate,
@@ -102,8 +124,12 @@ def create_drive_connection(
             user_id=current_user.id,
             folder_id=connection.drive_folder_id,
             gallery_id=connection.gallery_id,
-            auto_sync=connection.auto_sync
+            auto_sync=connection.auto_sync,
+            recursive=connection.recursive
         )
+        # Run the initial sync in the background
+        if drive_connection.auto_sync:
+            sync_jobs.enqueue(db, drive_connection.id, current_user.id)
         return drive_connection
     except HTTPException as e:
         raise e
@@ -116,7 +142,7 @@ def create_drive_connection(
 @router.get("/connections", response_model=List[DriveConnectionResponse])
 def list_drive_connections(
     current_user: User = Depends(get_current_user),
-    db: Session = Depends(get_db)
+    db: Session = Depends(get_read_db)
 ):
     """
     List all Google Drive connections for the current user.
@@ -130,7 +156,7 @@ def list_drive_connections(
 def get_drive_connection(
     connection_id: int,
     current_user: User = Depends(get_current_user),
-    db: Session = Depends(get_db)
+    db: Session = Depends(get_read_db)
 ):
     """
     Get a specific Google Drive connection.
@@ -171,9 +197,18 @@ def update_drive_connection(
     
     # Update fields if provided
     update_data = connection_update.dict(exclude_unset=True)
+    rescan = any(
+        key in update_data and update_data[key] != getattr(connection, key)
+        for key in ('drive_folder_id', 'recursive')
+    )
     for key, value in update_data.items():
         setattr(connection, key, value)
     
+    # The synced folders changed, so the next sync has to list them in full
+    if rescan:
+        connection.changes_page_token = None
+        connection.folder_tree = None
+    
     db.commit()
     db.refresh(connection)
     return connection
@@ -198,18 +233,28 @@ def delete_drive_connection(
             detail="Connection not found"
         )
     
+    # The synced photos stay in the gallery
+    db.query(Photo).filter(Photo.connection_id == connection.id).update({Photo.connection_id: None})
     db.delete(connection)
     db.commit()
     return {"message": "Connection deleted successfully"}
 
-@router.post("/connections/{connection_id}/sync")
+@router.post(
+    "/connections/{connection_id}/sync",
+    response_model=SyncJobResponse,
+    status_code=status.HTTP_202_ACCEPTED
+)
 def sync_drive_connection(
     connection_id: int,
+    full_rescan: bool = False,
     current_user: User = Depends(get_current_user),
     db: Session = Depends(get_db)
 ):
     """
-    Manually trigger synchronization of a Google Drive folder.
+    Queue synchronization of a Google Drive folder.
+
+    Returns the sync job immediately; poll /api/drive/jobs/{job_id} or stream
+    /api/drive/jobs/{job_id}/events to follow its progress.
     """
     connection = db.query(DriveConnection).filter(
         DriveConnection.id == connection_id,
@@ -222,16 +267,71 @@ def sync_drive_connection(
             detail="Connection not found"
         )
     
-    try:
-        photos = drive_service.sync_drive_folder(db, connection.id)
-        return {
-            "message": f"Synchronized {len(photos)} photos successfully",
-            "photos_count": len(photos)
-        }
-    except HTTPException as e:
-        raise e
-    except Exception as e:
+    return sync_jobs.enqueue(db, connection.id, current_user.id, full_rescan=full_rescan)
+
+def get_user_job(db: Session, job_id: int, user_id: int) -> SyncJob:
+    """Fetch a sync job owned by the user or raise 404."""
+    job = db.query(SyncJob).filter(
+        SyncJob.id == job_id,
+        SyncJob.user_id == user_id
+    ).first()
+    
+    if not job:
         raise HTTPException(
-            status_code=status.HTTP_500_INTERNAL_SERVER_ERROR,
-            detail=f"Failed to sync folder: {str(e)}"
+            status_code=status.HTTP_404_NOT_FOUND,
+            detail="Sync job not found"
         )
+    
+    return job
+
+# Jobs are polled right after they are queued, so they are read from the primary
+@router.get("/jobs/{job_id}", response_model=SyncJobResponse)
+def get_sync_job(
+    job_id: int,
+    current_user: User = Depends(get_current_user),
+    db: Session = Depends(get_db)
+):
+    """
+    Get the status and progress of a sync job.
+    """
+    return get_user_job(db, job_id, current_user.id)
+
+@router.get("/jobs/{job_id}/events")
+def stream_sync_job(
+    job_id: int,
+    current_user: User = Depends(get_current_user),
+    db: Session = Depends(get_db)
+):
+    """
+    Stream sync job progress as server-sent events until the job finishes.
+    """
+    get_user_job(db, job_id, current_user.id)
+    user_id = current_user.id
+
+    async def events():
+        last = None
+        while True:
+            # Poll on the event loop without blocking it; the headers are already sent,
+            # so a job that disappears ends the stream instead of raising
+            async with AsyncSessionLocal() as session:
+                job = await session.scalar(
+                    select(SyncJob).where(SyncJob.id == job_id, SyncJob.user_id == user_id)
+                )
+                if job is None:
+                    yield f"event: error\ndata: {json.dumps({'detail': 'Sync job not found'})}\n\n"
+                    return
+                payload = SyncJobResponse.model_validate(job).model_dump_json()
+                finished = job.status in FINISHED_STATUSES
+            if payload != last:
+                last = payload
+                yield f"event: progress\ndata: {payload}\n\n"
+            if finished:
+                yield f"event: done\ndata: {json.dumps({'status': json.loads(payload)['status']})}\n\n"
+                return
+            await asyncio.sleep(JOB_EVENTS_INTERVAL)
+
+    return StreamingResponse(
+        events(),
+        media_type="text/event-stream",
+        headers={"Cache-Control": "no-cache", "X-Accel-Buffering": "no"}
+    )
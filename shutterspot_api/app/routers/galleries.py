@@ -0,0 +1,118 @@
+import re
+from typing import Optional, Tuple
+
+from fastapi import APIRouter, Depends, HTTPException, Request, status
+from fastapi.responses import StreamingResponse
+from sqlalchemy.orm import Session
+
+from app.database.database import get_db
+from app.database.models import User, Gallery
+from app.auth.auth import get_optional_user
+from app.routers.drive import drive_service
+from app.services.gallery_access import get_gallery_access
+from app.services.gallery_archive import build_gallery_archive, stream_gallery_archive
+
+router = APIRouter(
+    prefix="/api/galleries",
+    tags=["galleries"],
+    responses={404: {"description": "Not found"}},
+)
+
+RANGE_PATTERN = re.compile(r"^bytes=(\d*)-(\d*)$")
+
+def parse_byte_range(header: str, total: int) -> Optional[Tuple[int, int]]:
+    """
+    Parse a single-range ``Range`` header.
+
+    Args:
+        header: The Range header value
+        total: Length of the full representation
+
+    Returns:
+        (first byte, last byte), or None if the header should be ignored
+
+    Raises:
+        HTTPException: 416 when the range lies outside the representation
+    """
+    match = RANGE_PATTERN.match(header.strip())
+    if not match or match.groups() == ("", ""):
+        return None
+    first, last = match.groups()
+    if first:
+        start = int(first)
+        end = min(int(last), total - 1) if last else total - 1
+    else:
+        start, end = max(total - int(last), 0), total - 1
+    if start >= total or start > end:
+        raise HTTPException(
+            status_code=status.HTTP_416_REQUESTED_RANGE_NOT_SATISFIABLE,
+            detail="Requested range not satisfiable",
+            headers={"Content-Range": f"bytes */{total}"}
+        )
+    return start, end
+
+@router.get("/{gallery_id}/download")
+def download_gallery(
+    gallery_id: int,
+    request: Request,
+    favorites: bool = False,
+    current_user: User = Depends(get_optional_user),
+    db: Session = Depends(get_db)
+):
+    """
+    Download a gallery's originals as a ZIP archive streamed from Drive.
+
+    With ``favorites=true`` only the photos the current user favorited are
+    included. The archive supports Range requests (with If-Range on its
+    ETag), so interrupted downloads can be resumed.
+    """
+    access = get_gallery_access(db, gallery_id)
+    if not access.can_view(current_user):
+        raise HTTPException(
+            status_code=status.HTTP_403_FORBIDDEN,
+            detail="You don't have access to this gallery"
+        )
+    if favorites and not current_user:
+        raise HTTPException(
+            status_code=status.HTTP_401_UNAUTHORIZED,
+            detail="Sign in to download your favorites"
+        )
+
+    archive = build_gallery_archive(
+        db,
+        drive_service,
+        gallery_id,
+        favorites_of=current_user.id if favorites else None
+    )
+    total = archive.layout.total_size
+
+    title = db.query(Gallery.title).filter(Gallery.id == gallery_id).scalar() or f"gallery-{gallery_id}"
+    filename = re.sub(r'[^\w\- ]+', '', title).strip() or f"gallery-{gallery_id}"
+    if favorites:
+        filename += " - favorites"
+    headers = {
+        "ETag": archive.etag,
+        "Accept-Ranges": "bytes",
+        "Cache-Control": "private, no-transform",
+        "Content-Disposition": f'attachment; filename="{filename}.zip"',
+    }
+
+    # Resume from a byte range, unless the archive changed since the client started
+    start, end = 0, total - 1
+    status_code = status.HTTP_200_OK
+    range_header = request.headers.get("range")
+    if_range = request.headers.get("if-range")
+    if range_header and (if_range is None or if_range == archive.etag):
+        byte_range = parse_byte_range(range_header, total)
+        if byte_range is not None:
+            start, end = byte_range
+            status_code = status.HTTP_206_PARTIAL_CONTENT
+            headers["Content-Range"] = f"bytes {start}-{end}/{total}"
+    headers["Content-Length"] = str(end - start + 1)
+
+    return StreamingResponse(
+        stream_gallery_archive(drive_service, archive, start, end),
+        status_code=status_code,
+        media_type="application/zip",
+        headers=headers
+    )
@@ -0,0 +1,13 @@
+from fastapi import APIRouter, Response
+from prometheus_client import CONTENT_TYPE_LATEST, generate_latest
+
+router = APIRouter(
+    tags=["metrics"],
+)
+
+@router.get("/metrics", include_in_schema=False)
+def get_metrics():
+    """
+    Expose the process's Prometheus metrics, e.g. per-route SQL query counts and timings.
+    """
+    return Response(generate_latest(), media_type=CONTENT_TYPE_LATEST)
@@ -1,20 +1,40 @@
-from fastapi import APIRouter, Depends, HTTPException, status, Response
+from fastapi import APIRouter, Depends, HTTPException, Query, Request, status, Response
+from fastapi.responses import FileResponse
 from sqlalchemy.orm import Session
-from typing import List
+from typing import List, Literal, Optional
 from datetime import datetime
-from sqlalchemy import func
+from sqlalchemy import func, select
+from sqlalchemy.ext.asyncio import AsyncSession
 
-from app.database.database import get_db
-from app.database.models import User, Photo, Gallery, photo_favorites
+from app.database.database import get_db, get_read_db, get_async_db, get_async_read_db
+from app.database.models import User, Photo, PhotoDerivative, GalleryFavoriteSelection, photo_favorites
 from app.schemas.photo import (
     PhotoCreate,
     PhotoUpdate,
     PhotoResponse,
+    PhotoPage,
     PhotoFavoriteCreate,
     PhotoFavoriteResponse,
-    PhotoFavoritesList
+    PhotoFavoritesList,
+    PhotoFavoritesBulkUpdate,
+    PhotoFavoritesBulkResponse,
+    PhotoDuplicatesList,
+    GalleryFavoritesSummary
 )
 from app.auth.auth import get_current_user, get_optional_user
+from app.services.blob_store import blob_store
+from app.services.drive_sync import DERIVATIVES
+from app.services.favorites import add_favorites, remove_favorites
+from app.services.gallery_access import (
+    get_gallery_access,
+    get_gallery_access_async,
+    get_photo_with_access,
+    get_photo_with_access_async,
+    viewable_by
+)
+from app.services.photo_pages import DEFAULT_PAGE_SIZE, MAX_PAGE_SIZE, SORT_ID, list_gallery_page_async
+from app.services.perceptual_hash import DEFAULT_MAX_DISTANCE, find_near_duplicates
+from app.services.sync_scheduler import record_gallery_view_async
 
 router = APIRouter(
     prefix="/api/photos",
@@ -22,122 +42,288 @@ router = APIRouter(
     responses={404: {"description": "Not found"}},
 )
 
+# Versioned thumbnail URLs change with the image, so they never go stale
+THUMBNAIL_CACHE_CONTROL = "max-age=31536000, immutable"
+# Unversioned or outdated URLs are revalidated against the ETag on every use
+UNVERSIONED_CACHE_CONTROL = "no-cache"
+
+# Derivative sizes rendered at sync time
+DerivativeVariant = Literal[tuple(spec.variant for spec in DERIVATIVES)]
+
 @router.get("/{photo_id}", response_model=PhotoResponse)
-def get_photo(
+async def get_photo(
     photo_id: int,
     current_user: User = Depends(get_optional_user),
-    db: Session = Depends(get_db)
+    db: AsyncSession = Depends(get_async_read_db)
 ):
     """
     Get a specific photo by ID.
     """
-    photo = db.query(Photo).filter(Photo.id == photo_id).first()
-    if not photo:
+    # Load the photo and its gallery's access rules together
+    photo, access = await get_photo_with_access_async(db, photo_id)
+    if not access.can_view(current_user):
         raise HTTPException(
-            status_code=status.HTTP_404_NOT_FOUND,
-            detail="Photo not found"
+            status_code=status.HTTP_403_FORBIDDEN,
+            detail="You don't have access to this photo"
         )
     
-    # Check if the user has access to this photo's gallery
-    gallery = db.query(Gallery).filter(Gallery.id == photo.gallery_id).first()
-    if not gallery:
+    return photo
+
+@router.get("/{photo_id}/thumbnail")
+async def get_photo_thumbnail(
+    photo_id: int,
+    request: Request,
+    variant: DerivativeVariant = Query("thumb"),
+    format: Optional[str] = Query(None, pattern="^(webp|jpeg)$"),
+    v: Optional[str] = None,
+    current_user: User = Depends(get_optional_user),
+    db: AsyncSession = Depends(get_async_read_db)
+):
+    """
+    Stream a rendered image of a photo.
+    
+    The response carries the blob digest as a strong ETag. URLs whose ``v``
+    matches the current thumbnail digest, as in ``thumbnail_url``, are
+    cacheable forever since they change with the image; other URLs must be
+    revalidated. Without an explicit format, WebP is served to clients that
+    accept it.
+    """
+    photo, access = await get_photo_with_access_async(db, photo_id)
+    if not access.can_view(current_user):
         raise HTTPException(
-            status_code=status.HTTP_404_NOT_FOUND,
-            detail="Gallery not found"
+            status_code=status.HTTP_403_FORBIDDEN,
+            detail="You don't have access to this photo"
         )
     
-    # If the user is not authenticated or not the owner, check if they have access
-    if not current_user or (current_user.id != gallery.client_id and current_user.role != "admin"):
-        # For client galleries, they need to be the client or have the password
-        if gallery.status != "Active" or (gallery.password and not current_user):
-            raise HTTPException(
-                status_code=status.HTTP_403_FORBIDDEN,
-                detail="You don't have access to this photo"
+    # Pick the encoding: the requested one, else WebP when accepted
+    available = {
+        derivative.format: derivative.blob_hash
+        for derivative in await db.execute(
+            select(PhotoDerivative.format, PhotoDerivative.blob_hash).where(
+                PhotoDerivative.photo_id == photo_id,
+                PhotoDerivative.variant == variant
             )
+        )
+    }
+    if variant == "thumb" and photo.thumbnail_hash:
+        available.setdefault("jpeg", photo.thumbnail_hash)
     
-    return photo
+    preferred = [format] if format else (
+        ["webp", "jpeg"] if "image/webp" in request.headers.get("accept", "") else ["jpeg", "webp"]
+    )
+    image_format = next((candidate for candidate in preferred if candidate in available), None)
+    if image_format is None:
+        raise HTTPException(
+            status_code=status.HTTP_404_NOT_FOUND,
+            detail="Thumbnail not found"
+        )
+    
+    # Only publicly viewable galleries may be cached by shared caches
+    is_public = access.is_public
+    digest = available[image_format]
+    is_current = bool(v) and bool(photo.thumbnail_hash) and v == photo.thumbnail_hash[:16]
+    cache_control = THUMBNAIL_CACHE_CONTROL if is_current else UNVERSIONED_CACHE_CONTROL
+    headers = {
+        "ETag": f'"{digest}"',
+        "Cache-Control": f"{'public' if is_public else 'private'}, {cache_control}",
+        "Vary": "Accept",
+    }
+    
+    # Answer conditional requests without touching the blob
+    if_none_match = request.headers.get("if-none-match")
+    if if_none_match:
+        tags = {tag.strip().removeprefix("W/") for tag in if_none_match.split(",")}
+        if "*" in tags or headers["ETag"] in tags:
+            return Response(status_code=status.HTTP_304_NOT_MODIFIED, headers=headers)
+    
+    return FileResponse(
+        blob_store.path(digest),
+        media_type=f"image/{image_format}",
+        headers=headers
+    )
 
-@router.get("/gallery/{gallery_id}", response_model=List[PhotoResponse])
-def list_photos_by_gallery(
+@router.get("/gallery/{gallery_id}", response_model=PhotoPage)
+async def list_photos_by_gallery(
     gallery_id: int,
+    sort: str = Query(SORT_ID, pattern="^(id|-?captured_at)$"),
+    cursor: Optional[str] = None,
+    limit: int = Query(DEFAULT_PAGE_SIZE, ge=1, le=MAX_PAGE_SIZE),
+    camera_model: Optional[str] = None,
+    lens_model: Optional[str] = None,
     current_user: User = Depends(get_optional_user),
-    db: Session = Depends(get_db)
+    db: AsyncSession = Depends(get_async_read_db),
+    write_db: AsyncSession = Depends(get_async_db)
 ):
     """
-    List all photos in a gallery.
+    List a page of photos in a gallery.
+    
+    Pages are keyset-paginated: pass the returned ``next_cursor`` back as
+    ``cursor`` to get the next page. ``sort=captured_at`` (or
+    ``-captured_at`` for newest first) orders photos by EXIF capture time;
+    the default is sync order. Photos can be filtered by camera model and lens.
     """
-    gallery = db.query(Gallery).filter(Gallery.id == gallery_id).first()
-    if not gallery:
+    # Check if the user has access to this gallery
+    if not (await get_gallery_access_async(db, gallery_id)).can_view(current_user):
         raise HTTPException(
-            status_code=status.HTTP_404_NOT_FOUND,
-            detail="Gallery not found"
+            status_code=status.HTTP_403_FORBIDDEN,
+            detail="You don't have access to this gallery"
         )
     
-    # Check if the user has access to this gallery
-    if not current_user or (current_user.id != gallery.client_id and current_user.role != "admin"):
-        # For client galleries, they need to be the client or have the password
-        if gallery.status != "Active" or (gallery.password and not current_user):
-            raise HTTPException(
-                status_code=status.HTTP_403_FORBIDDEN,
-                detail="You don't have access to this gallery"
-            )
+    # Keep galleries that clients are looking at fresh
+    await record_gallery_view_async(write_db, gallery_id)
     
-    photos = db.query(Photo).filter(Photo.gallery_id == gallery_id).all()
-    return photos
+    statement = select(Photo).where(Photo.gallery_id == gallery_id)
+    if camera_model is not None:
+        statement = statement.where(Photo.camera_model == camera_model)
+    if lens_model is not None:
+        statement = statement.where(Photo.lens_model == lens_model)
+    
+    photos, next_cursor = await list_gallery_page_async(db, statement, sort=sort, cursor=cursor, limit=limit)
+    return {"photos": photos, "next_cursor": next_cursor}
 
-@router.post("/{photo_id}/favorite", response_model=PhotoFavoriteResponse)
-def favorite_photo(
-    photo_id: int,
+@router.get("/gallery/{gallery_id}/favorites/summary", response_model=GalleryFavoritesSummary)
+async def get_gallery_favorites_summary(
+    gallery_id: int,
+    top: int = Query(20, ge=1, le=200),
     current_user: User = Depends(get_current_user),
-    db: Session = Depends(get_db)
+    db: AsyncSession = Depends(get_async_read_db)
 ):
     """
-    Mark a photo as a favorite.
+    Summarize a gallery's client selects: the most-favorited photos and how
+    many photos each user selected.
+    
+    Both come from maintained rollups (the photos' favorites counts and
+    gallery_favorite_selections) read through indexes, not from scanning
+    photo_favorites.
     """
-    # Check if the photo exists
-    photo = db.query(Photo).filter(Photo.id == photo_id).first()
-    if not photo:
+    # Only allow the gallery owner or admin to see who selected what
+    if not (await get_gallery_access_async(db, gallery_id)).can_manage(current_user):
         raise HTTPException(
-            status_code=status.HTTP_404_NOT_FOUND,
-            detail="Photo not found"
+            status_code=status.HTTP_403_FORBIDDEN,
+            detail="You don't have permission to view this gallery's favorites"
         )
     
-    # Check if the user has access to this photo's gallery
-    gallery = db.query(Gallery).filter(Gallery.id == photo.gallery_id).first()
-    if not gallery:
-        raise HTTPException(
-            status_code=status.HTTP_404_NOT_FOUND,
-            detail="Gallery not found"
+    top_photos = (await db.execute(
+        select(Photo.id, Photo.filename, Photo.favorites_count).where(
+            Photo.gallery_id == gallery_id,
+            Photo.favorites_count > 0
+        ).order_by(
+            Photo.favorites_count.desc(),
+            Photo.id.desc()
+        ).limit(top)
+    )).all()
+    
+    selections = (await db.execute(
+        select(
+            GalleryFavoriteSelection.user_id,
+            User.username,
+            User.name,
+            GalleryFavoriteSelection.selected_count
+        ).outerjoin(
+            User, User.id == GalleryFavoriteSelection.user_id
+        ).where(
+            GalleryFavoriteSelection.gallery_id == gallery_id
+        ).order_by(
+            GalleryFavoriteSelection.selected_count.desc()
         )
+    )).all()
     
-    # Check if the user already favorited this photo
-    existing_favorite = db.query(photo_favorites).filter(
-        photo_favorites.c.photo_id == photo_id,
-        photo_favorites.c.user_id == current_user.id
-    ).first()
+    return {
+        "gallery_id": gallery_id,
+        "top_photos": [
+            {
+                "photo_id": photo_id,
+                "filename": filename,
+                "favorites_count": favorites_count
+            } for photo_id, filename, favorites_count in top_photos
+        ],
+        "selections": [
+            {
+                "user_id": user_id,
+                "username": username,
+                "name": name,
+                "selected_count": selected_count
+            } for user_id, username, name, selected_count in selections
+        ]
+    }
+
+# Hash matching is CPU-bound, so this stays a sync route on the threadpool
+@router.get("/gallery/{gallery_id}/duplicates", response_model=PhotoDuplicatesList)
+def list_gallery_duplicates(
+    gallery_id: int,
+    max_distance: int = Query(DEFAULT_MAX_DISTANCE, ge=0, le=32),
+    current_user: User = Depends(get_current_user),
+    db: Session = Depends(get_read_db)
+):
+    """
+    List near-duplicate photos in a gallery by perceptual hash distance.
     
-    if existing_favorite:
+    Each duplicate is paired with the earliest photo it matches, so the
+    earlier copy is the one to keep.
+    """
+    # Only allow the gallery owner or admin to review duplicates
+    if not get_gallery_access(db, gallery_id).can_manage(current_user):
         raise HTTPException(
-            status_code=status.HTTP_400_BAD_REQUEST,
-            detail="Photo already favorited"
+            status_code=status.HTTP_403_FORBIDDEN,
+            detail="You don't have permission to view duplicates"
         )
     
-    # Add the favorite
-    stmt = photo_favorites.insert().values(
-        photo_id=photo_id,
-        user_id=current_user.id,
-        created_at=datetime.utcnow()
+    rows = db.query(Photo.id, Photo.perceptual_hash).filter(
+        Photo.gallery_id == gallery_id,
+        Photo.perceptual_hash != None
+    ).order_by(Photo.id).all()
+    duplicates = find_near_duplicates(
+        [photo_id for photo_id, _ in rows],
+        [perceptual_hash for _, perceptual_hash in rows],
+        max_distance
     )
-    db.execute(stmt)
     
-    # Update the favorites count
-    photo.favorites_count += 1
+    return {
+        "max_distance": max_distance,
+        "duplicates": [
+            {
+                "photo_id": photo_id,
+                "duplicate_of": original_id,
+                "distance": distance
+            } for photo_id, original_id, distance in duplicates
+        ]
+    }
+
+@router.post("/{photo_id}/favorite", response_model=PhotoFavoriteResponse)
+def favorite_photo(
+    photo_id: int,
+    current_user: User = Depends(get_current_user),
+    db: Session = Depends(get_db)
+):
+    """
+    Mark a photo as a favorite.
+    
+    Idempotent: favoriting a photo twice returns the existing favorite.
+    """
+    # The access check is folded into the insert: photos in galleries the
+    # user cannot view are skipped
+    added = add_favorites(db, current_user.id, [photo_id], gallery_filter=viewable_by(current_user))
     db.commit()
     
+    created_at = None
+    if not added:
+        # Already favorited, or not allowed: find out which
+        created_at = db.query(photo_favorites.c.created_at).filter(
+            photo_favorites.c.photo_id == photo_id,
+            photo_favorites.c.user_id == current_user.id
+        ).scalar()
+        if created_at is None:
+            # Raises 404 when the photo or its gallery does not exist
+            get_photo_with_access(db, photo_id)
+            raise HTTPException(
+                status_code=status.HTTP_403_FORBIDDEN,
+                detail="You don't have access to this photo"
+            )
+    
     return {
         "photo_id": photo_id,
         "user_id": current_user.id,
-        "created_at": datetime.utcnow()
+        "created_at": created_at or datetime.utcnow()
     }
 
 @router.delete("/{photo_id}/favorite")
@@ -149,76 +335,64 @@ def unfavorite_photo(
     """
     Remove a photo from favorites.
     """
-    # Check if the photo exists
-    photo = db.query(Photo).filter(Photo.id == photo_id).first()
-    if not photo:
+    removed = remove_favorites(db, current_user.id, [photo_id])
+    db.commit()
+    
+    if not removed:
         raise HTTPException(
             status_code=status.HTTP_404_NOT_FOUND,
-            detail="Photo not found"
+            detail="Favorite not found"
         )
     
-    # Check if the favorite exists
-    existing_favorite = db.query(photo_favorites).filter(
-        photo_favorites.c.photo_id == photo_id,
-        photo_favorites.c.user_id == current_user.id
-    ).first()
+    return {"message": "Photo removed from favorites"}
+
+@router.post("/favorites/bulk", response_model=PhotoFavoritesBulkResponse)
+def bulk_update_favorites(
+    changes: PhotoFavoritesBulkUpdate,
+    current_user: User = Depends(get_current_user),
+    db: Session = Depends(get_db)
+):
+    """
+    Favorite and unfavorite many photos in one transaction.
     
-    if not existing_favorite:
+    Meant for proofing, where a client toggles hundreds of selections at
+    once. Photos already in the requested state are skipped, so the request
+    can safely be retried. Photos in galleries the user cannot view are
+    skipped.
+    """
+    if set(changes.add) & set(changes.remove):
         raise HTTPException(
-            status_code=status.HTTP_404_NOT_FOUND,
-            detail="Favorite not found"
+            status_code=status.HTTP_400_BAD_REQUEST,
+            detail="A photo cannot be both added and removed"
         )
     
-    # Remove the favorite
-    stmt = photo_favorites.delete().where(
-        photo_favorites.c.photo_id == photo_id,
-        photo_favorites.c.user_id == current_user.id
-    )
-    db.execute(stmt)
-    
-    # Update the favorites count
-    if photo.favorites_count > 0:
-        photo.favorites_count -= 1
+    added = add_favorites(db, current_user.id, changes.add, gallery_filter=viewable_by(current_user))
+    removed = remove_favorites(db, current_user.id, changes.remove)
     db.commit()
     
-    return {"message": "Photo removed from favorites"}
+    return {"added": added, "removed": removed}
 
 @router.get("/{photo_id}/favorites", response_model=PhotoFavoritesList)
-def get_photo_favorites(
+async def get_photo_favorites(
     photo_id: int,
     current_user: User = Depends(get_current_user),
-    db: Session = Depends(get_db)
+    db: AsyncSession = Depends(get_async_read_db)
 ):
     """
     Get all users who favorited a photo.
     """
-    # Check if the photo exists
-    photo = db.query(Photo).filter(Photo.id == photo_id).first()
-    if not photo:
-        raise HTTPException(
-            status_code=status.HTTP_404_NOT_FOUND,
-            detail="Photo not found"
-        )
-    
-    # Check if the user has access to this photo's gallery
-    gallery = db.query(Gallery).filter(Gallery.id == photo.gallery_id).first()
-    if not gallery:
-        raise HTTPException(
-            status_code=status.HTTP_404_NOT_FOUND,
-            detail="Gallery not found"
-        )
-    
     # Only allow the gallery owner or admin to see favorites
-    if current_user.id != gallery.client_id and current_user.role != "admin":
+    _, access = await get_photo_with_access_async(db, photo_id)
+    if not access.can_manage(current_user):
         raise HTTPException(
             status_code=status.HTTP_403_FORBIDDEN,
             detail="You don't have permission to view favorites"
         )
     
     # Get all favorites for this photo
-    favorites = db.query(photo_favorites).filter(
-        photo_favorites.c.photo_id == photo_id
-    ).all()
+    favorites = (await db.execute(
+        select(photo_favorites).where(photo_favorites.c.photo_id == photo_id)
+    )).all()
     
     return {
         "favorites": [
@@ -231,19 +405,21 @@ def get_photo_favorites(
     }
 
 @router.get("/user/favorites", response_model=List[PhotoResponse])
-def get_user_favorite_photos(
+async def get_user_favorite_photos(
     current_user: User = Depends(get_current_user),
-    db: Session = Depends(get_db)
+    db: AsyncSession = Depends(get_async_read_db)
 ):
     """
     Get all photos favorited by the current user.
     """
     # Query photos that the user has favorited
-    favorited_photos = db.query(Photo).join(
-        photo_favorites,
-        Photo.id == photo_favorites.c.photo_id
-    ).filter(
-        photo_favorites.c.user_id == current_user.id
-    ).all()
+    favorited_photos = (await db.scalars(
+        select(Photo).join(
+            photo_favorites,
+            Photo.id == photo_favorites.c.photo_id
+        ).where(
+            photo_favorites.c.user_id == current_user.id
+        )
+    )).all()
     
     return favorited_photos
@@ -2,7 +2,7 @@ from fastapi import APIRouter, Depends, HTTPException, status
 from sqlalchemy.orm import Session
 from typing import List
 
-from ..database.database import get_db
+from ..database.database import get_db, get_read_db
 from ..database.models import Proposal, Client
 from ..schemas.proposal import Proposal as ProposalSchema, ProposalCreate, ProposalUpdate
 
@@ -13,14 +13,14 @@ router = APIRouter(
 
 
 @router.get("/", response_model=List[ProposalSchema])
-def get_proposals(db: Session = Depends(get_db)):
+def get_proposals(db: Session = Depends(get_read_db)):
     """Get all proposals"""
     proposals = db.query(Proposal).all()
     return proposals
 
 
 @router.get("/{proposal_id}", response_model=ProposalSchema)
-def get_proposal(proposal_id: int, db: Session = Depends(get_db)):
+def get_proposal(proposal_id: int, db: Session = Depends(get_read_db)):
     """Get a specific proposal by ID"""
     proposal = db.query(Proposal).filter(Proposal.id == proposal_id).first()
     if proposal is None:
@@ -1,9 +1,11 @@
 from fastapi import APIRouter, Depends, HTTPException, status, Query
+from sqlalchemy import select
+from sqlalchemy.ext.asyncio import AsyncSession
 from sqlalchemy.orm import Session
 from typing import List, Optional
 from datetime import date
 
-from ..database.database import get_db
+from ..database.database import get_db, get_async_read_db
 from ..database.models import Shoot, Client
 from ..schemas.shoot import Shoot as ShootSchema, ShootCreate, ShootUpdate
 
@@ -14,27 +16,27 @@ router = APIRouter(
 
 
 @router.get("/", response_model=List[ShootSchema])
-def get_shoots(db: Session = Depends(get_db)):
+async def get_shoots(db: AsyncSession = Depends(get_async_read_db)):
     """Get all shoots"""
-    shoots = db.query(Shoot).all()
+    shoots = (await db.scalars(select(Shoot))).all()
     return shoots
 
 
 @router.get("/upcoming", response_model=List[ShootSchema])
-def get_upcoming_shoots(limit: Optional[int] = Query(None), db: Session = Depends(get_db)):
+async def get_upcoming_shoots(limit: Optional[int] = Query(None), db: AsyncSession = Depends(get_async_read_db)):
     """Get upcoming shoots with optional limit"""
-    query = db.query(Shoot).filter(Shoot.date >= date.today()).order_by(Shoot.date)
+    statement = select(Shoot).where(Shoot.date >= date.today()).order_by(Shoot.date)
     
     if limit:
-        query = query.limit(limit)
+        statement = statement.limit(limit)
     
-    return query.all()
+    return (await db.scalars(statement)).all()
 
 
 @router.get("/{shoot_id}", response_model=ShootSchema)
-def get_shoot(shoot_id: int, db: Session = Depends(get_db)):
+async def get_shoot(shoot_id: int, db: AsyncSession = Depends(get_async_read_db)):
     """Get a specific shoot by ID"""
-    shoot = db.query(Shoot).filter(Shoot.id == shoot_id).first()
+    shoot = await db.get(Shoot, shoot_id)
     if shoot is None:
         raise HTTPException(status_code=404, detail="Shoot not found")
     return shoot
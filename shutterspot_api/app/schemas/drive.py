@@ -6,6 +6,7 @@ class DriveConnectionBase(BaseModel):
     gallery_id: int
     drive_folder_id: str
     auto_sync: bool = True
+    recursive: bool = False
 
 class DriveConnectionCreate(DriveConnectionBase):
     pass
@@ -15,6 +16,7 @@ class DriveConnectionUpdate(BaseModel):
     drive_folder_id: Optional[str] = None
     drive_folder_name: Optional[str] = None
     auto_sync: Optional[bool] = None
+    recursive: Optional[bool] = None
 
 class DriveConnectionResponse(DriveConnectionBase):
     id: int
@@ -25,7 +27,7 @@ class DriveConnectionResponse(DriveConnectionBase):
     updated_at: datetime
 
     class Config:
-        orm_mode = True
+        from_attributes = True
 
 class DriveAuthResponse(BaseModel):
     auth_url: str
@@ -41,3 +43,28 @@ class DriveFolderResponse(BaseModel):
 
 class DriveFolderListResponse(BaseModel):
     folders: List[DriveFolderResponse]
+
+class SyncJobError(BaseModel):
+    file_id: str
+    filename: Optional[str] = None
+    error: str
+
+class SyncJobResponse(BaseModel):
+    id: int
+    connection_id: int
+    status: str
+    full_rescan: bool = False
+    attempts: int = 0
+    run_after: Optional[datetime] = None
+    files_listed: int = 0
+    files_processed: int = 0
+    photos_count: Optional[int] = None
+    removed_count: Optional[int] = None
+    errors: Optional[List[SyncJobError]] = None
+    error: Optional[str] = None
+    created_at: Optional[datetime] = None
+    started_at: Optional[datetime] = None
+    finished_at: Optional[datetime] = None
+
+    class Config:
+        from_attributes = True
@@ -1,7 +1,6 @@
-from pydantic import BaseModel, Field
-from typing import Optional, List
+from pydantic import BaseModel, Field, model_validator
+from typing import Optional, List, Dict
 from datetime import datetime
-import base64
 
 class PhotoBase(BaseModel):
     gallery_id: int
@@ -23,29 +22,37 @@ class PhotoResponse(PhotoBase):
     id: int
     drive_file_id: Optional[str] = None
     drive_modified: Optional[str] = None
+    folder_path: Optional[str] = None
     url: Optional[str] = None
     favorites_count: int
+    duplicate_of: Optional[int] = None
+    captured_at: Optional[datetime] = None
+    camera_make: Optional[str] = None
+    camera_model: Optional[str] = None
+    lens_model: Optional[str] = None
+    orientation: Optional[int] = None
+    width: Optional[int] = None
+    height: Optional[int] = None
+    derivative_variants: Optional[Dict[str, List[str]]] = None
     created_at: datetime
     updated_at: datetime
+    thumbnail_hash: Optional[str] = Field(None, exclude=True)
     thumbnail_url: Optional[str] = None  # We'll generate this dynamically
 
     class Config:
-        orm_mode = True
-
-    @classmethod
-    def from_orm(cls, obj):
-        # Create a standard model instance
-        instance = super().from_orm(obj)
-        
-        # Add a thumbnail URL if thumbnail data exists
-        if hasattr(obj, 'thumbnail') and obj.thumbnail:
-            # For API responses, we'll generate a data URL
-            # In a real app, you might want to serve these through a proper endpoint
-            mime_type = "image/jpeg"  # Assuming JPEG format
-            thumbnail_b64 = base64.b64encode(obj.thumbnail).decode('utf-8')
-            instance.thumbnail_url = f"data:{mime_type};base64,{thumbnail_b64}"
-            
-        return instance
+        from_attributes = True
+
+    @model_validator(mode='after')
+    def set_thumbnail_url(self):
+        # Point at the cacheable thumbnail endpoint. The content digest in the
+        # URL changes whenever the thumbnail does, so it can be cached forever.
+        if self.thumbnail_hash and not self.thumbnail_url:
+            self.thumbnail_url = f"/api/photos/{self.id}/thumbnail?variant=thumb&v={self.thumbnail_hash[:16]}"
+        return self
+
+class PhotoPage(BaseModel):
+    photos: List[PhotoResponse]
+    next_cursor: Optional[str] = None  # Pass back as ?cursor= for the next page; None on the last page
 
 class PhotoFavoriteCreate(BaseModel):
     photo_id: int
@@ -56,7 +63,43 @@ class PhotoFavoriteResponse(BaseModel):
     created_at: datetime
 
     class Config:
-        orm_mode = True
+        from_attributes = True
 
 class PhotoFavoritesList(BaseModel):
     favorites: List[PhotoFavoriteResponse]
+
+# Largest number of photos one bulk favorites request may change
+MAX_BULK_FAVORITES = 1000
+
+class PhotoFavoritesBulkUpdate(BaseModel):
+    add: List[int] = Field(default_factory=list, max_length=MAX_BULK_FAVORITES)
+    remove: List[int] = Field(default_factory=list, max_length=MAX_BULK_FAVORITES)
+
+class PhotoFavoritesBulkResponse(BaseModel):
+    added: List[int]  # Photos newly favorited; already-favorited ones are left out
+    removed: List[int]  # Photos unfavorited; ones that were not favorited are left out
+
+class FavoritePhotoCount(BaseModel):
+    photo_id: int
+    filename: str
+    favorites_count: int
+
+class FavoriteSelectionCount(BaseModel):
+    user_id: int
+    username: Optional[str] = None
+    name: Optional[str] = None
+    selected_count: int
+
+class GalleryFavoritesSummary(BaseModel):
+    gallery_id: int
+    top_photos: List[FavoritePhotoCount]
+    selections: List[FavoriteSelectionCount]
+
+class PhotoDuplicateResponse(BaseModel):
+    photo_id: int
+    duplicate_of: int
+    distance: int
+
+class PhotoDuplicatesList(BaseModel):
+    max_distance: int
+    duplicates: List[PhotoDuplicateResponse]
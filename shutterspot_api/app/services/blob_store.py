@@ -0,0 +1,171 @@
+"""
+Content-addressed on-disk store for thumbnails and other derived images.
+Blobs are stored once per SHA-256 digest and reference-counted in the
+``blobs`` table, so identical images are deduplicated and rows only keep
+the digest and size.
+"""
+import hashlib
+import os
+import tempfile
+import time
+from collections import Counter
+from typing import Iterable, List, Tuple
+
+from sqlalchemy import bindparam, delete, select
+from sqlalchemy.dialects.postgresql import insert as postgresql_insert
+from sqlalchemy.dialects.sqlite import insert as sqlite_insert
+from sqlalchemy.orm import Session
+
+from app.database.models import Blob
+
+# Where blobs live on disk
+DEFAULT_BLOB_ROOT = "./blobs"
+
+# Unreferenced blobs are only removed once they have been untouched this long,
+# so a writer that has just reused a blob is not raced by garbage collection
+GC_GRACE_PERIOD = 60 * 60
+
+_UPSERTS = {
+    'sqlite': sqlite_insert,
+    'postgresql': postgresql_insert,
+}
+
+
+class BlobStore:
+    """Deduplicated, reference-counted blob storage keyed by SHA-256."""
+
+    def __init__(self, root: str = DEFAULT_BLOB_ROOT):
+        """
+        Initialize the blob store.
+
+        Args:
+            root: Directory holding the blob files
+        """
+        self.root = root
+
+    def path(self, digest: str) -> str:
+        """Path of a blob, fanned out by digest prefix to keep directories small."""
+        return os.path.join(self.root, digest[:2], digest[2:4], digest)
+
+    def write(self, data: bytes) -> str:
+        """
+        Store blob contents on disk if not already present.
+
+        This only writes the file; callers record the reference with
+        ``add_refs`` in the same transaction as the rows pointing at it.
+
+        Args:
+            data: The blob contents
+
+        Returns:
+            The SHA-256 hex digest of the contents
+        """
+        digest = hashlib.sha256(data).hexdigest()
+        path = self.path(digest)
+        try:
+            # Mark the blob as recently used so garbage collection leaves it
+            os.utime(path)
+            return digest
+        except FileNotFoundError:
+            pass
+
+        os.makedirs(os.path.dirname(path), exist_ok=True)
+        fd, tmp_path = tempfile.mkstemp(dir=os.path.dirname(path), suffix='.tmp')
+        try:
+            with os.fdopen(fd, 'wb') as blob:
+                blob.write(data)
+            os.replace(tmp_path, path)
+        except BaseException:
+            os.unlink(tmp_path)
+            raise
+        return digest
+
+    def read(self, digest: str) -> bytes:
+        """Read a blob's contents."""
+        with open(self.path(digest), 'rb') as blob:
+            return blob.read()
+
+    def add_refs(self, db: Session, blobs: Iterable[Tuple[str, int]]) -> None:
+        """
+        Add one reference per ``(digest, size)`` pair, creating blob rows as needed.
+
+        Does not commit; the references belong to the caller's transaction.
+        """
+        blobs = list(blobs)
+        counts = Counter(digest for digest, _ in blobs)
+        sizes = dict(blobs)
+        if not counts:
+            return
+
+        upsert = _UPSERTS[db.get_bind().dialect.name](Blob)
+        upsert = upsert.on_conflict_do_update(
+            index_elements=[Blob.hash],
+            set_={'ref_count': Blob.ref_count + upsert.excluded.ref_count}
+        )
+        db.execute(upsert, [
+            {'hash': digest, 'size': sizes[digest], 'ref_count': count}
+            for digest, count in counts.items()
+        ])
+
+    def release(self, db: Session, digests: Iterable[str]) -> None:
+        """
+        Drop one reference per digest. Does not commit.
+
+        Blobs whose count reaches zero are removed by ``collect_garbage``,
+        which ``python -m app.database.collect_blobs`` runs.
+        """
+        counts = Counter(digest for digest in digests if digest)
+        if not counts:
+            return
+
+        blobs = Blob.__table__
+        db.execute(
+            blobs.update()
+            .where(blobs.c.hash == bindparam('digest'))
+            .values(ref_count=blobs.c.ref_count - bindparam('count')),
+            [{'digest': digest, 'count': count} for digest, count in counts.items()]
+        )
+
+    def collect_garbage(self, db: Session, grace_period: float = GC_GRACE_PERIOD) -> List[str]:
+        """
+        Delete unreferenced blobs whose files have not been touched recently.
+
+        Args:
+            db: Database session
+            grace_period: Seconds a blob file must be untouched before removal
+
+        Returns:
+            Digests of the removed blobs
+        """
+        cutoff = time.time() - grace_period
+        candidates = db.execute(select(Blob.hash).where(Blob.ref_count <= 0)).scalars().all()
+
+        expired = []
+        for digest in candidates:
+            try:
+                if os.path.getmtime(self.path(digest)) > cutoff:
+                    continue
+            except FileNotFoundError:
+                pass
+            expired.append(digest)
+
+        # A blob referenced again since it was selected is not deleted, so
+        # only the files of the rows actually deleted are unlinked
+        removed = []
+        for i in range(0, len(expired), 500):
+            removed.extend(db.execute(
+                delete(Blob)
+                .where(Blob.hash.in_(expired[i:i + 500]), Blob.ref_count <= 0)
+                .returning(Blob.hash)
+            ).scalars().all())
+        db.commit()
+
+        for digest in removed:
+            try:
+                os.unlink(self.path(digest))
+            except FileNotFoundError:
+                pass
+        return removed
+
+
+blob_store = BlobStore()
@@ -0,0 +1,204 @@
+"""
+Per-user cache of Google Drive credentials and API service objects.
+Token files are read once per TTL instead of on every call, and refreshing
+an expired token is single-flight per user and saved to the token file,
+including refreshes the API transports make when a token expires mid-sync.
+"""
+import json
+import os
+import tempfile
+import threading
+import time
+from dataclasses import dataclass, field
+from typing import Any, Dict, Optional
+
+from google.oauth2.credentials import Credentials
+from google.auth.transport.requests import Request
+from googleapiclient.discovery import build
+from fastapi import HTTPException
+
+# How long a user's credentials and services stay cached without being used
+DEFAULT_CLIENT_TTL = 15 * 60
+
+
+class _UserCredentials(Credentials):
+    """Credentials that refresh under their user's lock and save the new token."""
+
+    cache: "DriveClientCache"
+    user_id: int
+
+    def refresh(self, request) -> None:
+        """Refresh the token, unless another thread did while we waited for the lock."""
+        stale_token = self.token
+        with self.cache.user_lock(self.user_id):
+            if self.token == stale_token:
+                self.refresh_locked(request)
+
+    def refresh_locked(self, request) -> None:
+        """Refresh the token and save it; the caller holds the user's lock."""
+        super().refresh(request)
+        self.cache._write_token(self.user_id, self)
+
+
+@dataclass
+class _CachedClient:
+    credentials: Credentials
+    expires_at: float
+    # Service objects are not thread-safe, so each thread gets its own
+    services: Dict[int, Any] = field(default_factory=dict)
+
+
+class DriveClientCache:
+    """
+    Thread-safe, TTL-evicted cache of per-user Drive credentials and services.
+    """
+
+    def __init__(self, token_path: str, scopes: list, ttl: float = DEFAULT_CLIENT_TTL):
+        """
+        Initialize the cache.
+
+        Args:
+            token_path: Directory holding the ``token_{user_id}.json`` files
+            scopes: OAuth scopes to load the credentials with
+            ttl: Seconds an unused entry is kept before it is evicted
+        """
+        self.token_path = token_path
+        self.scopes = scopes
+        self.ttl = ttl
+        self._clients: Dict[int, _CachedClient] = {}
+        self._lock = threading.Lock()
+        self._user_locks: Dict[int, threading.Lock] = {}
+
+    def token_file(self, user_id: int) -> str:
+        """Path of the stored token for a user."""
+        return f"{self.token_path}/token_{user_id}.json"
+
+    def user_lock(self, user_id: int) -> threading.Lock:
+        """Lock serializing token refreshes and token file writes for a user."""
+        with self._lock:
+            lock = self._user_locks.get(user_id)
+            if lock is None:
+                lock = self._user_locks[user_id] = threading.Lock()
+            return lock
+
+    def _get_entry(self, user_id: int) -> Optional[_CachedClient]:
+        """Return a live cache entry for the user, evicting expired entries."""
+        now = time.monotonic()
+        with self._lock:
+            expired = [uid for uid, entry in self._clients.items() if entry.expires_at <= now]
+            for uid in expired:
+                del self._clients[uid]
+            # Drop the locks of users no longer cached, unless a refresh holds them
+            idle = [
+                uid for uid, lock in self._user_locks.items()
+                if uid not in self._clients and not lock.locked()
+            ]
+            for uid in idle:
+                del self._user_locks[uid]
+
+            entry = self._clients.get(user_id)
+            if entry is not None:
+                entry.expires_at = now + self.ttl
+            return entry
+
+    def invalidate(self, user_id: int) -> None:
+        """Drop the cached credentials and services for a user."""
+        with self._lock:
+            self._clients.pop(user_id, None)
+
+    def save_credentials(self, user_id: int, creds: Credentials) -> None:
+        """
+        Atomically write a user's token file and replace the cached entry.
+
+        Callers that already hold the user's lock must use ``_write_token``.
+        """
+        with self.user_lock(user_id):
+            self._write_token(user_id, creds)
+        self.invalidate(user_id)
+
+    def _write_token(self, user_id: int, creds: Credentials) -> None:
+        """Write the token file via a temp file so readers never see a partial write."""
+        token_file = self.token_file(user_id)
+        fd, tmp_path = tempfile.mkstemp(dir=os.path.dirname(token_file) or '.', suffix='.tmp')
+        try:
+            with os.fdopen(fd, 'w') as token:
+                token.write(creds.to_json())
+            os.replace(tmp_path, token_file)
+        except BaseException:
+            os.unlink(tmp_path)
+            raise
+
+    def get_credentials(self, user_id: int) -> Credentials:
+        """
+        Get valid credentials for a user, loading or refreshing them if needed.
+
+        Only one thread refreshes a given user's token; others wait for it and
+        reuse the result.
+
+        Args:
+            user_id: The ID of the user
+
+        Returns:
+            Credentials object for Google Drive API
+        """
+        entry = self._get_entry(user_id)
+        if entry is not None and entry.credentials.valid:
+            return entry.credentials
+
+        with self.user_lock(user_id):
+            # Another thread may have loaded or refreshed while we waited
+            entry = self._get_entry(user_id)
+            if entry is not None and entry.credentials.valid:
+                return entry.credentials
+
+            creds = entry.credentials if entry is not None else None
+            token_file = self.token_file(user_id)
+            if creds is None and os.path.exists(token_file):
+                with open(token_file, 'r') as token:
+                    creds = _UserCredentials.from_authorized_user_info(json.load(token), self.scopes)
+                creds.cache = self
+                creds.user_id = user_id
+
+            # If credentials don't exist or are invalid, raise an exception
+            if not creds or not creds.valid:
+                if creds and creds.expired and creds.refresh_token:
+                    creds.refresh_locked(Request())
+                else:
+                    self.invalidate(user_id)
+                    raise HTTPException(
+                        status_code=401,
+                        detail="Google Drive authorization required"
+                    )
+
+            with self._lock:
+                if entry is not None and entry.credentials is creds:
+                    entry.expires_at = time.monotonic() + self.ttl
+                    self._clients[user_id] = entry
+                else:
+                    self._clients[user_id] = _CachedClient(creds, time.monotonic() + self.ttl)
+            return creds
+
+    def get_service(self, user_id: int):
+        """
+        Get a Drive v3 service object for a user, cached per calling thread.
+
+        The credentials are refreshed before the service is handed out; when
+        they expire while it is in use, the transport's refresh also takes
+        the user's lock and saves the token.
+
+        Args:
+            user_id: The ID of the user
+
+        Returns:
+            Drive v3 service object
+        """
+        creds = self.get_credentials(user_id)
+        entry = self._get_entry(user_id)
+        thread_id = threading.get_ident()
+
+        service = entry.services.get(thread_id) if entry is not None else None
+        if service is None:
+            service = build('drive', 'v3', credentials=creds, cache_discovery=False)
+            if entry is not None and entry.credentials is creds:
+                entry.services[thread_id] = service
+        return service
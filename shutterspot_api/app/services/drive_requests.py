@@ -0,0 +1,371 @@
+"""
+Shared, rate-limited request layer for the Google Drive API.
+Every Drive call goes through a per-user and a global token bucket, is
+retried with jittered exponential backoff when Drive throttles it or fails
+transiently, and is counted in process-wide metrics. Metadata lookups can be
+packed into batch HTTP requests.
+"""
+import json
+import logging
+import random
+import threading
+import time
+from collections import Counter
+from typing import Any, Callable, Dict, Hashable, Mapping, Optional, TypeVar
+
+from googleapiclient.errors import HttpError
+
+logger = logging.getLogger(__name__)
+
+T = TypeVar('T')
+
+# Steady request rates and burst sizes (requests per second / requests)
+DEFAULT_USER_RATE = 20.0
+DEFAULT_USER_BURST = 40
+DEFAULT_GLOBAL_RATE = 150.0
+DEFAULT_GLOBAL_BURST = 300
+
+# A throttled bucket halves its rate down to this fraction of the configured
+# rate, then recovers additively on every successful request
+MIN_RATE_FACTOR = 0.05
+RATE_RECOVERY_STEP = 0.05
+
+# Retry schedule: full jitter on base * 2**attempt, capped at max delay
+DEFAULT_MAX_RETRIES = 6
+DEFAULT_BASE_DELAY = 0.5
+DEFAULT_MAX_DELAY = 32.0
+
+# Drive rejects batches of more than 100 calls
+MAX_BATCH_SIZE = 100
+
+RETRYABLE_STATUSES = (429, 500, 502, 503, 504)
+USER_RATE_LIMIT_REASONS = ('userRateLimitExceeded',)
+RATE_LIMIT_REASONS = ('rateLimitExceeded', 'userRateLimitExceeded', 'quotaExceeded')
+
+
+class DriveRateLimitError(Exception):
+    """Drive kept throttling a request after all retries were spent."""
+
+    def __init__(self, message: str, retry_after: Optional[float] = None):
+        super().__init__(message)
+        self.retry_after = retry_after
+
+
+class DriveThrottled(Exception):
+    """Raised by request callables for throttling responses that are not HttpErrors."""
+
+    def __init__(self, status: int, retry_after: Optional[float] = None):
+        super().__init__(f"Drive responded with {status}")
+        self.status = status
+        self.retry_after = retry_after
+
+
+class TokenBucket:
+    """
+    Thread-safe token bucket whose rate adapts to throttling.
+
+    Acquiring reserves tokens immediately and sleeps off any deficit, so
+    requests larger than the burst size (such as a full batch) still go
+    through, paced at the bucket's rate.
+    """
+
+    def __init__(self, rate: float, capacity: float):
+        """
+        Initialize the bucket.
+
+        Args:
+            rate: Tokens added per second
+            capacity: Maximum number of stored tokens
+        """
+        self.max_rate = rate
+        self.rate = rate
+        self.capacity = capacity
+        self.tokens = capacity
+        self.updated = time.monotonic()
+        self._lock = threading.Lock()
+
+    def _refill(self, now: float) -> None:
+        self.tokens = min(self.capacity, self.tokens + (now - self.updated) * self.rate)
+        self.updated = now
+
+    def reserve(self, tokens: float = 1) -> float:
+        """
+        Take tokens from the bucket.
+
+        Returns:
+            Seconds the caller has to wait before using them
+        """
+        with self._lock:
+            self._refill(time.monotonic())
+            self.tokens -= tokens
+            return max(0.0, -self.tokens / self.rate)
+
+    def slow_down(self) -> None:
+        """Halve the rate after Drive throttled a request."""
+        with self._lock:
+            self._refill(time.monotonic())
+            self.rate = max(self.max_rate * MIN_RATE_FACTOR, self.rate / 2)
+
+    def speed_up(self) -> None:
+        """Recover some of the configured rate after a successful request."""
+        if self.rate >= self.max_rate:
+            return
+        with self._lock:
+            self._refill(time.monotonic())
+            self.rate = min(self.max_rate, self.rate + self.max_rate * RATE_RECOVERY_STEP)
+
+
+class DriveMetrics:
+    """Thread-safe counters for the Drive request layer."""
+
+    def __init__(self):
+        self._counters: Counter = Counter()
+        self._lock = threading.Lock()
+
+    def incr(self, name: str, value: float = 1) -> None:
+        with self._lock:
+            self._counters[name] += value
+
+    def snapshot(self) -> Dict[str, float]:
+        """Current value of every counter."""
+        with self._lock:
+            return dict(self._counters)
+
+
+def _http_error_reason(error: HttpError) -> Optional[str]:
+    """Extract Drive's error reason (e.g. ``userRateLimitExceeded``) from an HttpError."""
+    try:
+        content = error.content.decode('utf-8') if isinstance(error.content, bytes) else error.content
+        return json.loads(content)['error']['errors'][0]['reason']
+    except Exception:
+        return None
+
+
+def parse_retry_after(headers: Optional[Mapping[str, Any]]) -> Optional[float]:
+    """Parse a Retry-After header given in seconds."""
+    try:
+        return float(headers.get('retry-after'))
+    except (AttributeError, TypeError, ValueError):
+        return None
+
+
+class DriveRequestExecutor:
+    """Executes Drive API requests under shared rate limits with retries."""
+
+    def __init__(
+        self,
+        user_rate: float = DEFAULT_USER_RATE,
+        user_burst: float = DEFAULT_USER_BURST,
+        global_rate: float = DEFAULT_GLOBAL_RATE,
+        global_burst: float = DEFAULT_GLOBAL_BURST,
+        max_retries: int = DEFAULT_MAX_RETRIES,
+        base_delay: float = DEFAULT_BASE_DELAY,
+        max_delay: float = DEFAULT_MAX_DELAY,
+    ):
+        """
+        Initialize the executor.
+
+        Args:
+            user_rate: Requests per second allowed for a single user
+            user_burst: Requests a single user may make in a burst
+            global_rate: Requests per second allowed across all users
+            global_burst: Requests that may be made in a burst across all users
+            max_retries: Retries before a throttled or failing request gives up
+            base_delay: Backoff delay before the first retry, in seconds
+            max_delay: Upper bound for a single backoff delay, in seconds
+        """
+        self.user_rate = user_rate
+        self.user_burst = user_burst
+        self.global_bucket = TokenBucket(global_rate, global_burst)
+        self.max_retries = max_retries
+        self.base_delay = base_delay
+        self.max_delay = max_delay
+        self.metrics = DriveMetrics()
+        self._user_buckets: Dict[int, TokenBucket] = {}
+        self._lock = threading.Lock()
+
+    def user_bucket(self, user_id: int) -> TokenBucket:
+        """Get the token bucket for a user."""
+        with self._lock:
+            bucket = self._user_buckets.get(user_id)
+            if bucket is None:
+                bucket = self._user_buckets[user_id] = TokenBucket(self.user_rate, self.user_burst)
+            return bucket
+
+    def _acquire(self, user_id: int, tokens: int = 1) -> None:
+        """Wait until both the user's and the global bucket allow ``tokens`` requests."""
+        wait = max(self.user_bucket(user_id).reserve(tokens), self.global_bucket.reserve(tokens))
+        if wait > 0:
+            self.metrics.incr('throttle_waits')
+            self.metrics.incr('throttle_wait_seconds', wait)
+            time.sleep(wait)
+
+    def _classify(self, error: Exception):
+        """
+        Decide whether an error is worth retrying.
+
+        Returns:
+            (retryable, throttled, user_scoped, retry_after)
+        """
+        if isinstance(error, DriveThrottled):
+            return True, error.status == 429, False, error.retry_after
+        if isinstance(error, HttpError):
+            status = error.resp.status
+            reason = _http_error_reason(error)
+            retry_after = parse_retry_after(error.resp)
+            if status == 403 and reason in RATE_LIMIT_REASONS:
+                return True, True, reason in USER_RATE_LIMIT_REASONS, retry_after
+            if status in RETRYABLE_STATUSES:
+                return True, status == 429, False, retry_after
+            return False, False, False, None
+        if isinstance(error, (ConnectionError, TimeoutError)):
+            return True, False, False, None
+        return False, False, False, None
+
+    def backoff(self, attempt: int, retry_after: Optional[float] = None) -> float:
+        """Jittered exponential backoff delay for a retry, honouring Retry-After."""
+        delay = random.uniform(0, min(self.max_delay, self.base_delay * 2 ** attempt))
+        if retry_after is not None:
+            delay = max(delay, retry_after)
+        return delay
+
+    def _on_throttled(self, user_id: int, user_scoped: bool) -> None:
+        self.metrics.incr('throttled')
+        if user_scoped:
+            self.user_bucket(user_id).slow_down()
+        else:
+            self.global_bucket.slow_down()
+
+    def _on_success(self, user_id: int) -> None:
+        self.user_bucket(user_id).speed_up()
+        self.global_bucket.speed_up()
+
+    def call(self, user_id: int, func: Callable[[], T], cost: int = 1) -> T:
+        """
+        Run a Drive call under the rate limits, retrying on throttling and transient errors.
+
+        Args:
+            user_id: The ID of the user the call is made for
+            func: Callable performing exactly one Drive request
+            cost: Number of requests ``func`` counts as against the quota
+
+        Returns:
+            Whatever ``func`` returns
+
+        Raises:
+            DriveRateLimitError: Drive was still throttling after the last retry
+        """
+        attempt = 0
+        while True:
+            self._acquire(user_id, cost)
+            self.metrics.incr('requests', cost)
+            try:
+                result = func()
+            except Exception as e:
+                retryable, throttled, user_scoped, retry_after = self._classify(e)
+                if throttled:
+                    self._on_throttled(user_id, user_scoped)
+                if not retryable:
+                    self.metrics.incr('failures')
+                    raise
+                if attempt >= self.max_retries:
+                    self.metrics.incr('failures')
+                    if throttled:
+                        self.metrics.incr('rate_limit_failures')
+                        raise DriveRateLimitError(
+                            f"Drive rate limit exceeded after {attempt} retries",
+                            retry_after=retry_after
+                        ) from e
+                    raise
+
+                delay = self.backoff(attempt, retry_after)
+                attempt += 1
+                self.metrics.incr('retries')
+                self.metrics.incr('backoff_seconds', delay)
+                logger.debug("Retrying Drive request for user %s in %.2fs: %s", user_id, delay, e)
+                time.sleep(delay)
+                continue
+
+            self._on_success(user_id)
+            return result
+
+    def execute(self, user_id: int, request) -> Any:
+        """
+        Execute a googleapiclient request under the rate limits.
+
+        Args:
+            user_id: The ID of the user the request is made for
+            request: An unexecuted HttpRequest
+
+        Returns:
+            The decoded response
+        """
+        return self.call(user_id, request.execute)
+
+    def execute_batch(
+        self,
+        user_id: int,
+        service,
+        requests: Mapping[Hashable, Any],
+    ) -> Dict[Hashable, Any]:
+        """
+        Execute metadata requests packed into batch HTTP requests.
+
+        Calls that Drive throttles or fails transiently inside a batch are
+        retried in a later batch with backoff; other per-call errors are
+        returned in place of the result.
+
+        Args:
+            user_id: The ID of the user the requests are made for
+            service: Drive API service object building the batches
+            requests: Unexecuted HttpRequests keyed by caller-chosen keys
+
+        Returns:
+            Mapping from each key to its response or the exception it raised
+        """
+        results: Dict[Hashable, Any] = {}
+        pending = list(requests.items())
+        attempt = 0
+
+        while pending:
+            retry = []
+            retry_after = None
+            for start in range(0, len(pending), MAX_BATCH_SIZE):
+                chunk = dict(pending[start:start + MAX_BATCH_SIZE])
+                keys = {str(i): key for i, key in enumerate(chunk)}
+                responses: Dict[Hashable, Any] = {}
+
+                def callback(request_id, response, exception):
+                    responses[keys[request_id]] = exception if exception is not None else response
+
+                batch = service.new_batch_http_request(callback=callback)
+                for request_id, key in keys.items():
+                    batch.add(chunk[key], request_id=request_id)
+
+                self.metrics.incr('batches')
+                self.call(user_id, batch.execute, cost=len(chunk))
+
+                for key, response in responses.items():
+                    if isinstance(response, Exception):
+                        retryable, throttled, user_scoped, after = self._classify(response)
+                        if throttled:
+                            self._on_throttled(user_id, user_scoped)
+                        if retryable and attempt < self.max_retries:
+                            retry.append((key, chunk[key]))
+                            retry_after = after if retry_after is None else max(retry_after, after or 0)
+                            continue
+                        self.metrics.incr('failures')
+                    results[key] = response
+
+            if retry:
+                delay = self.backoff(attempt, retry_after)
+                attempt += 1
+                self.metrics.incr('retries', len(retry))
+                self.metrics.incr('backoff_seconds', delay)
+                time.sleep(delay)
+            pending = retry
+
+        return results
+
+
+drive_requests = DriveRequestExecutor()
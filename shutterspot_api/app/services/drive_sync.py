@@ -0,0 +1,617 @@
+"""
+Concurrent sync engine for Google Drive folders.
+Downloads are overlapped in a bounded I/O thread pool, while PIL decoding
+and resizing of the derivative images run in a process pool so that work
+is not serialized behind the GIL.
+"""
+import io
+import multiprocessing
+import os
+import tempfile
+import threading
+from contextlib import contextmanager
+from concurrent.futures import (
+    FIRST_COMPLETED,
+    Future,
+    ProcessPoolExecutor,
+    ThreadPoolExecutor,
+    wait,
+)
+from concurrent.futures.process import BrokenProcessPool
+from dataclasses import dataclass, field
+from datetime import datetime
+from typing import Any, Collection, Dict, Iterable, Iterator, List, Optional, Sequence, Set, Tuple, Union
+
+from PIL import Image
+
+# Default pool sizes for the sync engine
+DEFAULT_IO_WORKERS = 16
+DEFAULT_CPU_WORKERS = 4
+DEFAULT_PER_USER_LIMIT = 4
+# Thumbnail processes are not forked from the server: forking a process that
+# runs threads (the download pool, database pools) can deadlock the child
+CPU_POOL_START_METHOD = "forkserver" if "forkserver" in multiprocessing.get_all_start_methods() else "spawn"
+THUMBNAIL_SIZE = (300, 300)
+
+
+@dataclass(frozen=True)
+class DerivativeSpec:
+    """A named output size rendered for every synced photo."""
+    variant: str
+    size: Tuple[int, int]
+
+
+# Derivatives rendered at sync time: grid thumbnail, lightbox and social share
+DERIVATIVES = (
+    DerivativeSpec('thumb', THUMBNAIL_SIZE),
+    DerivativeSpec('lightbox', (1600, 1600)),
+    DerivativeSpec('social', (1200, 1200)),
+)
+
+# Encoder settings per derivative format
+DERIVATIVE_FORMATS = {
+    'webp': {'format': 'WEBP', 'quality': 80, 'method': 4},
+    'jpeg': {'format': 'JPEG', 'quality': 82, 'optimize': True, 'progressive': True},
+}
+
+# Downloads larger than this are spooled to a temp file instead of memory
+DEFAULT_SPOOL_THRESHOLD = 8 * 1024 * 1024
+
+FOLDER_MIME_TYPE = 'application/vnd.google-apps.folder'
+
+# Capture metadata stored on Photo
+METADATA_FIELDS = ('captured_at', 'camera_make', 'camera_model', 'lens_model', 'orientation', 'width', 'height')
+
+# EXIF tags (the IFD0 tags and the Exif sub-IFD that holds capture details)
+EXIF_MAKE = 0x010F
+EXIF_MODEL = 0x0110
+EXIF_ORIENTATION = 0x0112
+EXIF_DATETIME = 0x0132
+EXIF_IFD = 0x8769
+EXIF_DATETIME_ORIGINAL = 0x9003
+EXIF_DATETIME_DIGITIZED = 0x9004
+EXIF_LENS_MODEL = 0xA434
+EXIF_DATETIME_FORMAT = '%Y:%m:%d %H:%M:%S'
+
+# Drive reports rotation in clockwise quarter turns; map it to EXIF orientation
+DRIVE_ROTATION_ORIENTATIONS = {0: 1, 1: 6, 2: 3, 3: 8}
+
+# A downloaded original: bytes when small, a temp file path when spooled
+ImageSource = Union[bytes, str]
+
+
+def render_thumbnail(source: ImageSource, size: tuple = THUMBNAIL_SIZE) -> bytes:
+    """
+    Decode an image and render a thumbnail from it.
+
+    JPEGs are decoded in draft mode, which lets libjpeg downscale by up to 8x
+    in the DCT domain so the full-resolution bitmap is never allocated.
+
+    Args:
+        source: The original image bytes, or the path of a spooled download
+        size: The desired thumbnail size (width, height)
+
+    Returns:
+        Thumbnail image data as bytes
+    """
+    with Image.open(io.BytesIO(source) if isinstance(source, bytes) else source) as image:
+        image_format = image.format or 'JPEG'
+        if image_format == 'JPEG':
+            image.draft(image.mode, size)
+        image.thumbnail(size)
+
+        thumbnail_bytes = io.BytesIO()
+        image.save(thumbnail_bytes, format=image_format)
+    return thumbnail_bytes.getvalue()
+
+
+def _exif_text(value: Any) -> Optional[str]:
+    """Clean up an EXIF string tag, which is often NUL- or space-padded."""
+    if isinstance(value, bytes):
+        value = value.decode('utf-8', 'replace')
+    if not isinstance(value, str):
+        return None
+    value = value.strip('\x00 ')
+    return value or None
+
+
+def parse_exif_datetime(value: Any) -> Optional[datetime]:
+    """Parse an EXIF ``YYYY:MM:DD HH:MM:SS`` timestamp."""
+    value = _exif_text(value)
+    if value is None:
+        return None
+    try:
+        return datetime.strptime(value[:19], EXIF_DATETIME_FORMAT)
+    except ValueError:
+        return None
+
+
+def extract_metadata(image: Image.Image) -> Dict[str, Any]:
+    """
+    Read capture metadata from an opened image.
+
+    Only the header is parsed, so this must be called before the image is
+    decoded or drafted; the dimensions are those of the original.
+
+    Args:
+        image: An image freshly returned by ``Image.open``
+
+    Returns:
+        Dict with captured_at, camera_make, camera_model, lens_model,
+        orientation, width and height; missing values are None
+    """
+    metadata = dict.fromkeys(METADATA_FIELDS)
+    metadata['width'], metadata['height'] = image.size
+    try:
+        exif = image.getexif()
+        details = exif.get_ifd(EXIF_IFD)
+    except Exception:
+        return metadata
+
+    metadata['captured_at'] = (
+        parse_exif_datetime(details.get(EXIF_DATETIME_ORIGINAL))
+        or parse_exif_datetime(details.get(EXIF_DATETIME_DIGITIZED))
+        or parse_exif_datetime(exif.get(EXIF_DATETIME))
+    )
+    metadata['camera_make'] = _exif_text(exif.get(EXIF_MAKE))
+    metadata['camera_model'] = _exif_text(exif.get(EXIF_MODEL))
+    metadata['lens_model'] = _exif_text(details.get(EXIF_LENS_MODEL))
+    orientation = exif.get(EXIF_ORIENTATION)
+    metadata['orientation'] = orientation if isinstance(orientation, int) and 1 <= orientation <= 8 else None
+    return metadata
+
+
+def drive_image_metadata(file: Dict[str, Any]) -> Dict[str, Any]:
+    """
+    Map a Drive file's ``imageMediaMetadata`` to the same fields as ``extract_metadata``.
+
+    Drive reads this from the original upload, so it covers files whose
+    derivatives were rendered from Drive's EXIF-less thumbnail.
+    """
+    media = file.get('imageMediaMetadata') or {}
+    rotation = media.get('rotation')
+    return {
+        'captured_at': parse_exif_datetime(media.get('time')),
+        'camera_make': _exif_text(media.get('cameraMake')),
+        'camera_model': _exif_text(media.get('cameraModel')),
+        'lens_model': _exif_text(media.get('lens')),
+        'orientation': DRIVE_ROTATION_ORIENTATIONS.get(rotation) if isinstance(rotation, int) else None,
+        'width': media.get('width'),
+        'height': media.get('height'),
+    }
+
+
+def merge_metadata(exif: Dict[str, Any], drive: Dict[str, Any]) -> Dict[str, Any]:
+    """
+    Combine the metadata read from a rendered source with Drive's.
+
+    EXIF values win; Drive fills the gaps. The dimensions come from Drive when
+    it has them, since the source may have been Drive's own thumbnail.
+    """
+    merged = {key: exif.get(key) if exif.get(key) is not None else drive.get(key) for key in METADATA_FIELDS}
+    if drive.get('width') and drive.get('height'):
+        merged['width'], merged['height'] = drive['width'], drive['height']
+    return merged
+
+
+@dataclass
+class RenderedImage:
+    """Derivatives rendered from one original, plus the metadata read from its header."""
+    derivatives: List[Dict[str, Any]]
+    metadata: Dict[str, Any]
+
+
+def render_derivatives(
+    source: ImageSource,
+    specs: Sequence[DerivativeSpec] = DERIVATIVES,
+    formats: Optional[Dict[str, Dict[str, Any]]] = None,
+) -> RenderedImage:
+    """
+    Decode an image once and render every derivative size and format from it.
+
+    The image is decoded at (draft) resolution for the largest size, then
+    downscaled step by step from the largest derivative to the smallest.
+    EXIF metadata is read from the same open file before decoding.
+
+    Args:
+        source: The original image bytes, or the path of a spooled download
+        specs: The derivative sizes to render
+        formats: Encoder settings keyed by format name; defaults to
+            DERIVATIVE_FORMATS
+
+    Returns:
+        RenderedImage with one dict per derivative (variant, format, width,
+        height and data) and the image's metadata
+    """
+    formats = formats or DERIVATIVE_FORMATS
+    ordered = sorted(specs, key=lambda spec: max(spec.size), reverse=True)
+
+    with Image.open(io.BytesIO(source) if isinstance(source, bytes) else source) as image:
+        metadata = extract_metadata(image)
+        if image.format == 'JPEG':
+            image.draft(image.mode, ordered[0].size)
+        has_alpha = 'A' in image.getbands() or 'transparency' in image.info
+        working = image.convert('RGBA' if has_alpha else 'RGB')
+
+    derivatives = []
+    for spec in ordered:
+        working.thumbnail(spec.size, reducing_gap=3.0)
+        for format_name, options in formats.items():
+            output = working
+            if options['format'] == 'JPEG' and output.mode != 'RGB':
+                output = output.convert('RGB')
+            data = io.BytesIO()
+            output.save(data, **options)
+            derivatives.append({
+                'variant': spec.variant,
+                'format': format_name,
+                'width': output.width,
+                'height': output.height,
+                'data': data.getvalue(),
+            })
+    return RenderedImage(derivatives=derivatives, metadata=metadata)
+
+
+def cleanup_source(source: Optional[ImageSource]) -> None:
+    """Remove the temp file behind a spooled download, if any."""
+    if isinstance(source, str):
+        try:
+            os.unlink(source)
+        except FileNotFoundError:
+            pass
+
+
+class SpooledDownload(io.RawIOBase):
+    """
+    Write-only sink that keeps small downloads in memory and moves large ones
+    to a named temp file, so a process-pool worker can reopen them by path.
+    """
+
+    def __init__(self, threshold: int = DEFAULT_SPOOL_THRESHOLD):
+        self.threshold = threshold
+        self._buffer: Optional[io.BytesIO] = io.BytesIO()
+        self._file = None
+
+    def writable(self) -> bool:
+        return True
+
+    def write(self, data) -> int:
+        if self._buffer is not None and self._buffer.tell() + len(data) > self.threshold:
+            self._file = tempfile.NamedTemporaryFile(prefix='drive-sync-', delete=False)
+            self._file.write(self._buffer.getbuffer())
+            self._buffer = None
+        if self._file is not None:
+            return self._file.write(data)
+        return self._buffer.write(data)
+
+    def source(self) -> ImageSource:
+        """Finish the download and return its bytes or temp file path."""
+        if self._file is None:
+            return self._buffer.getvalue()
+        self._file.close()
+        return self._file.name
+
+    def discard(self) -> None:
+        """Drop a partial download."""
+        if self._file is not None:
+            self._file.close()
+            cleanup_source(self._file.name)
+
+
+class SyncInterrupted(Exception):
+    """A sync stopped at a checkpoint because its worker is shutting down."""
+
+
+@dataclass
+class SyncError:
+    """A single file that could not be synced."""
+    file_id: str
+    filename: Optional[str]
+    error: str
+
+
+@dataclass
+class SyncResult:
+    """
+    Outcome of a folder sync: the photos written or removed and any per-file errors.
+
+    Only photo IDs are kept so a large sync does not pin every Photo row,
+    thumbnail included, in memory.
+    """
+    photo_ids: List[int] = field(default_factory=list)
+    removed_ids: List[int] = field(default_factory=list)
+    errors: List[SyncError] = field(default_factory=list)
+
+
+@dataclass
+class FolderChanges:
+    """
+    Changes to a Drive folder (or folder tree) taken from the user-wide changes feed.
+
+    ``tree_changed`` is set when a sub-folder of a tracked tree was added,
+    moved, renamed or removed, in which case the tree has to be walked again.
+    """
+    images: List[Dict[str, Any]]
+    removed_ids: Set[str]
+    new_page_token: str
+    tree_changed: bool = False
+
+
+def filter_folder_changes(
+    changes: Iterable[Dict[str, Any]],
+    folder_ids: Union[str, Collection[str]],
+    new_page_token: str,
+    track_folders: bool = False,
+) -> FolderChanges:
+    """
+    Reduce raw Drive change records to the image changes for a folder or folder tree.
+
+    Files that were removed, trashed or moved out of the folders are reported
+    as removed; images that are (still) in one of the folders are reported for
+    upsert. Only the last change for each file is kept.
+
+    Args:
+        changes: Change resources from ``changes().list``
+        folder_ids: The ID of the Google Drive folder, or the IDs of every
+            folder in a synced tree
+        new_page_token: Page token to store for the next sync
+        track_folders: Report changes to sub-folders of the tree as ``tree_changed``
+
+    Returns:
+        FolderChanges for the folders
+    """
+    if isinstance(folder_ids, str):
+        folder_ids = {folder_ids}
+
+    latest: Dict[str, Dict[str, Any]] = {}
+    for change in changes:
+        if change.get('changeType', 'file') != 'file':
+            continue
+        latest[change['fileId']] = change
+
+    images = []
+    removed_ids = set()
+    tree_changed = False
+    for file_id, change in latest.items():
+        file = change.get('file') or {}
+        in_tree = any(parent in folder_ids for parent in file.get('parents', []))
+        if track_folders and (
+            file_id in folder_ids
+            or (file.get('mimeType') == FOLDER_MIME_TYPE and in_tree)
+        ):
+            tree_changed = True
+        elif change.get('removed') or file.get('trashed') or not in_tree:
+            removed_ids.add(file_id)
+        elif file.get('mimeType', '').startswith('image/'):
+            images.append(file)
+
+    return FolderChanges(
+        images=images,
+        removed_ids=removed_ids,
+        new_page_token=new_page_token,
+        tree_changed=tree_changed
+    )
+
+
+def _discard_download(future: Future) -> None:
+    """Clean up the source of an abandoned download once it finishes."""
+    if not future.cancelled() and future.exception() is None:
+        cleanup_source(future.result())
+
+
+class DriveSyncEngine:
+    """
+    Pipeline that downloads Drive files and renders thumbnails concurrently.
+
+    The engine is storage-agnostic: it only needs a ``drive`` object that can
+    download files and Drive thumbnails, and yields results back to the
+    caller's thread, which owns the database session.
+    """
+
+    def __init__(
+        self,
+        drive: Any,
+        io_workers: int = DEFAULT_IO_WORKERS,
+        cpu_workers: int = DEFAULT_CPU_WORKERS,
+        per_user_limit: int = DEFAULT_PER_USER_LIMIT,
+        spool_threshold: int = DEFAULT_SPOOL_THRESHOLD,
+    ):
+        """
+        Initialize the sync engine.
+
+        Args:
+            drive: Object providing ``download_to(user_id, file_id, fileobj)``
+                and ``download_thumbnail_link(user_id, link, size)``
+            io_workers: Size of the shared download thread pool
+            cpu_workers: Size of the thumbnail process pool; 0 renders in the
+                download threads instead (useful where forking is unavailable)
+            per_user_limit: Maximum concurrent downloads for a single user
+            spool_threshold: Size above which downloads are spooled to disk
+        """
+        self.drive = drive
+        self.io_workers = io_workers
+        self.cpu_workers = cpu_workers
+        self.per_user_limit = per_user_limit
+        self.spool_threshold = spool_threshold
+        self._io_pool: Optional[ThreadPoolExecutor] = None
+        self._cpu_pool: Optional[ProcessPoolExecutor] = None
+        self._pool_lock = threading.Lock()
+        # Per-user download slots and how many downloads hold or wait for them;
+        # entries are dropped when no download of the user is in flight
+        self._user_slots: Dict[int, Tuple[threading.BoundedSemaphore, int]] = {}
+        self._user_slots_lock = threading.Lock()
+
+    def _pools(self) -> Tuple[ThreadPoolExecutor, Optional[ProcessPoolExecutor]]:
+        """Lazily create the worker pools so importing the module stays cheap."""
+        with self._pool_lock:
+            if self._io_pool is None:
+                self._io_pool = ThreadPoolExecutor(
+                    max_workers=self.io_workers,
+                    thread_name_prefix="drive-sync-io"
+                )
+            if self._cpu_pool is None and self.cpu_workers > 0:
+                self._cpu_pool = ProcessPoolExecutor(
+                    max_workers=self.cpu_workers,
+                    mp_context=multiprocessing.get_context(CPU_POOL_START_METHOD)
+                )
+        return self._io_pool, self._cpu_pool
+
+    def _replace_cpu_pool(self, broken: ProcessPoolExecutor) -> ProcessPoolExecutor:
+        """
+        Shut down a process pool that lost a worker and start a fresh one.
+
+        A render process killed by the OS, e.g. for running out of memory,
+        leaves its pool broken; every later submit would fail until restart.
+        """
+        with self._pool_lock:
+            if self._cpu_pool is broken:
+                self._cpu_pool = None
+        broken.shutdown(wait=False, cancel_futures=True)
+        return self._pools()[1]
+
+    def _submit_render(
+        self,
+        cpu_pool: ProcessPoolExecutor,
+        source: ImageSource,
+        specs: Sequence[DerivativeSpec]
+    ) -> Tuple[ProcessPoolExecutor, Future]:
+        """Submit a render to the process pool, replacing the pool if it is broken."""
+        try:
+            try:
+                return cpu_pool, cpu_pool.submit(render_derivatives, source, specs)
+            except BrokenProcessPool:
+                cpu_pool = self._replace_cpu_pool(cpu_pool)
+                return cpu_pool, cpu_pool.submit(render_derivatives, source, specs)
+        except BaseException:
+            cleanup_source(source)
+            raise
+
+    def shutdown(self) -> None:
+        """Shut down the worker pools."""
+        with self._pool_lock:
+            if self._io_pool is not None:
+                self._io_pool.shutdown(wait=True)
+                self._io_pool = None
+            if self._cpu_pool is not None:
+                self._cpu_pool.shutdown(wait=True)
+                self._cpu_pool = None
+
+    @contextmanager
+    def _user_slot(self, user_id: int) -> Iterator[None]:
+        """Hold one of the user's concurrent download slots."""
+        with self._user_slots_lock:
+            semaphore, users = self._user_slots.get(user_id) or (threading.BoundedSemaphore(self.per_user_limit), 0)
+            self._user_slots[user_id] = (semaphore, users + 1)
+        try:
+            with semaphore:
+                yield
+        finally:
+            with self._user_slots_lock:
+                semaphore, users = self._user_slots[user_id]
+                if users == 1:
+                    del self._user_slots[user_id]
+                else:
+                    self._user_slots[user_id] = (semaphore, users - 1)
+
+    def _download(
+        self,
+        user_id: int,
+        image: Dict[str, Any],
+        specs: Sequence[DerivativeSpec],
+        render_inline: bool
+    ) -> Union[ImageSource, RenderedImage]:
+        """
+        Fetch the source for a photo's derivatives while holding the user's
+        concurrency slot.
+
+        Drive's own thumbnail is used when it is at least as large as the
+        largest derivative; otherwise the original is downloaded and spooled.
+        """
+        largest = max((spec.size for spec in specs), key=max)
+        with self._user_slot(user_id):
+            source = None
+            if image.get('thumbnailLink'):
+                source = self.drive.download_thumbnail_link(user_id, image['thumbnailLink'], largest)
+            if source is None:
+                spool = SpooledDownload(self.spool_threshold)
+                try:
+                    self.drive.download_to(user_id, image['id'], spool)
+                except BaseException:
+                    spool.discard()
+                    raise
+                source = spool.source()
+
+        if render_inline:
+            try:
+                return render_derivatives(source, specs)
+            finally:
+                cleanup_source(source)
+        return source
+
+    def fetch_derivatives(
+        self,
+        user_id: int,
+        images: Iterable[Dict[str, Any]],
+        specs: Sequence[DerivativeSpec] = DERIVATIVES,
+    ) -> Iterator[Tuple[Dict[str, Any], Optional[RenderedImage], Optional[Exception]]]:
+        """
+        Download images and render their derivatives concurrently.
+
+        Results are yielded in completion order as ``(image, rendered, error)``
+        tuples; exactly one of ``rendered`` and ``error`` is set. At most a
+        bounded window of files is in flight, so memory does not grow with the
+        number of images.
+
+        Args:
+            user_id: The ID of the user owning the Drive files
+            images: Drive file metadata dicts with an ``id`` and optionally a
+                ``thumbnailLink``
+            specs: The derivative sizes to render
+
+        Yields:
+            Tuples of (Drive file metadata, RenderedImage, exception)
+        """
+        io_pool, cpu_pool = self._pools()
+        render_inline = cpu_pool is None
+        max_in_flight = self.io_workers * 2
+        pending: Dict[Future, Tuple[str, Dict[str, Any], Optional[ImageSource]]] = {}
+        source = iter(images)
+        exhausted = False
+
+        try:
+            while pending or not exhausted:
+                while not exhausted and len(pending) < max_in_flight:
+                    image = next(source, None)
+                    if image is None:
+                        exhausted = True
+                        break
+                    future = io_pool.submit(self._download, user_id, image, specs, render_inline)
+                    pending[future] = ("download", image, None)
+
+                if not pending:
+                    break
+
+                done, _ = wait(pending, return_when=FIRST_COMPLETED)
+                for future in done:
+                    stage, image, rendered_source = pending.pop(future)
+                    try:
+                        result = future.result()
+                    except Exception as e:
+                        yield image, None, e
+                        continue
+                    finally:
+                        cleanup_source(rendered_source)
+
+                    if stage == "download" and not render_inline:
+                        cpu_pool, render = self._submit_render(cpu_pool, result, specs)
+                        pending[render] = ("render", image, result)
+                    else:
+                        yield image, result, None
+        finally:
+            # Abandoned early, e.g. by an interrupted sync: drop queued work
+            # and remove downloads already spooled to disk
+            for future, (stage, _, rendered_source) in pending.items():
+                future.cancel()
+                cleanup_source(rendered_source)
+                if stage == "download" and not render_inline:
+                    future.add_done_callback(_discard_download)
@@ -0,0 +1,238 @@
+"""
+Race-free photo favorites.
+Favorites are inserted with INSERT ... ON CONFLICT DO NOTHING and removed
+with DELETE ... RETURNING, so only the rows that actually changed come
+back. The denormalized ``favorites_count`` is then adjusted for just those
+photos with one atomic UPDATE in the same transaction. Concurrent clicks
+can neither double-count nor fail on the primary key.
+
+Per-gallery selection counts (how many photos each client picked) are
+rolled up the same way into gallery_favorite_selections, and both
+denormalizations can be rebuilt from photo_favorites with
+``reconcile_favorites``.
+"""
+from datetime import datetime
+from typing import Iterable, List, Tuple
+
+from sqlalchemy import bindparam, case, delete, exists, func, insert, literal, or_, select, update
+from sqlalchemy.dialects.postgresql import insert as postgresql_insert
+from sqlalchemy.dialects.sqlite import insert as sqlite_insert
+from sqlalchemy.orm import Session
+
+from app.database.models import Gallery, GalleryFavoriteSelection, Photo, photo_favorites
+
+_INSERTS = {
+    'sqlite': sqlite_insert,
+    'postgresql': postgresql_insert,
+}
+
+
+def _adjust_counts(db: Session, photo_ids: List[int], delta: int) -> None:
+    """Atomically add ``delta`` to the favorites count of each photo, never going below zero."""
+    if photo_ids:
+        count = func.coalesce(Photo.favorites_count, 0) + delta
+        db.execute(
+            update(Photo)
+            .where(Photo.id.in_(photo_ids))
+            .values(favorites_count=case((count < 0, 0), else_=count))
+            .execution_options(synchronize_session=False)
+        )
+
+
+def _adjust_selections(db: Session, user_id: int, photo_ids: List[int], delta: int) -> None:
+    """Add ``delta`` per photo to the user's selection count in each of the photos' galleries."""
+    if not photo_ids:
+        return
+    per_gallery = select(
+        Photo.gallery_id,
+        literal(user_id),
+        func.count() * delta,
+        literal(datetime.utcnow())
+    ).where(Photo.id.in_(photo_ids)).group_by(Photo.gallery_id)
+
+    selections = GalleryFavoriteSelection.__table__
+    upsert = _INSERTS[db.get_bind().dialect.name](selections).from_select(
+        ['gallery_id', 'user_id', 'selected_count', 'updated_at'], per_gallery
+    )
+    upsert = upsert.on_conflict_do_update(
+        index_elements=[selections.c.gallery_id, selections.c.user_id],
+        set_={
+            'selected_count': selections.c.selected_count + upsert.excluded.selected_count,
+            'updated_at': upsert.excluded.updated_at
+        }
+    )
+    db.execute(upsert)
+    if delta < 0:
+        db.execute(delete(selections).where(
+            selections.c.user_id == user_id,
+            selections.c.selected_count <= 0
+        ))
+
+
+def add_favorites(db: Session, user_id: int, photo_ids: Iterable[int], gallery_filter=None) -> List[int]:
+    """
+    Favorite photos for a user, ignoring ones already favorited.
+
+    Photos that do not exist, or whose gallery does not, are skipped.
+    The caller commits.
+
+    Args:
+        db: Database session
+        user_id: The ID of the user
+        photo_ids: IDs of the photos to favorite
+        gallery_filter: Optional criterion on Gallery; photos in galleries
+            that do not match it are skipped
+
+    Returns:
+        IDs of the photos that were newly favorited
+    """
+    photo_ids = list(dict.fromkeys(photo_ids))
+    if not photo_ids:
+        return []
+
+    existing = select(Photo.id, literal(user_id), literal(datetime.utcnow())).join(
+        Gallery, Gallery.id == Photo.gallery_id
+    ).where(Photo.id.in_(photo_ids))
+    if gallery_filter is not None:
+        existing = existing.where(gallery_filter)
+    stmt = _INSERTS[db.get_bind().dialect.name](photo_favorites).from_select(
+        ['photo_id', 'user_id', 'created_at'], existing
+    ).on_conflict_do_nothing(
+        index_elements=[photo_favorites.c.photo_id, photo_favorites.c.user_id]
+    ).returning(photo_favorites.c.photo_id)
+
+    added = list(db.execute(stmt).scalars())
+    _adjust_counts(db, added, 1)
+    _adjust_selections(db, user_id, added, 1)
+    return added
+
+
+def remove_favorites(db: Session, user_id: int, photo_ids: Iterable[int]) -> List[int]:
+    """
+    Unfavorite photos for a user, ignoring ones that were not favorited.
+
+    The caller commits.
+
+    Args:
+        db: Database session
+        user_id: The ID of the user
+        photo_ids: IDs of the photos to unfavorite
+
+    Returns:
+        IDs of the photos that were unfavorited
+    """
+    photo_ids = list(dict.fromkeys(photo_ids))
+    if not photo_ids:
+        return []
+
+    removed = list(db.execute(
+        delete(photo_favorites)
+        .where(
+            photo_favorites.c.user_id == user_id,
+            photo_favorites.c.photo_id.in_(photo_ids)
+        )
+        .returning(photo_favorites.c.photo_id)
+    ).scalars())
+    _adjust_counts(db, removed, -1)
+    _adjust_selections(db, user_id, removed, -1)
+    return removed
+
+
+def delete_photo_favorites(db: Session, photo_ids: List[int]) -> None:
+    """
+    Delete every favorite of photos that are being deleted, keeping the
+    selection rollup in step. The caller deletes the photos and commits.
+    """
+    if not photo_ids:
+        return
+    lost = db.execute(
+        select(Photo.gallery_id, photo_favorites.c.user_id, func.count())
+        .join(photo_favorites, photo_favorites.c.photo_id == Photo.id)
+        .where(Photo.id.in_(photo_ids))
+        .group_by(Photo.gallery_id, photo_favorites.c.user_id)
+    ).all()
+    if lost:
+        selections = GalleryFavoriteSelection.__table__
+        db.execute(
+            selections.update()
+            .where(
+                selections.c.gallery_id == bindparam('gallery'),
+                selections.c.user_id == bindparam('user')
+            )
+            .values(selected_count=selections.c.selected_count - bindparam('count')),
+            [{'gallery': gallery_id, 'user': user_id, 'count': count} for gallery_id, user_id, count in lost]
+        )
+        db.execute(delete(selections).where(selections.c.selected_count <= 0))
+    db.execute(photo_favorites.delete().where(photo_favorites.c.photo_id.in_(photo_ids)))
+
+
+def reconcile_gallery_favorites(db: Session, gallery_id: int) -> Tuple[int, int]:
+    """
+    Recompute favorites_count and the selection rollup of one gallery, and commit.
+
+    The gallery's photo rows are locked first. Favoriting or unfavoriting
+    one of them has to lock its row too, for the foreign key check or the
+    count update, so changes in flight finish before the recount and new
+    ones wait for it to commit and then apply on top of it. SQLite
+    serializes writers, so there the lock is implicit.
+
+    Returns:
+        (photos corrected, selection rows rebuilt)
+    """
+    gallery_photos = select(Photo.id).where(Photo.gallery_id == gallery_id)
+    db.execute(gallery_photos.order_by(Photo.id).with_for_update()).all()
+
+    counts = select(
+        photo_favorites.c.photo_id,
+        func.count().label('favorites')
+    ).where(photo_favorites.c.photo_id.in_(gallery_photos)).group_by(photo_favorites.c.photo_id).subquery()
+    corrected = db.execute(
+        update(Photo)
+        .where(Photo.id == counts.c.photo_id, Photo.favorites_count.is_distinct_from(counts.c.favorites))
+        .values(favorites_count=counts.c.favorites)
+        .execution_options(synchronize_session=False)
+    ).rowcount
+    corrected += db.execute(
+        update(Photo)
+        .where(
+            Photo.gallery_id == gallery_id,
+            or_(Photo.favorites_count != 0, Photo.favorites_count == None),
+            ~exists().where(photo_favorites.c.photo_id == Photo.id)
+        )
+        .values(favorites_count=0)
+        .execution_options(synchronize_session=False)
+    ).rowcount
+
+    selections = GalleryFavoriteSelection.__table__
+    db.execute(delete(selections).where(selections.c.gallery_id == gallery_id))
+    rebuilt = db.execute(
+        insert(selections).from_select(
+            ['gallery_id', 'user_id', 'selected_count', 'updated_at'],
+            select(Photo.gallery_id, photo_favorites.c.user_id, func.count(), literal(datetime.utcnow()))
+            .join(photo_favorites, photo_favorites.c.photo_id == Photo.id)
+            .where(Photo.gallery_id == gallery_id)
+            .group_by(Photo.gallery_id, photo_favorites.c.user_id)
+        )
+    ).rowcount
+    db.commit()
+    return corrected, rebuilt
+
+
+def reconcile_favorites(db: Session) -> Tuple[int, int]:
+    """
+    Recompute favorites_count and the selection rollup from photo_favorites.
+
+    Galleries are reconciled one at a time with ``reconcile_gallery_favorites``,
+    so favorites keep working while it runs and only one gallery's photos are
+    locked at once. Counts come from GROUP BY queries, and only photos whose
+    stored count drifted are written.
+
+    Returns:
+        (photos corrected, selection rows rebuilt)
+    """
+    corrected = rebuilt = 0
+    for gallery_id in db.execute(select(Gallery.id).order_by(Gallery.id)).scalars().all():
+        gallery_corrected, gallery_rebuilt = reconcile_gallery_favorites(db, gallery_id)
+        corrected += gallery_corrected
+        rebuilt += gallery_rebuilt
+    return corrected, rebuilt
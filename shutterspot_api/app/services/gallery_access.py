@@ -0,0 +1,220 @@
+"""
+Gallery access rules and a per-process cache of them.
+A photo and its gallery's access rules are loaded with one joined query,
+and gallery-level endpoints read the rules from a small TTL cache. Entries
+are dropped once a transaction that updated or deleted a Gallery through
+the ORM commits, so a request in between cannot re-cache the old rules.
+Bulk ``update(Gallery)``/``delete(Gallery)`` statements bypass this, as do
+changes made by other processes; the TTL bounds their staleness.
+"""
+import threading
+import time
+from collections import OrderedDict
+from dataclasses import dataclass
+from typing import Optional, Tuple
+
+from fastapi import HTTPException, status
+from sqlalchemy import event, func, or_, select, true
+from sqlalchemy.ext.asyncio import AsyncSession
+from sqlalchemy.orm import Session, object_session
+
+from app.database.models import Gallery, Photo, User
+
+# How long cached access rules are trusted
+DEFAULT_ACL_TTL = 30.0
+# Galleries kept in the cache at most; the least recently used are evicted
+DEFAULT_ACL_CAPACITY = 4096
+# Session.info key of the galleries changed in the session's transaction
+DIRTY_GALLERIES_KEY = "dirty_gallery_ids"
+
+
+@dataclass(frozen=True)
+class GalleryAccess:
+    """The parts of a gallery that decide who may see it."""
+    gallery_id: int
+    client_id: Optional[int]
+    status: Optional[str]
+    has_password: bool
+
+    @property
+    def is_public(self) -> bool:
+        """Whether anyone, signed in or not, may view the gallery."""
+        return self.status == "Active" and not self.has_password
+
+    def can_manage(self, user: Optional[User]) -> bool:
+        """Whether the user owns the gallery or is an admin."""
+        return user is not None and (user.id == self.client_id or user.role == "admin")
+
+    def can_view(self, user: Optional[User]) -> bool:
+        """Whether the user may view the gallery's photos."""
+        if self.can_manage(user):
+            return True
+        # Other users need an active gallery; password-protected ones need a signed-in user
+        return self.status == "Active" and (not self.has_password or user is not None)
+
+
+def viewable_by(user: User):
+    """SQL criterion on Gallery matching the galleries a signed-in user may view."""
+    if user.role == "admin":
+        return true()
+    return or_(Gallery.client_id == user.id, Gallery.status == "Active")
+
+
+class GalleryACLCache:
+    """Thread-safe LRU cache of GalleryAccess entries with a TTL."""
+
+    def __init__(self, ttl: float = DEFAULT_ACL_TTL, capacity: int = DEFAULT_ACL_CAPACITY):
+        """
+        Initialize the cache.
+
+        Args:
+            ttl: Seconds an entry is trusted
+            capacity: Maximum number of cached galleries
+        """
+        self.ttl = ttl
+        self.capacity = capacity
+        self._entries: "OrderedDict[int, Tuple[GalleryAccess, float]]" = OrderedDict()
+        self._lock = threading.Lock()
+
+    def get(self, gallery_id: int) -> Optional[GalleryAccess]:
+        with self._lock:
+            entry = self._entries.get(gallery_id)
+            if entry is None:
+                return None
+            access, expires_at = entry
+            if expires_at < time.monotonic():
+                del self._entries[gallery_id]
+                return None
+            self._entries.move_to_end(gallery_id)
+            return access
+
+    def put(self, access: GalleryAccess) -> None:
+        with self._lock:
+            self._entries[access.gallery_id] = (access, time.monotonic() + self.ttl)
+            self._entries.move_to_end(access.gallery_id)
+            while len(self._entries) > self.capacity:
+                self._entries.popitem(last=False)
+
+    def invalidate(self, gallery_id: int) -> None:
+        with self._lock:
+            self._entries.pop(gallery_id, None)
+
+    def clear(self) -> None:
+        with self._lock:
+            self._entries.clear()
+
+
+gallery_acls = GalleryACLCache()
+
+
+@event.listens_for(Gallery, "after_update")
+@event.listens_for(Gallery, "after_delete")
+def _mark_gallery_dirty(mapper, connection, target) -> None:
+    session = object_session(target)
+    if session is not None:
+        session.info.setdefault(DIRTY_GALLERIES_KEY, set()).add(target.id)
+    else:
+        gallery_acls.invalidate(target.id)
+
+
+@event.listens_for(Session, "after_commit")
+def _invalidate_dirty_galleries(session) -> None:
+    for gallery_id in session.info.pop(DIRTY_GALLERIES_KEY, ()):
+        gallery_acls.invalidate(gallery_id)
+
+
+@event.listens_for(Session, "after_rollback")
+def _forget_dirty_galleries(session) -> None:
+    # The cached rules still match the database
+    session.info.pop(DIRTY_GALLERIES_KEY, None)
+
+
+def _access_columns():
+    return Gallery.id, Gallery.client_id, Gallery.status, func.coalesce(Gallery.password, "") != ""
+
+
+def _gallery_access_query(gallery_id: int):
+    return select(*_access_columns()).where(Gallery.id == gallery_id)
+
+
+def _gallery_access_from_row(row) -> GalleryAccess:
+    if row is None:
+        raise HTTPException(
+            status_code=status.HTTP_404_NOT_FOUND,
+            detail="Gallery not found"
+        )
+    gallery_id, client_id, gallery_status, has_password = row
+    access = GalleryAccess(gallery_id, client_id, gallery_status, bool(has_password))
+    gallery_acls.put(access)
+    return access
+
+
+def _photo_access_query(photo_id: int):
+    return select(Photo, *_access_columns()).outerjoin(
+        Gallery, Gallery.id == Photo.gallery_id
+    ).where(Photo.id == photo_id)
+
+
+def _photo_access_from_row(row) -> Tuple[Photo, GalleryAccess]:
+    if row is None:
+        raise HTTPException(
+            status_code=status.HTTP_404_NOT_FOUND,
+            detail="Photo not found"
+        )
+    photo, gallery_id, client_id, gallery_status, has_password = row
+    if gallery_id is None:
+        raise HTTPException(
+            status_code=status.HTTP_404_NOT_FOUND,
+            detail="Gallery not found"
+        )
+    access = GalleryAccess(gallery_id, client_id, gallery_status, bool(has_password))
+    gallery_acls.put(access)
+    return photo, access
+
+
+def get_gallery_access(db: Session, gallery_id: int) -> GalleryAccess:
+    """
+    Get a gallery's access rules, from the cache when possible.
+
+    Raises:
+        HTTPException: The gallery does not exist
+    """
+    access = gallery_acls.get(gallery_id)
+    if access is None:
+        access = _gallery_access_from_row(db.execute(_gallery_access_query(gallery_id)).first())
+    return access
+
+
+async def get_gallery_access_async(db: AsyncSession, gallery_id: int) -> GalleryAccess:
+    """
+    Async version of ``get_gallery_access``.
+
+    Raises:
+        HTTPException: The gallery does not exist
+    """
+    access = gallery_acls.get(gallery_id)
+    if access is None:
+        result = await db.execute(_gallery_access_query(gallery_id))
+        access = _gallery_access_from_row(result.first())
+    return access
+
+
+def get_photo_with_access(db: Session, photo_id: int) -> Tuple[Photo, GalleryAccess]:
+    """
+    Load a photo together with its gallery's access rules in one query.
+
+    Raises:
+        HTTPException: The photo or its gallery does not exist
+    """
+    return _photo_access_from_row(db.execute(_photo_access_query(photo_id)).first())
+
+
+async def get_photo_with_access_async(db: AsyncSession, photo_id: int) -> Tuple[Photo, GalleryAccess]:
+    """
+    Async version of ``get_photo_with_access``.
+
+    Raises:
+        HTTPException: The photo or its gallery does not exist
+    """
+    result = await db.execute(_photo_access_query(photo_id))
+    return _photo_access_from_row(result.first())
@@ -0,0 +1,282 @@
+"""
+ZIP downloads of gallery originals.
+Archives are streamed straight from Drive: a small pool downloads the next
+few originals ahead of the writer into spooled buffers, so memory stays
+bounded and no file ever holds the whole archive. The layout only depends
+on the photos' names and sizes, which makes archives resumable with HTTP
+Range requests; CRC-32s computed while streaming are cached on the photos
+so a resumed download does not have to re-read the files before the range.
+"""
+import hashlib
+import json
+import logging
+import posixpath
+from collections import defaultdict, deque
+from concurrent.futures import Future, ThreadPoolExecutor
+from dataclasses import dataclass, field
+from datetime import datetime
+from typing import Iterable, Iterator, List, Optional, Set, Tuple
+
+from fastapi import HTTPException, status
+from sqlalchemy import func, update
+from sqlalchemy.orm import Session
+
+from app.database.database import SessionLocal
+from app.database.models import DriveConnection, Photo, photo_favorites
+from app.services.drive_sync import DEFAULT_SPOOL_THRESHOLD, ImageSource, SpooledDownload, cleanup_source
+from app.services.zip_stream import ZipEntry, ZipLayout, ZipSizeMismatch, stream_zip
+
+logger = logging.getLogger(__name__)
+
+# Originals downloaded ahead of the archive writer
+ARCHIVE_PREFETCH = 4
+# Size of the chunks the archive is written in
+ARCHIVE_CHUNK_SIZE = 1024 * 1024
+# Fallback timestamp for entries without a Drive modified time
+DEFAULT_MODIFIED = datetime(1980, 1, 1)
+
+
+@dataclass
+class GalleryArchive:
+    """A planned archive of a gallery's originals."""
+    layout: ZipLayout  # Entry keys are (photo ID, Drive file ID, Drive user ID)
+    etag: str
+    uncached: Set[int] = field(default_factory=set)  # Entries whose CRC is not stored yet
+
+
+def _archive_name(folder_path: Optional[str], filename: str) -> str:
+    """Relative path of a photo inside the archive, without any path traversal."""
+    parts = (folder_path or '').split('/') + [filename]
+    return '/'.join(part.replace('\\', '_') for part in parts if part not in ('', '.', '..'))
+
+
+def _unique_name(name: str, used: Set[str]) -> str:
+    """Disambiguate names that collide, e.g. ``IMG_1.jpg`` -> ``IMG_1 (2).jpg``."""
+    stem, ext = posixpath.splitext(name)
+    candidate, counter = name, 1
+    while candidate.lower() in used:
+        counter += 1
+        candidate = f"{stem} ({counter}){ext}"
+    used.add(candidate.lower())
+    return candidate
+
+
+def _modified(photo) -> datetime:
+    try:
+        return datetime.fromisoformat(photo.drive_modified.replace('Z', '+00:00')).replace(tzinfo=None)
+    except (AttributeError, ValueError):
+        return photo.created_at or DEFAULT_MODIFIED
+
+
+def build_gallery_archive(db: Session, drive, gallery_id: int, favorites_of: Optional[int] = None) -> GalleryArchive:
+    """
+    Plan the archive of a gallery's Drive originals.
+
+    Each original is fetched with the credentials of the Drive connection
+    that synced it; photos not assigned to a connection use the gallery's
+    first one. Sizes missing for photos synced before they were recorded
+    are fetched from Drive in batch requests and stored. Photos whose files
+    are gone from Drive are left out.
+
+    Args:
+        db: Database session
+        drive: GoogleDriveService used to look up file sizes
+        gallery_id: The ID of the gallery
+        favorites_of: Only include the photos this user favorited
+
+    Returns:
+        The planned GalleryArchive
+
+    Raises:
+        HTTPException: The gallery has no Drive connection or nothing to download
+    """
+    connection = db.query(DriveConnection.user_id).filter(
+        DriveConnection.gallery_id == gallery_id
+    ).order_by(DriveConnection.id).first()
+    if connection is None:
+        raise HTTPException(
+            status_code=status.HTTP_404_NOT_FOUND,
+            detail="Gallery has no Drive connection"
+        )
+
+    query = db.query(
+        Photo.id,
+        Photo.drive_file_id,
+        Photo.filename,
+        Photo.folder_path,
+        Photo.drive_modified,
+        Photo.original_size,
+        Photo.original_crc32,
+        Photo.created_at,
+        func.coalesce(DriveConnection.user_id, connection.user_id).label('user_id')
+    ).outerjoin(
+        DriveConnection, DriveConnection.id == Photo.connection_id
+    ).filter(
+        Photo.gallery_id == gallery_id,
+        Photo.drive_file_id != None
+    )
+    if favorites_of is not None:
+        query = query.join(photo_favorites, photo_favorites.c.photo_id == Photo.id).filter(
+            photo_favorites.c.user_id == favorites_of
+        )
+    photos = query.order_by(Photo.id).all()
+
+    # Look up sizes the sync did not record
+    sizes = {}
+    missing = defaultdict(list)
+    for photo in photos:
+        if photo.original_size is None:
+            missing[photo.user_id].append(photo.drive_file_id)
+    if missing:
+        for user_id, file_ids in missing.items():
+            for file_id, file in drive.get_files(user_id, file_ids, fields=('id', 'size')).items():
+                if not isinstance(file, Exception) and file.get('size') is not None:
+                    sizes[file_id] = int(file['size'])
+        updates = [
+            {'id': photo.id, 'original_size': sizes[photo.drive_file_id]}
+            for photo in photos if photo.drive_file_id in sizes
+        ]
+        if updates:
+            db.execute(update(Photo), updates)
+            db.commit()
+
+    entries = []
+    used: Set[str] = set()
+    for photo in photos:
+        size = photo.original_size if photo.original_size is not None else sizes.get(photo.drive_file_id)
+        if size is None:
+            continue
+        entries.append(ZipEntry(
+            name=_unique_name(_archive_name(photo.folder_path, photo.filename), used),
+            size=size,
+            modified=_modified(photo),
+            crc32=photo.original_crc32,
+            key=(photo.id, photo.drive_file_id, photo.user_id)
+        ))
+    if not entries:
+        raise HTTPException(
+            status_code=status.HTTP_404_NOT_FOUND,
+            detail="No photos to download"
+        )
+
+    layout = ZipLayout(entries)
+    fingerprint = json.dumps([layout.zip64] + [
+        [entry.key[0], entry.key[1], entry.name, entry.size, entry.modified.isoformat()]
+        for entry in entries
+    ])
+    return GalleryArchive(
+        layout=layout,
+        etag=f'"{hashlib.sha256(fingerprint.encode()).hexdigest()[:32]}"',
+        uncached={index for index, entry in enumerate(entries) if entry.crc32 is None}
+    )
+
+
+def _read_chunks(source: ImageSource) -> Iterator[bytes]:
+    if isinstance(source, bytes):
+        for offset in range(0, len(source), ARCHIVE_CHUNK_SIZE):
+            yield source[offset:offset + ARCHIVE_CHUNK_SIZE]
+        return
+    with open(source, 'rb') as file:
+        while True:
+            chunk = file.read(ARCHIVE_CHUNK_SIZE)
+            if not chunk:
+                return
+            yield chunk
+
+
+def _discard_download(future: Future) -> None:
+    """Clean up the download of an entry that will not be written."""
+    if not future.cancelled() and future.exception() is None:
+        cleanup_source(future.result())
+
+
+def open_originals(drive, archive: GalleryArchive, prefetch: int = ARCHIVE_PREFETCH):
+    """
+    Build the content opener for ``stream_zip`` that downloads originals from Drive.
+
+    Up to ``prefetch`` originals are downloaded concurrently, in archive
+    order, while the writer streams the current one.
+    """
+    def fetch(user_id: int, file_id: str) -> ImageSource:
+        spool = SpooledDownload(DEFAULT_SPOOL_THRESHOLD)
+        try:
+            drive.download_to(user_id, file_id, spool)
+        except BaseException:
+            spool.discard()
+            raise
+        return spool.source()
+
+    def open_contents(indexes: List[int]) -> Iterator[Tuple[int, Iterable[bytes]]]:
+        if not indexes:
+            return
+        remaining = iter(indexes)
+        pool = ThreadPoolExecutor(max_workers=prefetch, thread_name_prefix="archive-fetch")
+        in_flight: deque = deque()
+
+        def submit() -> None:
+            index = next(remaining, None)
+            if index is not None:
+                _, file_id, user_id = archive.layout.entries[index].key
+                in_flight.append((index, pool.submit(fetch, user_id, file_id)))
+
+        try:
+            for _ in range(prefetch):
+                submit()
+            while in_flight:
+                index, future = in_flight.popleft()
+                source = future.result()
+                submit()
+                try:
+                    yield index, _read_chunks(source)
+                finally:
+                    cleanup_source(source)
+        finally:
+            # The client went away or a download failed: drop what is in flight
+            for _, future in in_flight:
+                if not future.cancel():
+                    future.add_done_callback(_discard_download)
+            pool.shutdown(wait=False)
+
+    return open_contents
+
+
+def save_checksums(archive: GalleryArchive, mismatch: Optional[ZipSizeMismatch] = None, session_factory=SessionLocal) -> None:
+    """
+    Store the CRC-32s computed while streaming, and correct the recorded size
+    of an original that changed since it was synced.
+    """
+    updates = []
+    for index in archive.uncached:
+        entry = archive.layout.entries[index]
+        if entry.crc32 is not None and (mismatch is None or mismatch.index != index):
+            updates.append({'id': entry.key[0], 'original_size': entry.size, 'original_crc32': entry.crc32})
+    if mismatch is not None:
+        photo_id = archive.layout.entries[mismatch.index].key[0]
+        updates.append({'id': photo_id, 'original_size': mismatch.actual, 'original_crc32': None})
+    if not updates:
+        return
+    with session_factory() as db:
+        db.execute(update(Photo), updates)
+        db.commit()
+
+
+def stream_gallery_archive(drive, archive: GalleryArchive, start: int = 0, end: Optional[int] = None) -> Iterator[bytes]:
+    """
+    Stream bytes ``start`` to ``end`` of a gallery archive, caching CRCs as they are computed.
+
+    If an original no longer has its recorded size the stream is aborted,
+    since the archive layout promised to the client would be wrong; the new
+    size is stored so the next download is planned correctly.
+    """
+    mismatch = None
+    try:
+        yield from stream_zip(archive.layout, open_originals(drive, archive), start, end)
+    except ZipSizeMismatch as e:
+        mismatch = e
+        logger.warning("Aborting archive download: %s", e)
+        raise
+    finally:
+        try:
+            save_checksums(archive, mismatch)
+        except Exception:
+            logger.exception("Failed to cache archive checksums")
@@ -5,24 +5,87 @@ for Google Drive folders.
 """
 import os
 import io
-import json
-from typing import List, Dict, Any, Optional
+import re
+import uuid
+from dataclasses import asdict
+from typing import List, Dict, Any, Callable, Collection, Iterator, Optional, Sequence, Tuple, Union
 from datetime import datetime, timedelta
 from google.oauth2.credentials import Credentials
 from google_auth_oauthlib.flow import InstalledAppFlow
-from google.auth.transport.requests import Request
-from googleapiclient.discovery import build
+from google.auth.transport.requests import AuthorizedSession
+from googleapiclient.errors import HttpError
 from googleapiclient.http import MediaIoBaseDownload
 from PIL import Image
 from fastapi import HTTPException
+from sqlalchemy import delete, insert, or_, select, update
 from sqlalchemy.orm import Session
 
-from app.database.models import DriveConnection, Gallery, Photo
+from app.database.models import DriveConnection, Gallery, Photo, PhotoDerivative, SyncCheckpoint
 from app.config import settings
+from app.services.blob_store import blob_store
+from app.services.drive_clients import DriveClientCache
+from app.services.drive_requests import DriveThrottled, drive_requests, parse_retry_after
+from app.services.favorites import delete_photo_favorites
+from app.services.perceptual_hash import NearDuplicateIndex, dhash
+from app.services.drive_sync import (
+    DriveSyncEngine,
+    FOLDER_MIME_TYPE,
+    FolderChanges,
+    SpooledDownload,
+    SyncError,
+    SyncInterrupted,
+    SyncResult,
+    THUMBNAIL_SIZE,
+    cleanup_source,
+    drive_image_metadata,
+    filter_folder_changes,
+    merge_metadata,
+    render_thumbnail,
+)
 
 # Define the scopes needed for Google Drive access
 SCOPES = ['https://www.googleapis.com/auth/drive.readonly']
 
+# Paging and field selection for files().list calls
+DEFAULT_PAGE_SIZE = 1000
+FOLDER_FIELDS = ('id', 'name', 'createdTime', 'modifiedTime')
+IMAGE_FIELDS = ('id', 'name', 'mimeType', 'createdTime', 'modifiedTime', 'webContentLink', 'thumbnailLink')
+# Capture metadata Drive reads from the original, used when the thumbnail we render from has no EXIF
+MEDIA_METADATA_FIELD = 'imageMediaMetadata(time, cameraMake, cameraModel, lens, rotation, width, height)'
+SYNC_IMAGE_FIELDS = ('id', 'name', 'modifiedTime', 'size', 'webContentLink', 'thumbnailLink', MEDIA_METADATA_FIELD)
+TREE_IMAGE_FIELDS = SYNC_IMAGE_FIELDS + ('parents',)
+CHANGE_FILE_FIELDS = SYNC_IMAGE_FIELDS + ('mimeType', 'parents', 'trashed')
+
+# Folder tree traversal: folders per files().list query, and how deep to walk
+PARENTS_PER_QUERY = 25
+MAX_FOLDER_DEPTH = 32
+
+# Chunk size for media downloads
+DOWNLOAD_CHUNK_SIZE = 4 * 1024 * 1024
+
+# Number of rows written per statement when reconciling a folder
+RECONCILE_BATCH_SIZE = 500
+
+# Sync modes recorded in a checkpoint
+SYNC_MODE_FULL = 'full'
+SYNC_MODE_CHANGES = 'changes'
+
+# Files processed between sync checkpoints, and how long a checkpoint left
+# by an interrupted sync is resumed before the sync starts over
+CHECKPOINT_INTERVAL = 250
+CHECKPOINT_MAX_AGE = timedelta(days=1)
+
+# Drive errors meaning a stored changes or listing page token can no longer be used
+STALE_PAGE_TOKEN_STATUSES = (400, 404, 410)
+
+def _parents_query(folder_ids: Sequence[str]) -> str:
+    """Drive query clause matching files in any of the given folders."""
+    return ' or '.join(f"'{folder_id}' in parents" for folder_id in folder_ids)
+
+def _file_size(file: Dict[str, Any]) -> Optional[int]:
+    """Size of a Drive file in bytes; Drive reports it as a string."""
+    return int(file['size']) if file.get('size') is not None else None
+
 class GoogleDriveService:
     """Service for interacting with Google Drive API."""
     
@@ -30,39 +93,39 @@ class GoogleDriveService:
         """Initialize the Google Drive service."""
         self.credentials_path = settings.GOOGLE_CREDENTIALS_PATH
         self.token_path = settings.GOOGLE_TOKEN_PATH
+        self.clients = DriveClientCache(self.token_path, SCOPES)
+        self.requests = drive_requests
+        self.blob_store = blob_store
+        self.sync_engine = DriveSyncEngine(self)
         
     def get_credentials(self, user_id: int) -> Credentials:
         """
         Get or refresh Google Drive credentials for a specific user.
         
+        Credentials are cached per user; concurrent callers share a single
+        token refresh.
+        
         Args:
             user_id: The ID of the user to get credentials for
             
         Returns:
             Credentials object for Google Drive API
         """
-        creds = None
-        token_file = f"{self.token_path}/token_{user_id}.json"
-        
-        # Load existing token if it exists
-        if os.path.exists(token_file):
-            with open(token_file, 'r') as token:
-                creds = Credentials.from_authorized_user_info(json.load(token), SCOPES)
-        
-        # If credentials don't exist or are invalid, raise an exception
-        if not creds or not creds.valid:
-            if creds and creds.expired and creds.refresh_token:
-                creds.refresh(Request())
-                # Save the refreshed credentials
-                with open(token_file, 'w') as token:
-                    token.write(creds.to_json())
-            else:
-                raise HTTPException(
-                    status_code=401, 
-                    detail="Google Drive authorization required"
-                )
-                
-        return creds
+        return self.clients.get_credentials(user_id)
+    
+    def get_service(self, user_id: int):
+        """
+        Get a Google Drive API service object for a specific user.
+        
+        Service objects are cached per user and thread.
+        
+        Args:
+            user_id: The ID of the user
+            
+        Returns:
+            Drive v3 service object
+        """
+        return self.clients.get_service(user_id)
     
     def initiate_auth_flow(self) -> str:
         """
@@ -114,9 +177,93 @@ class GoogleDriveService:
         if not os.path.exists(token_dir):
             os.makedirs(token_dir)
             
-        token_file = f"{self.token_path}/token_{user_id}.json"
-        with open(token_file, 'w') as token:
-            token.write(creds.to_json())
+        self.clients.save_credentials(user_id, creds)
+    
+    def _iter_file_pages(
+        self,
+        user_id: int,
+        service,
+        query: str,
+        fields: Sequence[str],
+        page_size: int = DEFAULT_PAGE_SIZE,
+        page_token: Optional[str] = None
+    ) -> Iterator[Tuple[List[Dict[str, Any]], Optional[str]]]:
+        """
+        Stream the pages of a files().list query, following nextPageToken.
+        
+        Args:
+            user_id: The ID of the user
+            service: Drive API service object
+            query: Drive search query
+            fields: File fields to request for each result
+            page_size: Number of files to request per page
+            page_token: Page to start from, or None for the first page
+            
+        Yields:
+            (files on the page, token of the next page or None) tuples
+        """
+        while True:
+            results = self.requests.execute(user_id, service.files().list(
+                q=query,
+                spaces='drive',
+                pageSize=page_size,
+                pageToken=page_token,
+                fields=f"nextPageToken, files({', '.join(fields)})"
+            ))
+            
+            page_token = results.get('nextPageToken')
+            yield results.get('files', []), page_token
+            if not page_token:
+                break
+    
+    def _iter_files(
+        self,
+        user_id: int,
+        service,
+        query: str,
+        fields: Sequence[str],
+        page_size: int = DEFAULT_PAGE_SIZE
+    ) -> Iterator[Dict[str, Any]]:
+        """
+        Stream the results of a files().list query.
+        
+        Only one page is held in memory at a time.
+        
+        Args:
+            user_id: The ID of the user
+            service: Drive API service object
+            query: Drive search query
+            fields: File fields to request for each result
+            page_size: Number of files to request per page
+            
+        Yields:
+            File metadata dicts
+        """
+        for files, _ in self._iter_file_pages(user_id, service, query, fields, page_size):
+            yield from files
+    
+    def iter_folders(
+        self,
+        user_id: int,
+        fields: Sequence[str] = FOLDER_FIELDS,
+        page_size: int = DEFAULT_PAGE_SIZE
+    ) -> Iterator[Dict[str, Any]]:
+        """
+        Stream all folders in the user's Google Drive.
+        
+        Args:
+            user_id: The ID of the user
+            fields: Folder fields to request
+            page_size: Number of folders to request per page
+            
+        Yields:
+            Folder metadata dicts
+        """
+        service = self.get_service(user_id)
+        
+        # Search for folders
+        query = f"mimeType='{FOLDER_MIME_TYPE}' and trashed=false"
+        yield from self._iter_files(user_id, service, query, fields, page_size)
     
     def list_folders(self, user_id: int) -> List[Dict[str, Any]]:
         """
@@ -128,19 +275,56 @@ class GoogleDriveService:
         Returns:
             List of folder metadata
         """
-        creds = self.get_credentials(user_id)
-        service = build('drive', 'v3', credentials=creds)
+        return list(self.iter_folders(user_id))
+    
+    def iter_images_in_folder(
+        self,
+        user_id: int,
+        folder_id: str,
+        fields: Sequence[str] = IMAGE_FIELDS,
+        page_size: int = DEFAULT_PAGE_SIZE
+    ) -> Iterator[Dict[str, Any]]:
+        """
+        Stream the image files in a specific Google Drive folder.
         
-        # Search for folders
-        query = "mimeType='application/vnd.google-apps.folder' and trashed=false"
-        results = service.files().list(
-            q=query,
-            spaces='drive',
-            fields='files(id, name, createdTime, modifiedTime)'
-        ).execute()
-        
-        folders = results.get('files', [])
-        return folders
+        Args:
+            user_id: The ID of the user
+            folder_id: The ID of the Google Drive folder
+            fields: Image fields to request
+            page_size: Number of images to request per page
+            
+        Yields:
+            Image file metadata dicts
+        """
+        for files, _ in self.iter_image_pages(user_id, folder_id, fields, page_size):
+            yield from files
+    
+    def iter_image_pages(
+        self,
+        user_id: int,
+        folder_id: str,
+        fields: Sequence[str] = IMAGE_FIELDS,
+        page_size: int = DEFAULT_PAGE_SIZE,
+        page_token: Optional[str] = None
+    ) -> Iterator[Tuple[List[Dict[str, Any]], Optional[str]]]:
+        """
+        Stream the image files in a Google Drive folder page by page.
+        
+        Args:
+            user_id: The ID of the user
+            folder_id: The ID of the Google Drive folder
+            fields: Image fields to request
+            page_size: Number of images to request per page
+            page_token: Page to resume from, or None for the first page
+            
+        Yields:
+            (images on the page, token of the next page or None) tuples
+        """
+        service = self.get_service(user_id)
+        
+        # Search for image files in the specified folder
+        query = f"'{folder_id}' in parents and mimeType contains 'image/' and trashed=false"
+        yield from self._iter_file_pages(user_id, service, query, fields, page_size, page_token)
     
     def list_images_in_folder(self, user_id: int, folder_id: str) -> List[Dict[str, Any]]:
         """
@@ -153,57 +337,294 @@ class GoogleDriveService:
         Returns:
             List of image file metadata
         """
-        creds = self.get_credentials(user_id)
-        service = build('drive', 'v3', credentials=creds)
+        return list(self.iter_images_in_folder(user_id, folder_id))
+    
+    def get_folder_tree(
+        self,
+        user_id: int,
+        root_id: str,
+        max_depth: int = MAX_FOLDER_DEPTH
+    ) -> Dict[str, str]:
+        """
+        Walk the sub-folders of a Drive folder breadth-first.
         
-        # Search for image files in the specified folder
-        query = f"'{folder_id}' in parents and mimeType contains 'image/' and trashed=false"
-        results = service.files().list(
-            q=query,
-            spaces='drive',
-            fields='files(id, name, mimeType, createdTime, modifiedTime, webContentLink, thumbnailLink)'
-        ).execute()
-        
-        images = results.get('files', [])
-        return images
+        Each level is fetched with one batch request, with the parents of a
+        level packed PARENTS_PER_QUERY to a files().list query, so a tree of
+        dozens of folders takes a handful of round trips. Shortcuts are not
+        followed, and a folder reachable through several parents is visited
+        once, so cycles cannot make the walk loop.
+        
+        Args:
+            user_id: The ID of the user
+            root_id: The ID of the Google Drive folder at the top of the tree
+            max_depth: Deepest level of sub-folders to walk
+            
+        Returns:
+            Mapping from folder ID to its path relative to the root ('' for
+            the root itself), in breadth-first order
+        """
+        service = self.get_service(user_id)
+        tree = {root_id: ''}
+        frontier = [root_id]
+        depth = 0
+        
+        while frontier and depth < max_depth:
+            depth += 1
+            chunks = [frontier[i:i + PARENTS_PER_QUERY] for i in range(0, len(frontier), PARENTS_PER_QUERY)]
+            pending = {(index, None): chunk for index, chunk in enumerate(chunks)}
+            frontier = []
+            
+            while pending:
+                responses = self.requests.execute_batch(user_id, service, {
+                    key: service.files().list(
+                        q=f"({_parents_query(chunk)}) and mimeType='{FOLDER_MIME_TYPE}' and trashed=false",
+                        spaces='drive',
+                        pageSize=DEFAULT_PAGE_SIZE,
+                        pageToken=key[1],
+                        fields="nextPageToken, files(id, name, parents)"
+                    )
+                    for key, chunk in pending.items()
+                })
+                
+                next_pending = {}
+                for key, response in sorted(responses.items(), key=lambda item: item[0][0]):
+                    if isinstance(response, Exception):
+                        raise response
+                    chunk = pending[key]
+                    for folder in response.get('files', []):
+                        parent = next((p for p in folder.get('parents', []) if p in chunk), None)
+                        if parent is None or folder['id'] in tree:
+                            continue
+                        name = folder['name'].replace('/', '_')
+                        tree[folder['id']] = f"{tree[parent]}/{name}" if tree[parent] else name
+                        frontier.append(folder['id'])
+                    if response.get('nextPageToken'):
+                        next_pending[(key[0], response['nextPageToken'])] = chunk
+                pending = next_pending
+        
+        return tree
     
-    def generate_thumbnail(self, user_id: int, file_id: str, size: tuple = (300, 300)) -> bytes:
+    def iter_tree_image_pages(
+        self,
+        user_id: int,
+        folder_ids: Sequence[str],
+        fields: Sequence[str] = TREE_IMAGE_FIELDS,
+        page_size: int = DEFAULT_PAGE_SIZE,
+        position: Optional[str] = None
+    ) -> Iterator[Tuple[List[Dict[str, Any]], Optional[str]]]:
         """
-        Generate a thumbnail for a Google Drive image file.
+        Stream the image files in a set of folders page by page.
+        
+        Folders are queried PARENTS_PER_QUERY at a time. The listing position
+        is an opaque string that can be saved and passed back to resume.
         
         Args:
             user_id: The ID of the user
-            file_id: The ID of the Google Drive file
-            size: The desired thumbnail size (width, height)
+            folder_ids: IDs of the Google Drive folders
+            fields: Image fields to request; include ``parents`` to tell the
+                folders apart
+            page_size: Number of images to request per page
+            position: Position to resume from, or None to start at the beginning
+            
+        Yields:
+            (images on the page, position of the next page or None) tuples
+        """
+        service = self.get_service(user_id)
+        chunk_index, _, page_token = (position or '0:').partition(':')
+        chunk_index = int(chunk_index)
+        
+        for index in range(chunk_index, len(folder_ids), PARENTS_PER_QUERY):
+            chunk = folder_ids[index:index + PARENTS_PER_QUERY]
+            query = f"({_parents_query(chunk)}) and mimeType contains 'image/' and trashed=false"
+            pages = self._iter_file_pages(
+                user_id, service, query, fields, page_size,
+                page_token=(page_token or None) if index == chunk_index else None
+            )
+            for files, next_page_token in pages:
+                if next_page_token:
+                    yield files, f"{index}:{next_page_token}"
+                elif index + PARENTS_PER_QUERY < len(folder_ids):
+                    yield files, f"{index + PARENTS_PER_QUERY}:"
+                else:
+                    yield files, None
+    
+    def get_files(
+        self,
+        user_id: int,
+        file_ids: Sequence[str],
+        fields: Sequence[str] = FOLDER_FIELDS
+    ) -> Dict[str, Any]:
+        """
+        Fetch metadata for several files, packed into batch requests.
+        
+        Args:
+            user_id: The ID of the user
+            file_ids: IDs of the Google Drive files
+            fields: File fields to request
             
         Returns:
-            Thumbnail image data as bytes
+            Mapping from file ID to its metadata, or to the HttpError Drive
+            returned for it
+        """
+        service = self.get_service(user_id)
+        return self.requests.execute_batch(user_id, service, {
+            file_id: service.files().get(fileId=file_id, fields=', '.join(fields))
+            for file_id in dict.fromkeys(file_ids)
+        })
+    
+    def get_start_page_token(self, user_id: int) -> str:
+        """
+        Get a changes page token pointing at the current state of the user's Drive.
+        
+        Args:
+            user_id: The ID of the user
+            
+        Returns:
+            Page token to pass to list_folder_changes on the next sync
+        """
+        service = self.get_service(user_id)
+        response = self.requests.execute(user_id, service.changes().getStartPageToken())
+        return response['startPageToken']
+    
+    def list_folder_changes(
+        self,
+        user_id: int,
+        folder_id: Union[str, Collection[str]],
+        page_token: str,
+        page_size: int = DEFAULT_PAGE_SIZE,
+        track_folders: bool = False
+    ) -> FolderChanges:
+        """
+        Fetch the image changes in a folder since the given changes page token.
+        
+        Args:
+            user_id: The ID of the user
+            folder_id: The ID of the Google Drive folder, or the IDs of every
+                folder in a synced tree
+            page_token: Changes page token stored by the previous sync
+            page_size: Number of changes to request per page
+            track_folders: Flag changes to the tree's sub-folders as ``tree_changed``
+            
+        Returns:
+            FolderChanges with the added/modified images, the removed file IDs
+            and the page token to store for the next sync
         """
-        creds = self.get_credentials(user_id)
-        service = build('drive', 'v3', credentials=creds)
+        service = self.get_service(user_id)
+        fields = f"nextPageToken, newStartPageToken, changes(fileId, removed, file({', '.join(CHANGE_FILE_FIELDS)}))"
         
-        # Download the file
+        changes = []
+        while True:
+            response = self.requests.execute(user_id, service.changes().list(
+                pageToken=page_token,
+                pageSize=page_size,
+                spaces='drive',
+                includeRemoved=True,
+                fields=fields
+            ))
+            changes.extend(response.get('changes', []))
+            
+            if 'newStartPageToken' in response:
+                return filter_folder_changes(
+                    changes,
+                    folder_id,
+                    response['newStartPageToken'],
+                    track_folders=track_folders
+                )
+            page_token = response['nextPageToken']
+    
+    def download_to(self, user_id: int, file_id: str, fileobj) -> None:
+        """
+        Download the contents of a Google Drive file into a writable file object.
+        
+        Args:
+            user_id: The ID of the user
+            file_id: The ID of the Google Drive file
+            fileobj: Writable file object receiving the contents
+        """
+        service = self.get_service(user_id)
+        
+        # Download the file in chunks
         request = service.files().get_media(fileId=file_id)
-        file = io.BytesIO()
-        downloader = MediaIoBaseDownload(file, request)
+        downloader = MediaIoBaseDownload(fileobj, request, chunksize=DOWNLOAD_CHUNK_SIZE)
         
         done = False
         while not done:
-            status, done = downloader.next_chunk()
+            status, done = self.requests.call(user_id, downloader.next_chunk)
+    
+    def download_file(self, user_id: int, file_id: str) -> bytes:
+        """
+        Download the contents of a Google Drive file.
+        
+        Args:
+            user_id: The ID of the user
+            file_id: The ID of the Google Drive file
             
-        # Reset file pointer to the beginning
-        file.seek(0)
+        Returns:
+            The file contents as bytes
+        """
+        file = io.BytesIO()
+        self.download_to(user_id, file_id, file)
+        return file.getvalue()
+    
+    def download_thumbnail_link(self, user_id: int, link: str, size: tuple) -> Optional[bytes]:
+        """
+        Fetch Drive's pre-rendered thumbnail for a file, if it is large enough.
+        
+        Drive thumbnail links accept an ``=s<pixels>`` suffix bounding the
+        longest side; the result is only used when it covers the requested size.
+        
+        Args:
+            user_id: The ID of the user
+            link: The file's thumbnailLink
+            size: The desired thumbnail size (width, height)
+            
+        Returns:
+            Image bytes, or None if the original should be downloaded instead
+        """
+        url = re.sub(r'=s\d+$', '', link) + f"=s{max(size)}"
         
-        # Create thumbnail using PIL
-        image = Image.open(file)
-        image.thumbnail(size)
+        def fetch():
+            response = AuthorizedSession(self.get_credentials(user_id)).get(url, timeout=30)
+            if response.status_code in (429, 503):
+                raise DriveThrottled(response.status_code, parse_retry_after(response.headers))
+            return response
         
-        # Save thumbnail to bytes
-        thumbnail_bytes = io.BytesIO()
-        image.save(thumbnail_bytes, format=image.format or 'JPEG')
-        thumbnail_bytes.seek(0)
+        try:
+            response = self.requests.call(user_id, fetch)
+            response.raise_for_status()
+            with Image.open(io.BytesIO(response.content)) as image:
+                width, height = image.size
+        except Exception:
+            return None
         
-        return thumbnail_bytes.getvalue()
+        if width < size[0] and height < size[1]:
+            return None
+        return response.content
+    
+    def generate_thumbnail(self, user_id: int, file_id: str, size: tuple = THUMBNAIL_SIZE) -> bytes:
+        """
+        Generate a thumbnail for a Google Drive image file.
+        
+        Args:
+            user_id: The ID of the user
+            file_id: The ID of the Google Drive file
+            size: The desired thumbnail size (width, height)
+            
+        Returns:
+            Thumbnail image data as bytes
+        """
+        spool = SpooledDownload()
+        try:
+            self.download_to(user_id, file_id, spool)
+        except BaseException:
+            spool.discard()
+            raise
+        
+        source = spool.source()
+        try:
+            return render_thumbnail(source, size)
+        finally:
+            cleanup_source(source)
     
     def connect_drive_folder(
         self, 
@@ -211,28 +632,34 @@ class GoogleDriveService:
         user_id: int, 
         folder_id: str, 
         gallery_id: int, 
-        auto_sync: bool = True
+        auto_sync: bool = True,
+        recursive: bool = False
     ) -> DriveConnection:
         """
         Connect a Google Drive folder to a gallery.
         
+        The initial sync is not run here; callers queue it as a background job
+        when auto_sync is enabled.
+        
         Args:
             db: Database session
             user_id: The ID of the user
             folder_id: The ID of the Google Drive folder
             gallery_id: The ID of the gallery to connect to
             auto_sync: Whether to automatically sync the folder
+            recursive: Whether to sync the folder's sub-folders too
             
         Returns:
             The created DriveConnection object
         """
         # Verify the folder exists
-        creds = self.get_credentials(user_id)
-        service = build('drive', 'v3', credentials=creds)
-        
         try:
-            folder = service.files().get(fileId=folder_id).execute()
+            folder = self.get_files(user_id, [folder_id])[folder_id]
+            if isinstance(folder, Exception):
+                raise folder
             folder_name = folder.get('name', 'Unnamed Folder')
+        except HTTPException:
+            raise
         except Exception as e:
             raise HTTPException(
                 status_code=404,
@@ -246,6 +673,7 @@ class GoogleDriveService:
             drive_folder_id=folder_id,
             drive_folder_name=folder_name,
             auto_sync=auto_sync,
+            recursive=recursive,
             last_synced=None
         )
         
@@ -253,22 +681,45 @@ class GoogleDriveService:
         db.commit()
         db.refresh(connection)
         
-        # If auto-sync is enabled, sync the folder immediately
-        if auto_sync:
-            self.sync_drive_folder(db, connection.id)
-            
         return connection
     
-    def sync_drive_folder(self, db: Session, connection_id: int) -> List[Photo]:
+    def sync_drive_folder(
+        self,
+        db: Session,
+        connection_id: int,
+        full_rescan: bool = False,
+        progress: Optional[Callable[[int, int], None]] = None,
+        should_stop: Optional[Callable[[], bool]] = None
+    ) -> SyncResult:
         """
         Sync images from a connected Google Drive folder to a gallery.
         
+        When the connection has a stored changes page token, only files added,
+        modified or trashed since the last sync are fetched from the Drive
+        changes feed. The first sync, a stale token, or ``full_rescan`` fall
+        back to listing the whole folder.
+        
+        New images are downloaded and their derivatives (thumbnail, lightbox
+        and social sizes, as WebP and progressive JPEG) rendered concurrently
+        by the sync engine; a failure on one file is recorded in the result rather than
+        aborting the whole sync.
+        
+        Progress is checkpointed to a SyncCheckpoint row every
+        CHECKPOINT_INTERVAL files: the listing page, the files still being
+        downloaded or rendered, and the errors so far. A sync that crashed or
+        was interrupted resumes from its checkpoint on the next run instead of
+        starting over.
+        
         Args:
             db: Database session
             connection_id: The ID of the DriveConnection
-            
+            full_rescan: Ignore the stored changes page token and re-list the folder
+            progress: Optional callback receiving (files listed, files processed)
+            should_stop: Optional callback checked at each checkpoint; when it
+                returns True the sync stops with SyncInterrupted
+        
         Returns:
-            List of created or updated Photo objects
+            SyncResult with the created or updated photo IDs and per-file errors
         """
         # Get the connection
         connection = db.query(DriveConnection).filter(DriveConnection.id == connection_id).first()
@@ -277,7 +728,7 @@ class GoogleDriveService:
                 status_code=404,
                 detail="Drive connection not found"
             )
-            
+        
         # Get the gallery
         gallery = db.query(Gallery).filter(Gallery.id == connection.gallery_id).first()
         if not gallery:
@@ -285,78 +736,446 @@ class GoogleDriveService:
                 status_code=404,
                 detail="Gallery not found"
             )
+        
+        # Resume an interrupted sync unless its checkpoint is too old to trust
+        checkpoint = db.query(SyncCheckpoint).filter(SyncCheckpoint.connection_id == connection.id).first()
+        if checkpoint is not None and (
+            checkpoint.updated_at < datetime.utcnow() - CHECKPOINT_MAX_AGE
+            or (full_rescan and checkpoint.mode != SYNC_MODE_FULL)
+        ):
+            db.delete(checkpoint)
+            db.commit()
+            checkpoint = None
+        
+        # A recursive connection needs its folder tree from a full sync
+        # before the changes feed can be used
+        root_tree = {connection.drive_folder_id: ''}
+        known_tree = (connection.folder_tree or None) if connection.recursive else root_tree
+        
+        if checkpoint is not None:
+            mode = checkpoint.mode
+        elif connection.changes_page_token and known_tree and not full_rescan:
+            mode = SYNC_MODE_CHANGES
+        else:
+            mode = SYNC_MODE_FULL
+        
+        # Try the changes feed first
+        folder_changes = None
+        if mode == SYNC_MODE_CHANGES:
+            tree = known_tree or root_tree
+            try:
+                folder_changes = self.list_folder_changes(
+                    connection.user_id,
+                    list(tree),
+                    connection.changes_page_token,
+                    track_folders=connection.recursive
+                )
+            except HttpError as e:
+                if e.resp.status not in STALE_PAGE_TOKEN_STATUSES:
+                    raise
             
-        # List images in the folder
-        images = self.list_images_in_folder(connection.user_id, connection.drive_folder_id)
-        
-        # Process each image
-        created_photos = []
-        for image in images:
-            # Check if the photo already exists
-            existing_photo = db.query(Photo).filter(
-                Photo.gallery_id == gallery.id,
-                Photo.drive_file_id == image['id']
-            ).first()
-            
-            if existing_photo:
-                # Update existing photo if needed
-                if existing_photo.drive_modified != image['modifiedTime']:
-                    existing_photo.drive_modified = image['modifiedTime']
-                    existing_photo.updated_at = datetime.utcnow()
+            # Sub-folders were added, moved or removed: walk the tree again
+            if folder_changes is None or folder_changes.tree_changed:
+                folder_changes = None
+                mode = SYNC_MODE_FULL
+                if checkpoint is not None:
+                    db.delete(checkpoint)
                     db.commit()
-                    db.refresh(existing_photo)
-                    created_photos.append(existing_photo)
+                    checkpoint = None
+        
+        if checkpoint is None:
+            # For a full rescan, take the start token before listing so that
+            # changes made while we list are picked up by the next sync
+            checkpoint = SyncCheckpoint(
+                connection_id=connection.id,
+                run_id=uuid.uuid4().hex,
+                mode=mode,
+                start_page_token=(
+                    self.get_start_page_token(connection.user_id)
+                    if mode == SYNC_MODE_FULL else None
+                ),
+                listing_complete=False,
+                pending=[],
+                errors=[]
+            )
+            if mode == SYNC_MODE_FULL:
+                checkpoint.folders = (
+                    self.get_folder_tree(connection.user_id, connection.drive_folder_id)
+                    if connection.recursive else root_tree
+                )
+            db.add(checkpoint)
+            db.commit()
+        
+        if mode == SYNC_MODE_FULL:
+            tree = checkpoint.folders or root_tree
+        
+        if mode == SYNC_MODE_FULL:
+            page_token = checkpoint.start_page_token
+        else:
+            page_token = folder_changes.new_page_token
+        
+        # Load the gallery's existing Drive files once and reconcile in memory
+        existing = self._load_existing_photos(db, gallery.id)
+        
+        def owned(known):
+            # Photos synced by the gallery's other connections are theirs to
+            # update and remove; unassigned ones are claimed when seen
+            return known[3] in (None, connection.id)
+        result = SyncResult(errors=[SyncError(**error) for error in checkpoint.errors or []])
+        run_id = checkpoint.run_id
+        updates = []
+        inserts = []
+        seen = []
+        pending = {image['id']: image for image in checkpoint.pending or []}
+        handled = set()
+        listing = {
+            'page_token': checkpoint.list_page_token if mode == SYNC_MODE_FULL else None,
+            'complete': bool(checkpoint.listing_complete) and mode == SYNC_MODE_FULL
+        }
+        counts = {'listed': 0, 'processed': 0, 'checkpointed': 0}
+        hash_indexes = {}
+        
+        def report_progress():
+            if progress is not None:
+                progress(counts['listed'], counts['processed'])
+        
+        def flush():
+            if inserts:
+                photo_ids = self._insert_photos(db, inserts)
+                self._flag_duplicates(db, gallery.id, hash_indexes, [
+                    (photo_id, photo['perceptual_hash'])
+                    for photo_id, (photo, _) in zip(photo_ids, inserts)
+                    if photo['perceptual_hash'] is not None
+                ])
+                result.photo_ids.extend(photo_ids)
+                inserts.clear()
+            if updates:
+                result.photo_ids.extend(self._update_photos(db, updates))
+                updates.clear()
+            if seen:
+                self._mark_photos_seen(db, seen, run_id, connection.id)
+                seen.clear()
+        
+        def save_checkpoint(last_file_id: Optional[str] = None):
+            flush()
+            checkpoint.list_page_token = listing['page_token']
+            checkpoint.listing_complete = listing['complete']
+            checkpoint.pending = list(pending.values())
+            checkpoint.errors = [asdict(error) for error in result.errors]
+            if last_file_id is not None:
+                checkpoint.last_file_id = last_file_id
+            db.commit()
+            counts['checkpointed'] = counts['processed']
+            if should_stop is not None and should_stop():
+                raise SyncInterrupted(f"Sync of connection {connection.id} interrupted")
+        
+        def folder_path(image):
+            parent = next((p for p in image.get('parents', []) if p in tree), None)
+            return tree.get(parent) or None
+        
+        def needs_download(image):
+            """Reconcile a listed image against the gallery; True if it is new."""
+            if image['id'] in handled:
+                return False
+            handled.add(image['id'])
+            counts['listed'] += 1
+            
+            known = existing.get(image['id'])
+            if known is None:
+                pending[image['id']] = image
+                return True
+            
+            counts['processed'] += 1
+            report_progress()
+            if not owned(known):
+                return False
+            photo_id, drive_modified, path, _ = known
+            if mode == SYNC_MODE_FULL:
+                seen.append(photo_id)
+            if drive_modified != image['modifiedTime'] or path != folder_path(image):
+                updates.append({
+                    'id': photo_id,
+                    'drive_modified': image['modifiedTime'],
+                    'folder_path': folder_path(image),
+                    'original_size': _file_size(image),
+                    'original_crc32': None,
+                    'updated_at': datetime.utcnow()
+                })
+            if len(updates) >= RECONCILE_BATCH_SIZE or len(seen) >= RECONCILE_BATCH_SIZE:
+                flush()
+            return False
+        
+        def image_pages():
+            if mode == SYNC_MODE_CHANGES:
+                yield folder_changes.images, None
+                return
+            
+            pages = self.iter_tree_image_pages(
+                connection.user_id,
+                list(tree),
+                position=listing['page_token']
+            )
+            if listing['page_token']:
+                try:
+                    first_page = next(pages, None)
+                except HttpError as e:
+                    # The saved listing page expired; list again from the top.
+                    # Files already synced are reconciled, not downloaded.
+                    if e.resp.status not in STALE_PAGE_TOKEN_STATUSES:
+                        raise
+                    listing['page_token'] = None
+                    first_page = None
+                    pages = self.iter_tree_image_pages(connection.user_id, list(tree))
+                if first_page is not None:
+                    yield first_page
+            yield from pages
+        
+        def new_images():
+            # Work left unfinished by the interrupted run goes first
+            for image in list(pending.values()):
+                del pending[image['id']]
+                if needs_download(image):
+                    yield image
+            
+            if listing['complete']:
+                return
+            for files, next_page_token in image_pages():
+                for image in files:
+                    if needs_download(image):
+                        yield image
+                # The checkpoint re-lists the current page until all of it has
+                # been handed out; files already handled are skipped on resume
+                listing['page_token'] = next_page_token
+            listing['complete'] = True
+        
+        # Download new images and render their derivatives concurrently. The
+        # rendered images go straight to the blob store, so only their
+        # digests are buffered for the batched inserts.
+        for image, rendered, error in self.sync_engine.fetch_derivatives(connection.user_id, new_images()):
+            pending.pop(image['id'], None)
+            counts['processed'] += 1
+            report_progress()
+            if error is not None:
+                result.errors.append(SyncError(
+                    file_id=image['id'],
+                    filename=image.get('name'),
+                    error=str(error)
+                ))
             else:
-                # Generate thumbnail
-                thumbnail_data = self.generate_thumbnail(connection.user_id, image['id'])
+                variants = {}
+                derivative_rows = []
+                for derivative in rendered.derivatives:
+                    variants.setdefault(derivative['variant'], []).append(derivative['format'])
+                    derivative_rows.append({
+                        'variant': derivative['variant'],
+                        'format': derivative['format'],
+                        'width': derivative['width'],
+                        'height': derivative['height'],
+                        'blob_hash': self.blob_store.write(derivative['data']),
+                        'size': len(derivative['data'])
+                    })
+                grid_thumbnail = next((
+                    row for row in derivative_rows
+                    if row['variant'] == 'thumb' and row['format'] == 'jpeg'
+                ), {})
+                perceptual_hash = None
+                for derivative in rendered.derivatives:
+                    if derivative['variant'] == 'thumb' and derivative['format'] == 'jpeg':
+                        perceptual_hash = dhash(derivative['data'])
+                        break
                 
-                # Create new photo
-                new_photo = Photo(
-                    gallery_id=gallery.id,
-                    filename=image['name'],
-                    drive_file_id=image['id'],
-                    drive_modified=image['modifiedTime'],
-                    thumbnail=thumbnail_data,
-                    url=image.get('webContentLink', ''),
-                    favorites_count=0,
-                    created_at=datetime.utcnow(),
-                    updated_at=datetime.utcnow()
+                inserts.append(({
+                    'gallery_id': gallery.id,
+                    'connection_id': connection.id,
+                    'filename': image['name'],
+                    'drive_file_id': image['id'],
+                    'drive_modified': image['modifiedTime'],
+                    'folder_path': folder_path(image),
+                    'thumbnail_hash': grid_thumbnail.get('blob_hash'),
+                    'thumbnail_size': grid_thumbnail.get('size'),
+                    'perceptual_hash': perceptual_hash,
+                    'derivative_variants': variants,
+                    **merge_metadata(rendered.metadata, drive_image_metadata(image)),
+                    'original_size': _file_size(image),
+                    'url': image.get('webContentLink', ''),
+                    'favorites_count': 0,
+                    'sync_run': run_id,
+                    'created_at': datetime.utcnow(),
+                    'updated_at': datetime.utcnow()
+                }, derivative_rows))
+                if len(inserts) >= RECONCILE_BATCH_SIZE:
+                    flush()
+            
+            if counts['processed'] - counts['checkpointed'] >= CHECKPOINT_INTERVAL:
+                save_checkpoint(image['id'])
+        
+        flush()
+        
+        # Drop photos whose files were trashed, deleted or moved out of the
+        # folder. After a full listing, any photo of this connection the run
+        # did not mark as seen is gone from Drive; photos synced by the
+        # gallery's other connections are left to their own syncs.
+        if mode == SYNC_MODE_FULL:
+            removed_photo_ids = db.execute(
+                select(Photo.id).where(
+                    Photo.connection_id == connection.id,
+                    Photo.drive_file_id != None,
+                    or_(Photo.sync_run == None, Photo.sync_run != run_id)
                 )
-                
-                db.add(new_photo)
-                db.commit()
-                db.refresh(new_photo)
-                created_photos.append(new_photo)
-                
-        # Update the last synced time
+            ).scalars().all()
+        else:
+            removed_photo_ids = [
+                existing[file_id][0] for file_id in folder_changes.removed_ids
+                if file_id in existing and owned(existing[file_id])
+            ]
+        if removed_photo_ids:
+            self._delete_photos(db, removed_photo_ids)
+            result.removed_ids.extend(removed_photo_ids)
+        
+        # Only advance the changes page token when every file made it, so
+        # failed files are retried by the next incremental sync
+        if not result.errors:
+            connection.changes_page_token = page_token
+        if mode == SYNC_MODE_FULL:
+            connection.folder_tree = tree
         connection.last_synced = datetime.utcnow()
+        db.delete(checkpoint)
         db.commit()
         
-        return created_photos
+        return result
+
+    def _flag_duplicates(
+        self,
+        db: Session,
+        gallery_id: int,
+        indexes: Dict[int, NearDuplicateIndex],
+        photos: List[Tuple[int, int]]
+    ) -> None:
+        """
+        Mark newly inserted photos that nearly duplicate an earlier photo in the gallery.
+        
+        The gallery's hashes are loaded into a NearDuplicateIndex on the first
+        batch and kept in ``indexes`` for the rest of the sync.
+        """
+        if not photos:
+            return
+        index = indexes.get(gallery_id)
+        if index is None:
+            new_ids = {photo_id for photo_id, _ in photos}
+            rows = [
+                (photo_id, perceptual_hash)
+                for photo_id, perceptual_hash in db.query(Photo.id, Photo.perceptual_hash).filter(
+                    Photo.gallery_id == gallery_id,
+                    Photo.perceptual_hash != None
+                ).order_by(Photo.id)
+                if photo_id not in new_ids
+            ]
+            index = indexes[gallery_id] = NearDuplicateIndex(
+                [photo_id for photo_id, _ in rows],
+                [perceptual_hash for _, perceptual_hash in rows]
+            )
+        
+        matches = index.match_and_add(
+            [photo_id for photo_id, _ in photos],
+            [perceptual_hash for _, perceptual_hash in photos]
+        )
+        if matches:
+            db.execute(update(Photo), [
+                {'id': photo_id, 'duplicate_of': original_id}
+                for photo_id, original_id, _ in matches
+            ])
+            db.commit()
+    
+    def _mark_photos_seen(self, db: Session, photo_ids: List[int], run_id: str, connection_id: int) -> None:
+        """Record that a connection's full listing saw these photos' files, so they are kept."""
+        for i in range(0, len(photo_ids), RECONCILE_BATCH_SIZE):
+            db.execute(
+                update(Photo)
+                .where(Photo.id.in_(photo_ids[i:i + RECONCILE_BATCH_SIZE]))
+                .values(sync_run=run_id, connection_id=connection_id)
+            )
+        db.commit()
+
+    def _load_existing_photos(
+        self,
+        db: Session,
+        gallery_id: int
+    ) -> Dict[str, Tuple[int, Optional[str], Optional[str], Optional[int]]]:
+        """
+        Load the Drive file IDs already synced into a gallery.
+        
+        A file is imported into a gallery once, so files synced by any of
+        the gallery's connections are loaded.
+        
+        Args:
+            db: Database session
+            gallery_id: The ID of the gallery
+            
+        Returns:
+            Mapping of Drive file ID to (photo ID, Drive modified time, folder
+            path, ID of the connection that synced it)
+        """
+        rows = db.query(
+            Photo.drive_file_id, Photo.id, Photo.drive_modified, Photo.folder_path, Photo.connection_id
+        ).filter(
+            Photo.gallery_id == gallery_id,
+            Photo.drive_file_id != None
+        )
+        return {file_id: tuple(row) for file_id, *row in rows}
     
-    def schedule_sync_for_all(self, db: Session) -> int:
+    def _insert_photos(self, db: Session, rows: List[Tuple[Dict[str, Any], List[Dict[str, Any]]]]) -> List[int]:
         """
-        Schedule sync for all auto-sync enabled connections.
+        Insert a batch of photos and their derivatives in one transaction.
         
         Args:
             db: Database session
+            rows: (photo row, rendered derivatives) pairs
             
         Returns:
-            Number of connections scheduled for sync
+            IDs of the inserted photos
         """
-        # Find connections that need syncing
-        one_day_ago = datetime.utcnow() - timedelta(days=1)
-        connections = db.query(DriveConnection).filter(
-            DriveConnection.auto_sync == True,
-            (DriveConnection.last_synced == None) | (DriveConnection.last_synced <= one_day_ago)
-        ).all()
+        photo_ids = db.execute(
+            insert(Photo).returning(Photo.id, sort_by_parameter_order=True),
+            [photo for photo, _ in rows]
+        ).scalars().all()
         
-        # Sync each connection
-        for connection in connections:
-            try:
-                self.sync_drive_folder(db, connection.id)
-            except Exception as e:
-                # Log the error but continue with other connections
-                print(f"Error syncing connection {connection.id}: {str(e)}")
-                
-        return len(connections)
+        derivative_rows = [
+            dict(derivative, photo_id=photo_id)
+            for photo_id, (_, derivatives) in zip(photo_ids, rows)
+            for derivative in derivatives
+        ]
+        if derivative_rows:
+            db.execute(insert(PhotoDerivative), derivative_rows)
+        
+        # Reference the stored blobs in the same transaction
+        self.blob_store.add_refs(db, [
+            (photo['thumbnail_hash'], photo['thumbnail_size'])
+            for photo, _ in rows if photo['thumbnail_hash']
+        ] + [
+            (derivative['blob_hash'], derivative['size'])
+            for derivative in derivative_rows
+        ])
+        db.commit()
+        return list(photo_ids)
+    
+    def _update_photos(self, db: Session, rows: List[Dict[str, Any]]) -> List[int]:
+        """Apply a batch of primary-key updates in one transaction, returning the photo IDs."""
+        db.execute(update(Photo), rows)
+        db.commit()
+        return [row['id'] for row in rows]
+    
+    def _delete_photos(self, db: Session, photo_ids: List[int]) -> None:
+        """Delete photos with their favorites and derivatives in batches, releasing their blobs."""
+        for i in range(0, len(photo_ids), RECONCILE_BATCH_SIZE):
+            batch = photo_ids[i:i + RECONCILE_BATCH_SIZE]
+            self.blob_store.release(db, db.execute(
+                select(Photo.thumbnail_hash).where(Photo.id.in_(batch))
+            ).scalars().all())
+            self.blob_store.release(db, db.execute(
+                select(PhotoDerivative.blob_hash).where(PhotoDerivative.photo_id.in_(batch))
+            ).scalars().all())
+            db.execute(update(Photo).where(Photo.duplicate_of.in_(batch)).values(duplicate_of=None))
+            delete_photo_favorites(db, batch)
+            db.execute(delete(PhotoDerivative).where(PhotoDerivative.photo_id.in_(batch)))
+            db.execute(delete(Photo).where(Photo.id.in_(batch)))
+        db.commit()
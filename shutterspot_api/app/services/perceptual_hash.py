@@ -0,0 +1,199 @@
+"""
+Perceptual hashing and near-duplicate search for gallery photos.
+Photos get a 64-bit difference hash (dHash) computed from their thumbnail;
+two photos whose hashes differ in only a few bits are near-duplicates, such
+as an edited and an unedited export of the same frame. Hamming distances are
+computed with vectorized NumPy over chunks of the gallery, so matching a
+batch against tens of thousands of photos needs no Python-level pair loop.
+"""
+import io
+from typing import Iterable, List, Optional, Sequence, Tuple
+
+import numpy as np
+from PIL import Image
+
+# dHash grid: HASH_SIZE x HASH_SIZE bits
+HASH_SIZE = 8
+
+# Photos whose hashes differ in at most this many of the 64 bits are flagged
+DEFAULT_MAX_DISTANCE = 6
+
+# Upper bound on query x gallery distances computed at once, to bound memory
+MAX_PAIRS_PER_CHUNK = 4_000_000
+
+if hasattr(np, 'bitwise_count'):
+    def _popcount(values: np.ndarray) -> np.ndarray:
+        return np.bitwise_count(values)
+else:
+    _POPCOUNT_TABLE = np.array([bin(i).count('1') for i in range(256)], dtype=np.uint8)
+
+    def _popcount(values: np.ndarray) -> np.ndarray:
+        # Count set bits byte by byte through a lookup table
+        as_bytes = values.view(np.uint8).reshape(values.shape + (8,))
+        return _POPCOUNT_TABLE[as_bytes].sum(axis=-1, dtype=np.uint8)
+
+
+def dhash(data: bytes, hash_size: int = HASH_SIZE) -> int:
+    """
+    Compute the difference hash of an image.
+
+    The image is reduced to a (hash_size + 1) x hash_size greyscale grid and
+    each bit records whether a pixel is brighter than its right neighbour.
+
+    Args:
+        data: Encoded image bytes, typically the grid thumbnail
+        hash_size: Number of rows and bits per row
+
+    Returns:
+        The hash as a signed 64-bit integer, ready to store in a BigInteger column
+    """
+    with Image.open(io.BytesIO(data)) as image:
+        image.draft('L', (hash_size * 4, hash_size * 4))
+        grid = image.convert('L').resize((hash_size + 1, hash_size), Image.Resampling.LANCZOS)
+        pixels = np.asarray(grid, dtype=np.int16)
+
+    bits = np.packbits(pixels[:, 1:] > pixels[:, :-1])
+    return int(np.frombuffer(bits.tobytes(), dtype='>i8')[0])
+
+
+def hamming_distance(a: int, b: int) -> int:
+    """Number of differing bits between two hashes."""
+    return bin((a ^ b) & 0xFFFFFFFFFFFFFFFF).count('1')
+
+
+class NearDuplicateIndex:
+    """
+    In-memory index of a gallery's perceptual hashes.
+
+    Hashes are kept in a contiguous uint64 array that grows geometrically,
+    so adding a sync batch is amortised O(batch size).
+    """
+
+    def __init__(self, photo_ids: Sequence[int] = (), hashes: Sequence[int] = ()):
+        """
+        Initialize the index.
+
+        Args:
+            photo_ids: IDs of the photos already in the gallery
+            hashes: Their perceptual hashes, as stored (signed 64-bit)
+        """
+        capacity = max(len(photo_ids), 1024)
+        self._ids = np.zeros(capacity, dtype=np.int64)
+        self._hashes = np.zeros(capacity, dtype=np.uint64)
+        self._size = 0
+        self.add(photo_ids, hashes)
+
+    def __len__(self) -> int:
+        return self._size
+
+    def add(self, photo_ids: Sequence[int], hashes: Sequence[int]) -> None:
+        """Append photos to the index."""
+        count = len(photo_ids)
+        if not count:
+            return
+        if self._size + count > len(self._ids):
+            capacity = max(len(self._ids) * 2, self._size + count)
+            self._ids = np.resize(self._ids, capacity)
+            self._hashes = np.resize(self._hashes, capacity)
+        self._ids[self._size:self._size + count] = photo_ids
+        self._hashes[self._size:self._size + count] = _as_uint64(hashes)
+        self._size += count
+
+    def nearest(self, hashes: Sequence[int]) -> Tuple[np.ndarray, np.ndarray]:
+        """
+        Find the closest indexed photo for each query hash.
+
+        Ties go to the photo added first.
+
+        Args:
+            hashes: Query hashes (signed 64-bit)
+
+        Returns:
+            (photo IDs, distances) arrays; the ID is -1 when the index is empty
+        """
+        queries = _as_uint64(hashes)
+        best_ids = np.full(len(queries), -1, dtype=np.int64)
+        best_distances = np.full(len(queries), 65, dtype=np.int64)
+        if not self._size or not len(queries):
+            return best_ids, best_distances
+
+        indexed = self._hashes[:self._size]
+        rows = max(1, MAX_PAIRS_PER_CHUNK // self._size)
+        for start in range(0, len(queries), rows):
+            block = queries[start:start + rows]
+            distances = _popcount(block[:, None] ^ indexed[None, :])
+            nearest = distances.argmin(axis=1)
+            best_ids[start:start + rows] = self._ids[:self._size][nearest]
+            best_distances[start:start + rows] = distances[np.arange(len(block)), nearest]
+        return best_ids, best_distances
+
+    def match_and_add(
+        self,
+        photo_ids: Sequence[int],
+        hashes: Sequence[int],
+        max_distance: int = DEFAULT_MAX_DISTANCE,
+    ) -> List[Tuple[int, int, int]]:
+        """
+        Flag the near-duplicates in a batch of new photos, then index the batch.
+
+        Each new photo is compared with the indexed photos and with the photos
+        before it in the batch, so the earliest copy is the one that is kept.
+
+        Args:
+            photo_ids: IDs of the new photos, in sync order
+            hashes: Their perceptual hashes
+            max_distance: Largest Hamming distance counted as a duplicate
+
+        Returns:
+            (photo ID, ID of the photo it duplicates, distance) for each duplicate
+        """
+        if not len(photo_ids):
+            return []
+        ids = np.asarray(photo_ids, dtype=np.int64)
+        batch = _as_uint64(hashes)
+        match_ids, match_distances = self.nearest(hashes)
+
+        # Within the batch, only earlier photos count as originals
+        within = _popcount(batch[:, None] ^ batch[None, :]).astype(np.int64)
+        within[np.triu_indices(len(batch))] = 65
+        if len(batch) > 1:
+            earlier = within.argmin(axis=1)
+            earlier_distances = within[np.arange(len(batch)), earlier]
+            closer = earlier_distances < match_distances
+            match_ids = np.where(closer, ids[earlier], match_ids)
+            match_distances = np.where(closer, earlier_distances, match_distances)
+
+        self.add(photo_ids, hashes)
+        flagged = np.nonzero((match_ids >= 0) & (match_distances <= max_distance))[0]
+        return [(int(ids[i]), int(match_ids[i]), int(match_distances[i])) for i in flagged]
+
+
+def find_near_duplicates(
+    photo_ids: Sequence[int],
+    hashes: Sequence[int],
+    max_distance: int = DEFAULT_MAX_DISTANCE,
+) -> List[Tuple[int, int, int]]:
+    """
+    Find the near-duplicates among a gallery's photos.
+
+    Photos are taken in the given order, so pass them oldest first to keep
+    the earliest copy as the original.
+
+    Returns:
+        (photo ID, ID of the photo it duplicates, distance) for each duplicate
+    """
+    index = NearDuplicateIndex()
+    duplicates = []
+    batch = max(1, int(MAX_PAIRS_PER_CHUNK ** 0.5))
+    for start in range(0, len(photo_ids), batch):
+        duplicates.extend(index.match_and_add(
+            photo_ids[start:start + batch],
+            hashes[start:start + batch],
+            max_distance
+        ))
+    return duplicates
+
+
+def _as_uint64(hashes: Iterable[Optional[int]]) -> np.ndarray:
+    """Reinterpret stored signed 64-bit hashes as unsigned for XOR and popcount."""
+    return np.asarray(list(hashes), dtype=np.int64).view(np.uint64)
@@ -0,0 +1,187 @@
+"""
+Keyset pagination for gallery photo listings.
+Pages are read in (sort key, id) order and continue from an opaque cursor
+holding the last row's key, so every page is an index range scan of the
+same cost however deep the client has scrolled. Only the columns the
+listing returns are loaded.
+"""
+import base64
+import json
+from dataclasses import dataclass
+from datetime import datetime
+from typing import Generator, List, Optional, Tuple
+
+from fastapi import HTTPException, status
+from sqlalchemy import Select, tuple_
+from sqlalchemy.ext.asyncio import AsyncSession
+from sqlalchemy.orm import load_only
+
+from app.database.models import Photo
+
+DEFAULT_PAGE_SIZE = 100
+MAX_PAGE_SIZE = 500
+
+# Sort orders: by ID (sync order) and by EXIF capture time, either direction
+SORT_ID = "id"
+SORT_CAPTURED = "captured_at"
+SORT_CAPTURED_DESC = "-captured_at"
+SORT_ORDERS = (SORT_ID, SORT_CAPTURED, SORT_CAPTURED_DESC)
+
+# Columns the gallery listing returns; everything else stays unloaded
+LIST_COLUMNS = (
+    Photo.id,
+    Photo.gallery_id,
+    Photo.filename,
+    Photo.drive_file_id,
+    Photo.drive_modified,
+    Photo.folder_path,
+    Photo.url,
+    Photo.favorites_count,
+    Photo.duplicate_of,
+    Photo.captured_at,
+    Photo.camera_make,
+    Photo.camera_model,
+    Photo.lens_model,
+    Photo.orientation,
+    Photo.width,
+    Photo.height,
+    Photo.derivative_variants,
+    Photo.thumbnail_hash,
+    Photo.created_at,
+    Photo.updated_at,
+)
+
+
+@dataclass
+class PageCursor:
+    """Position after the last photo of a page."""
+    sort: str
+    photo_id: int
+    captured_at: Optional[datetime] = None
+
+
+def encode_cursor(cursor: PageCursor) -> str:
+    """Encode a cursor as an opaque URL-safe token."""
+    payload = [
+        cursor.sort,
+        cursor.photo_id,
+        cursor.captured_at.isoformat() if cursor.captured_at else None,
+    ]
+    return base64.urlsafe_b64encode(json.dumps(payload).encode()).decode().rstrip("=")
+
+
+def decode_cursor(token: str, sort: str) -> PageCursor:
+    """
+    Decode a cursor token.
+
+    Raises:
+        HTTPException: The token is malformed or was issued for another sort order
+    """
+    try:
+        padded = token + "=" * (-len(token) % 4)
+        cursor_sort, photo_id, captured_at = json.loads(base64.urlsafe_b64decode(padded))
+        cursor = PageCursor(
+            sort=cursor_sort,
+            photo_id=int(photo_id),
+            captured_at=datetime.fromisoformat(captured_at) if captured_at else None
+        )
+    except Exception:
+        raise HTTPException(
+            status_code=status.HTTP_400_BAD_REQUEST,
+            detail="Invalid cursor"
+        )
+    if cursor.sort != sort:
+        raise HTTPException(
+            status_code=status.HTTP_400_BAD_REQUEST,
+            detail="Cursor does not match the sort order"
+        )
+    return cursor
+
+
+def _limited(query, limit: int):
+    return query.options(load_only(*LIST_COLUMNS)).limit(limit)
+
+
+def _page_reads(query, sort: str, position: Optional[PageCursor], wanted: int) -> Generator:
+    """
+    Plan the reads for a page, independently of how they are executed.
+
+    Yields the queries to run in turn and is sent each one's photos back;
+    returns all the photos read.
+    """
+    if sort == SORT_ID:
+        if position is not None:
+            query = query.filter(Photo.id > position.photo_id)
+        return (yield _limited(query.order_by(Photo.id.asc()), wanted))
+
+    descending = sort == SORT_CAPTURED_DESC
+    id_order = Photo.id.desc() if descending else Photo.id.asc()
+    photos = []
+
+    # Photos with a capture time, unless the cursor is already past them
+    if position is None or position.captured_at is not None:
+        dated = query.filter(Photo.captured_at != None)
+        if position is not None:
+            key = tuple_(Photo.captured_at, Photo.id)
+            after = (position.captured_at, position.photo_id)
+            dated = dated.filter(key < after if descending else key > after)
+        captured_order = Photo.captured_at.desc() if descending else Photo.captured_at.asc()
+        photos = yield _limited(dated.order_by(captured_order, id_order), wanted)
+
+    # Then photos without one
+    if len(photos) < wanted:
+        undated = query.filter(Photo.captured_at == None)
+        if position is not None and position.captured_at is None:
+            undated = undated.filter(
+                Photo.id < position.photo_id if descending else Photo.id > position.photo_id
+            )
+        photos += yield _limited(undated.order_by(id_order), wanted - len(photos))
+    return photos
+
+
+def _page_result(photos: List[Photo], sort: str, limit: int) -> Tuple[List[Photo], Optional[str]]:
+    if len(photos) <= limit:
+        return photos, None
+    photos = photos[:limit]
+    last = photos[-1]
+    return photos, encode_cursor(PageCursor(
+        sort=sort,
+        photo_id=last.id,
+        captured_at=last.captured_at if sort != SORT_ID else None
+    ))
+
+
+async def list_gallery_page_async(
+    db: AsyncSession,
+    statement: Select,
+    sort: str = SORT_ID,
+    cursor: Optional[str] = None,
+    limit: int = DEFAULT_PAGE_SIZE
+) -> Tuple[List[Photo], Optional[str]]:
+    """
+    Read one page of a gallery listing.
+
+    For capture-time orders, photos without a capture time come after all
+    the others, ordered by ID. They are read as a second range of the
+    (gallery_id, captured_at, id) index rather than relying on the
+    database's NULL ordering, which differs between SQLite and Postgres.
+
+    Args:
+        db: Async database session
+        statement: select(Photo) already filtered to the gallery
+        sort: One of SORT_ORDERS
+        cursor: Token from the previous page, or None for the first page
+        limit: Maximum number of photos to return
+
+    Returns:
+        (photos, cursor for the next page or None on the last page)
+    """
+    position = decode_cursor(cursor, sort) if cursor else None
+    # One extra row tells us whether there is a next page
+    reads = _page_reads(statement, sort, position, limit + 1)
+    try:
+        read = next(reads)
+        while True:
+            read = reads.send(list((await db.scalars(read)).all()))
+    except StopIteration as done:
+        return _page_result(done.value, sort, limit)
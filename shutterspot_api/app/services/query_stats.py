@@ -0,0 +1,170 @@
+"""
+Per-request SQL statistics.
+Cursor events on every engine count and time each statement against the
+request it runs for. The request's stats live in a context variable, so
+they follow the request into the threadpool and through async sessions.
+QueryStatsMiddleware publishes the totals per route as Prometheus
+histograms and, in debug mode, as response headers, which makes N+1
+patterns visible from any HTTP client.
+"""
+import os
+import threading
+import time
+from contextlib import contextmanager
+from contextvars import ContextVar
+from dataclasses import dataclass, field
+from typing import Iterator, List, Optional
+
+from prometheus_client import Histogram
+from sqlalchemy import event
+from sqlalchemy.engine import Engine
+from starlette.datastructures import MutableHeaders
+
+# Add the X-DB-* and Server-Timing headers to every response
+DEBUG_HEADERS = os.getenv("DEBUG", "").lower() in ("1", "true", "yes")
+# Longest statement text put in the slowest-query header
+MAX_HEADER_STATEMENT = 200
+# Route label for requests that matched no route
+UNMATCHED_ROUTE = "<unmatched>"
+
+REQUEST_QUERIES = Histogram(
+    "shutterspot_db_queries_per_request",
+    "SQL statements executed per request",
+    ["method", "route"],
+    buckets=(0, 1, 2, 3, 5, 8, 13, 21, 34, 55, 89, 144)
+)
+REQUEST_DB_SECONDS = Histogram(
+    "shutterspot_db_seconds_per_request",
+    "Time spent executing SQL statements per request",
+    ["method", "route"],
+    buckets=(0.0005, 0.001, 0.0025, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5)
+)
+REQUEST_SLOWEST_SECONDS = Histogram(
+    "shutterspot_db_slowest_query_seconds",
+    "Duration of the slowest SQL statement of each request",
+    ["method", "route"],
+    buckets=(0.0005, 0.001, 0.0025, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5)
+)
+
+
+@dataclass
+class QueryStats:
+    """Statements executed within one request or capture."""
+    count: int = 0
+    total_time: float = 0.0
+    slowest_time: float = 0.0
+    slowest_statement: Optional[str] = None
+    statements: Optional[List[str]] = None  # Every statement, when kept
+    _lock: threading.Lock = field(default_factory=threading.Lock, repr=False)
+
+    def record(self, statement: str, duration: float) -> None:
+        with self._lock:
+            self.count += 1
+            self.total_time += duration
+            if duration >= self.slowest_time:
+                self.slowest_time = duration
+                self.slowest_statement = statement
+            if self.statements is not None:
+                self.statements.append(statement)
+
+
+_request_stats: ContextVar[Optional[QueryStats]] = ContextVar("query_stats", default=None)
+# Captures that see every statement, whichever request or thread runs it
+_capture_stats: List[QueryStats] = []
+_captures_lock = threading.Lock()
+
+
+@event.listens_for(Engine, "before_cursor_execute")
+def _start_timer(conn, cursor, statement, parameters, context, executemany):
+    if context is not None:
+        context._query_stats_started = time.perf_counter()
+
+
+@event.listens_for(Engine, "after_cursor_execute")
+def _record_statement(conn, cursor, statement, parameters, context, executemany):
+    started = getattr(context, "_query_stats_started", None)
+    if started is None:
+        return
+    duration = time.perf_counter() - started
+    stats = _request_stats.get()
+    if stats is not None:
+        stats.record(statement, duration)
+    if _capture_stats:
+        with _captures_lock:
+            captures = list(_capture_stats)
+        for capture in captures:
+            capture.record(statement, duration)
+
+
+def current_query_stats() -> Optional[QueryStats]:
+    """Stats of the request being served, or None outside a request."""
+    return _request_stats.get()
+
+
+@contextmanager
+def capture_queries() -> Iterator[QueryStats]:
+    """
+    Record every statement executed while the block runs, on any thread.
+
+    Yields:
+        QueryStats that keeps the statements' text
+    """
+    stats = QueryStats(statements=[])
+    with _captures_lock:
+        _capture_stats.append(stats)
+    try:
+        yield stats
+    finally:
+        with _captures_lock:
+            _capture_stats.remove(stats)
+
+
+def _one_line(statement: Optional[str]) -> str:
+    # Header values must be Latin-1
+    text = " ".join((statement or "").split()).encode("ascii", "replace").decode("ascii")
+    return text if len(text) <= MAX_HEADER_STATEMENT else text[:MAX_HEADER_STATEMENT - 3] + "..."
+
+
+class QueryStatsMiddleware:
+    """ASGI middleware that collects each request's SQL stats."""
+
+    def __init__(self, app, debug_headers: bool = DEBUG_HEADERS):
+        """
+        Initialize the middleware.
+
+        Args:
+            app: The ASGI app to wrap
+            debug_headers: Report the stats in response headers
+        """
+        self.app = app
+        self.debug_headers = debug_headers
+
+    async def __call__(self, scope, receive, send):
+        if scope["type"] != "http":
+            await self.app(scope, receive, send)
+            return
+
+        stats = QueryStats()
+        token = _request_stats.set(stats)
+
+        async def send_with_headers(message):
+            # Statements run while a streaming body is sent only reach the metrics
+            if message["type"] == "http.response.start" and self.debug_headers:
+                headers = MutableHeaders(scope=message)
+                headers.append("X-DB-Query-Count", str(stats.count))
+                headers.append("X-DB-Time-Ms", f"{stats.total_time * 1000:.2f}")
+                if stats.slowest_statement is not None:
+                    headers.append("X-DB-Slowest-Ms", f"{stats.slowest_time * 1000:.2f}")
+                    headers.append("X-DB-Slowest-Query", _one_line(stats.slowest_statement))
+                headers.append("Server-Timing", f'db;dur={stats.total_time * 1000:.2f};desc="{stats.count} queries"')
+            await send(message)
+
+        try:
+            await self.app(scope, receive, send_with_headers)
+        finally:
+            _request_stats.reset(token)
+            route = getattr(scope.get("route"), "path", None) or UNMATCHED_ROUTE
+            labels = (scope["method"], route)
+            REQUEST_QUERIES.labels(*labels).observe(stats.count)
+            REQUEST_DB_SECONDS.labels(*labels).observe(stats.total_time)
+            REQUEST_SLOWEST_SECONDS.labels(*labels).observe(stats.slowest_time)
@@ -0,0 +1,315 @@
+"""
+Database-backed job queue for Google Drive syncs.
+Sync requests are recorded as SyncJob rows and executed by a pool of
+worker threads, so HTTP requests return immediately and progress can be
+polled or streamed while the sync runs.
+"""
+import logging
+import threading
+import time
+import uuid
+from datetime import datetime, timedelta
+from typing import List, Optional
+
+from sqlalchemy import or_, update
+from sqlalchemy.orm import Session
+
+from app.database.database import SessionLocal
+from app.database.models import SyncJob
+from app.services.drive_requests import DriveRateLimitError
+from app.services.drive_sync import SyncInterrupted
+
+logger = logging.getLogger(__name__)
+
+# Job statuses
+QUEUED = "queued"
+RUNNING = "running"
+SUCCEEDED = "succeeded"
+FAILED = "failed"
+ACTIVE_STATUSES = (QUEUED, RUNNING)
+FINISHED_STATUSES = (SUCCEEDED, FAILED)
+
+DEFAULT_WORKERS = 2
+# How often idle workers look for jobs enqueued by other processes
+POLL_INTERVAL = 5.0
+# Minimum interval between progress writes for a running job
+PROGRESS_INTERVAL = 1.0
+# Running jobs without a heartbeat for this long are assumed dead and requeued;
+# they resume from the sync's last checkpoint
+STALE_JOB_TIMEOUT = timedelta(minutes=3)
+# How often a worker refreshes the heartbeat of the job it runs, in seconds
+HEARTBEAT_INTERVAL = STALE_JOB_TIMEOUT.total_seconds() / 6
+# Jobs stopped by Drive rate limits are retried this many times, backing off
+# from RATE_LIMIT_DELAY and doubling each time
+MAX_RATE_LIMIT_ATTEMPTS = 5
+RATE_LIMIT_DELAY = timedelta(minutes=1)
+
+
+class SyncJobQueue:
+    """Persistent queue of Drive sync jobs with an in-process worker pool."""
+
+    def __init__(self, drive_service, workers: int = DEFAULT_WORKERS, session_factory=SessionLocal):
+        """
+        Initialize the job queue.
+
+        Args:
+            drive_service: GoogleDriveService used to run the syncs
+            workers: Number of worker threads
+            session_factory: Callable returning a new database session
+        """
+        self.drive_service = drive_service
+        self.workers = workers
+        self.session_factory = session_factory
+        self.worker_id = uuid.uuid4().hex
+        self._wakeup = threading.Event()
+        self._stopping = threading.Event()
+        self._threads: List[threading.Thread] = []
+
+    def enqueue(self, db: Session, connection_id: int, user_id: int, full_rescan: bool = False) -> SyncJob:
+        """
+        Queue a sync for a connection.
+
+        A connection never has more than one queued or running job; asking
+        again returns the existing one.
+
+        Args:
+            db: Database session
+            connection_id: The ID of the DriveConnection to sync
+            user_id: The ID of the user requesting the sync
+            full_rescan: Ignore the changes feed and re-list the whole folder
+
+        Returns:
+            The queued (or already active) SyncJob
+        """
+        job = db.query(SyncJob).filter(
+            SyncJob.connection_id == connection_id,
+            SyncJob.status.in_(ACTIVE_STATUSES)
+        ).first()
+        if job is None:
+            job = SyncJob(
+                connection_id=connection_id,
+                user_id=user_id,
+                full_rescan=full_rescan,
+                status=QUEUED
+            )
+            db.add(job)
+            db.commit()
+            db.refresh(job)
+
+        self._wakeup.set()
+        return job
+
+    def start(self) -> None:
+        """Requeue jobs orphaned by a crashed worker and start the worker threads."""
+        with self.session_factory() as db:
+            self.requeue_stale(db)
+
+        self._stopping.clear()
+        for i in range(self.workers):
+            thread = threading.Thread(target=self._run_worker, name=f"sync-job-worker-{i}", daemon=True)
+            thread.start()
+            self._threads.append(thread)
+
+    def stop(self, timeout: Optional[float] = None) -> None:
+        """
+        Stop the worker threads.
+
+        Running syncs stop at their next checkpoint and are requeued, so they
+        resume when the workers start again.
+        """
+        self._stopping.set()
+        self._wakeup.set()
+        for thread in self._threads:
+            thread.join(timeout)
+        self._threads = []
+
+    def requeue_stale(self, db: Session) -> int:
+        """
+        Put running jobs whose worker stopped heartbeating back in the queue.
+
+        Returns:
+            Number of jobs requeued
+        """
+        cutoff = datetime.utcnow() - STALE_JOB_TIMEOUT
+        result = db.execute(
+            update(SyncJob)
+            .where(
+                SyncJob.status == RUNNING,
+                or_(SyncJob.heartbeat_at == None, SyncJob.heartbeat_at < cutoff)
+            )
+            .values(status=QUEUED, worker_id=None)
+        )
+        db.commit()
+        return result.rowcount
+
+    def claim(self, db: Session) -> Optional[SyncJob]:
+        """
+        Atomically claim the oldest queued job for this worker.
+
+        The conditional UPDATE makes claiming safe across threads and processes.
+        """
+        while True:
+            now = datetime.utcnow()
+            job_id = db.query(SyncJob.id).filter(
+                SyncJob.status == QUEUED,
+                or_(SyncJob.run_after == None, SyncJob.run_after <= now)
+            ).order_by(SyncJob.id).limit(1).scalar()
+            if job_id is None:
+                return None
+
+            claimed = db.execute(
+                update(SyncJob)
+                .where(SyncJob.id == job_id, SyncJob.status == QUEUED)
+                .values(
+                    status=RUNNING,
+                    worker_id=self.worker_id,
+                    started_at=now,
+                    heartbeat_at=now
+                )
+            ).rowcount
+            db.commit()
+            if claimed:
+                return db.get(SyncJob, job_id)
+
+    def _run_worker(self) -> None:
+        """Worker loop: claim and run jobs until stopped."""
+        while not self._stopping.is_set():
+            try:
+                with self.session_factory() as db:
+                    job = self.claim(db)
+                    if job is not None:
+                        self.run_job(db, job)
+                        continue
+            except Exception:
+                logger.exception("Sync job worker error")
+
+            self._wakeup.wait(POLL_INTERVAL)
+            try:
+                # Pick up jobs abandoned by workers in processes that died
+                with self.session_factory() as db:
+                    self.requeue_stale(db)
+            except Exception:
+                logger.exception("Failed to requeue stale sync jobs")
+            self._wakeup.clear()
+
+    def _heartbeat(self, job_id: int, stop: threading.Event) -> None:
+        """Refresh a running job's heartbeat until ``stop`` is set."""
+        while not stop.wait(HEARTBEAT_INTERVAL):
+            try:
+                with self.session_factory() as db:
+                    db.execute(
+                        update(SyncJob)
+                        .where(SyncJob.id == job_id, SyncJob.worker_id == self.worker_id)
+                        .values(heartbeat_at=datetime.utcnow())
+                    )
+                    db.commit()
+            except Exception:
+                logger.exception("Failed to heartbeat sync job %s", job_id)
+
+    def _release(self, db: Session, job_id: int, **values) -> bool:
+        """
+        Write a job's outcome if this worker still owns it.
+
+        A worker that stopped heartbeating long enough for its job to be
+        requeued must not overwrite the status the new owner writes.
+
+        Returns:
+            Whether the job was still owned by this worker
+        """
+        owned = db.execute(
+            update(SyncJob)
+            .where(SyncJob.id == job_id, SyncJob.worker_id == self.worker_id)
+            .values(**values)
+            .execution_options(synchronize_session=False)
+        ).rowcount
+        db.commit()
+        if not owned:
+            logger.warning("Sync job %s was taken over by another worker; dropping its outcome", job_id)
+        return bool(owned)
+
+    def run_job(self, db: Session, job: SyncJob) -> None:
+        """Run a claimed job and record its outcome."""
+        job_id = job.id
+        last_report = 0.0
+        counts = {"listed": 0, "processed": 0}
+
+        def report_progress(listed: int, processed: int) -> None:
+            nonlocal last_report
+            counts["listed"], counts["processed"] = listed, processed
+            now = time.monotonic()
+            if now - last_report < PROGRESS_INTERVAL:
+                return
+            last_report = now
+            job.files_listed = listed
+            job.files_processed = processed
+            db.commit()
+
+        # Heartbeat independently of progress: listing a large folder or
+        # downloading a large file can take longer than STALE_JOB_TIMEOUT
+        stop_heartbeat = threading.Event()
+        heartbeat = threading.Thread(
+            target=self._heartbeat,
+            args=(job_id, stop_heartbeat),
+            name=f"sync-job-heartbeat-{job_id}",
+            daemon=True
+        )
+        heartbeat.start()
+        try:
+            result = self.drive_service.sync_drive_folder(
+                db,
+                job.connection_id,
+                full_rescan=job.full_rescan,
+                progress=report_progress,
+                should_stop=self._stopping.is_set
+            )
+        except SyncInterrupted:
+            # Shutting down: requeue so the sync resumes from its checkpoint
+            db.rollback()
+            self._release(db, job_id, status=QUEUED, worker_id=None, heartbeat_at=datetime.utcnow())
+            return
+        except DriveRateLimitError as e:
+            db.rollback()
+            attempts = (job.attempts or 0) + 1
+            if attempts < MAX_RATE_LIMIT_ATTEMPTS:
+                # Leave the job queued so the sync is not lost
+                delay = max(
+                    RATE_LIMIT_DELAY * 2 ** (attempts - 1),
+                    timedelta(seconds=e.retry_after or 0)
+                )
+                logger.warning("Sync job %s rate limited, retrying in %s", job_id, delay)
+                self._release(
+                    db, job_id,
+                    status=QUEUED,
+                    worker_id=None,
+                    attempts=attempts,
+                    run_after=datetime.utcnow() + delay,
+                    heartbeat_at=datetime.utcnow()
+                )
+                return
+            outcome = {"status": FAILED, "attempts": attempts, "error": str(e)}
+        except Exception as e:
+            db.rollback()
+            logger.exception("Sync job %s failed", job_id)
+            outcome = {"status": FAILED, "error": getattr(e, 'detail', None) or str(e)}
+        else:
+            outcome = {
+                "status": SUCCEEDED,
+                "photos_count": len(result.photo_ids),
+                "removed_count": len(result.removed_ids),
+                "errors": [
+                    {"file_id": error.file_id, "filename": error.filename, "error": error.error}
+                    for error in result.errors
+                ]
+            }
+        finally:
+            stop_heartbeat.set()
+            heartbeat.join()
+        finished_at = datetime.utcnow()
+        self._release(
+            db, job_id,
+            files_listed=counts["listed"],
+            files_processed=counts["processed"],
+            finished_at=finished_at,
+            heartbeat_at=finished_at,
+            **outcome
+        )
@@ -0,0 +1,210 @@
+"""
+Auto-sync scheduler for Google Drive connections.
+Each connection carries its own next-due time, so a tick only reads the
+connections that are due. Due connections are ranked by priority in SQL
+and queued as sync jobs under a global concurrency cap. Next-due times are jittered
+so connections spread out instead of all coming due together, and
+galleries that clients are viewing are synced more often.
+"""
+import logging
+import random
+import threading
+import time
+from datetime import datetime, timedelta
+from typing import Dict, Optional
+
+from sqlalchemy import and_, case, func, or_, select
+from sqlalchemy.ext.asyncio import AsyncSession
+from sqlalchemy.orm import Session
+
+from app.database.database import SessionLocal
+from app.database.models import DriveConnection, SyncJob
+from app.services.sync_jobs import ACTIVE_STATUSES, SyncJobQueue
+
+logger = logging.getLogger(__name__)
+
+# How often an idle gallery is synced
+SYNC_INTERVAL = timedelta(days=1)
+# How often a gallery that clients are viewing is synced
+ACTIVE_SYNC_INTERVAL = timedelta(minutes=15)
+# A gallery counts as actively viewed for this long after its last view
+ACTIVE_WINDOW = timedelta(minutes=30)
+# Next-due times are spread by up to this fraction of the interval
+SYNC_JITTER = 0.1
+
+DEFAULT_MAX_CONCURRENT = 4
+TICK_INTERVAL = 10.0
+# Due connections read per tick, as a multiple of the free capacity
+DUE_WINDOW_FACTOR = 4
+# Views of the same gallery are recorded at most this often per process
+VIEW_COOLDOWN = 60.0
+
+# Scheduling priorities, lowest first
+PRIORITY_ACTIVE = 0
+PRIORITY_NEW = 1
+PRIORITY_DUE = 2
+
+_view_lock = threading.Lock()
+_last_views: Dict[int, float] = {}
+
+
+def jittered(interval: timedelta) -> timedelta:
+    """Spread an interval by a random +/- SYNC_JITTER fraction."""
+    return interval * (1 + random.uniform(-SYNC_JITTER, SYNC_JITTER))
+
+
+def is_active(connection: DriveConnection, now: datetime) -> bool:
+    """Whether a client viewed the connection's gallery recently."""
+    return connection.last_viewed_at is not None and connection.last_viewed_at > now - ACTIVE_WINDOW
+
+
+def sync_priority(now: datetime):
+    """SQL priority of a due connection; actively viewed and never-synced galleries go first."""
+    return case(
+        (and_(DriveConnection.last_viewed_at != None, DriveConnection.last_viewed_at > now - ACTIVE_WINDOW), PRIORITY_ACTIVE),
+        (DriveConnection.last_synced == None, PRIORITY_NEW),
+        else_=PRIORITY_DUE
+    )
+
+
+def next_sync_time(connection: DriveConnection, now: datetime) -> datetime:
+    """When a connection that is synced now should next be synced."""
+    interval = ACTIVE_SYNC_INTERVAL if is_active(connection, now) else SYNC_INTERVAL
+    return now + jittered(interval)
+
+
+def _claim_view(gallery_id: int) -> bool:
+    """Whether a view of the gallery should be recorded, i.e. it is past VIEW_COOLDOWN."""
+    now_monotonic = time.monotonic()
+    with _view_lock:
+        last = _last_views.get(gallery_id)
+        if last is not None and now_monotonic - last < VIEW_COOLDOWN:
+            return False
+        _last_views[gallery_id] = now_monotonic
+    return True
+
+
+async def record_gallery_view_async(db: AsyncSession, gallery_id: int) -> None:
+    """
+    Note that a client is viewing a gallery so its Drive folders are synced sooner.
+
+    The gallery's connections get a next-due time no later than
+    ACTIVE_SYNC_INTERVAL after their last sync. Repeated views within
+    VIEW_COOLDOWN are ignored to keep this off the hot path.
+
+    Args:
+        db: Async database session
+        gallery_id: The ID of the viewed gallery
+    """
+    if not _claim_view(gallery_id):
+        return
+    connections = (await db.scalars(select(DriveConnection).where(
+        DriveConnection.gallery_id == gallery_id,
+        DriveConnection.auto_sync == True
+    ))).all()
+    if not connections:
+        return
+    now = datetime.utcnow()
+    for connection in connections:
+        connection.last_viewed_at = now
+        due = (connection.last_synced or now) + ACTIVE_SYNC_INTERVAL
+        if connection.next_sync_at is None or connection.next_sync_at > due:
+            connection.next_sync_at = due
+    await db.commit()
+
+
+class SyncScheduler:
+    """Queues due auto-sync connections as sync jobs."""
+
+    def __init__(
+        self,
+        job_queue: SyncJobQueue,
+        max_concurrent: int = DEFAULT_MAX_CONCURRENT,
+        session_factory=SessionLocal
+    ):
+        """
+        Initialize the scheduler.
+
+        Args:
+            job_queue: Queue the due syncs are submitted to
+            max_concurrent: Maximum number of queued or running sync jobs
+            session_factory: Callable returning a new database session
+        """
+        self.job_queue = job_queue
+        self.max_concurrent = max_concurrent
+        self.session_factory = session_factory
+        self._stopping = threading.Event()
+        self._thread: Optional[threading.Thread] = None
+
+    def start(self) -> None:
+        """Start the scheduler thread."""
+        self._stopping.clear()
+        self._thread = threading.Thread(target=self._run, name="sync-scheduler", daemon=True)
+        self._thread.start()
+
+    def stop(self, timeout: Optional[float] = None) -> None:
+        """Stop the scheduler thread."""
+        self._stopping.set()
+        if self._thread is not None:
+            self._thread.join(timeout)
+            self._thread = None
+
+    def _run(self) -> None:
+        while not self._stopping.is_set():
+            try:
+                with self.session_factory() as db:
+                    self.tick(db)
+            except Exception:
+                logger.exception("Sync scheduler error")
+            self._stopping.wait(TICK_INTERVAL)
+
+    def tick(self, db: Session, now: Optional[datetime] = None) -> int:
+        """
+        Queue the most urgent due connections that fit under the concurrency cap.
+
+        Args:
+            db: Database session
+            now: Current time, for testing
+
+        Returns:
+            Number of sync jobs queued
+        """
+        now = now or datetime.utcnow()
+        active = db.query(func.count(SyncJob.id)).filter(
+            SyncJob.status.in_(ACTIVE_STATUSES)
+        ).scalar()
+        capacity = self.max_concurrent - active
+        if capacity <= 0:
+            return 0
+
+        busy = select(SyncJob.connection_id).where(SyncJob.status.in_(ACTIVE_STATUSES))
+        due = db.query(DriveConnection).filter(
+            DriveConnection.auto_sync == True,
+            or_(DriveConnection.next_sync_at == None, DriveConnection.next_sync_at <= now),
+            DriveConnection.id.not_in(busy)
+        ).order_by(
+            # Rank every due connection, so an actively viewed gallery is not
+            # left behind connections that merely came due earlier
+            sync_priority(now),
+            func.coalesce(DriveConnection.next_sync_at, DriveConnection.created_at).asc().nulls_first(),
+            DriveConnection.id
+        ).limit(capacity * DUE_WINDOW_FACTOR).all()
+
+        queued = 0
+        for connection in due:
+            if queued >= capacity:
+                break
+            if connection.next_sync_at is None and connection.last_synced is not None:
+                # Connection synced before it had a next-due time: stagger it
+                # from its last sync instead of syncing it straight away
+                connection.next_sync_at = connection.last_synced + jittered(SYNC_INTERVAL)
+                if connection.next_sync_at > now:
+                    continue
+            # The due time is committed with the job by enqueue, so a failed
+            # enqueue leaves the connection due for the next tick
+            connection.next_sync_at = next_sync_time(connection, now)
+            self.job_queue.enqueue(db, connection.id, connection.user_id)
+            queued += 1
+
+        db.commit()
+        return queued
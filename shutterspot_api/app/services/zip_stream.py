@@ -0,0 +1,238 @@
+"""
+Streaming ZIP writer with byte-range support.
+Archives are written uncompressed (photos do not compress) with a data
+descriptor after every entry, so the exact byte layout, and therefore the
+total length, follows from the entry names and sizes alone. Any byte range
+of the archive can then be produced on demand: entries outside the range
+are skipped, and only their CRC-32s are needed for the central directory.
+Zip64 records are used when the archive or an entry exceeds 4 GiB.
+"""
+import struct
+import zlib
+from dataclasses import dataclass
+from datetime import datetime
+from typing import Any, Callable, Iterable, Iterator, List, Optional, Sequence, Tuple
+
+ZIP64_LIMIT = 0xFFFFFFFF
+ZIP64_COUNT_LIMIT = 0xFFFF
+
+# General purpose flags: sizes and CRC follow the data; names are UTF-8
+FLAG_DATA_DESCRIPTOR = 0x0008
+FLAG_UTF8 = 0x0800
+
+VERSION_DEFAULT = 20
+VERSION_ZIP64 = 45
+
+LOCAL_HEADER = struct.Struct('<IHHHHHIIIHH')
+CENTRAL_HEADER = struct.Struct('<IHHHHHHIIIHHHHHII')
+DESCRIPTOR = struct.Struct('<IIII')
+DESCRIPTOR64 = struct.Struct('<IIQQ')
+ZIP64_LOCAL_EXTRA = struct.Struct('<HHQQ')
+ZIP64_CENTRAL_EXTRA = struct.Struct('<HHQQQ')
+END_RECORD = struct.Struct('<IHHHHIIH')
+END_RECORD64 = struct.Struct('<IQHHIIQQQQ')
+END_LOCATOR64 = struct.Struct('<IIQI')
+
+
+class ZipSizeMismatch(Exception):
+    """An entry's content was not the size it was planned with."""
+
+    def __init__(self, index: int, expected: int, actual: int):
+        super().__init__(f"Entry {index} is {actual} bytes, expected {expected}")
+        self.index = index
+        self.expected = expected
+        self.actual = actual
+
+
+@dataclass
+class ZipEntry:
+    """A file in the archive. ``crc32`` is filled in once the content has been read."""
+    name: str
+    size: int
+    modified: datetime
+    crc32: Optional[int] = None
+    key: Any = None  # Caller's handle for fetching the content
+
+
+def _dos_datetime(value: datetime) -> Tuple[int, int]:
+    year = min(max(value.year, 1980), 2107)
+    date = (year - 1980) << 9 | value.month << 5 | value.day
+    time = value.hour << 11 | value.minute << 5 | value.second // 2
+    return time, date
+
+
+class ZipLayout:
+    """Byte layout of an archive of the given entries."""
+
+    def __init__(self, entries: Sequence[ZipEntry], zip64: Optional[bool] = None):
+        """
+        Lay out the archive.
+
+        Args:
+            entries: The files, in archive order
+            zip64: Force Zip64 records on or off; by default they are used
+                only when the archive needs them
+        """
+        self.entries = list(entries)
+        self.names = [entry.name.encode('utf-8') for entry in self.entries]
+        if zip64 is None:
+            self._plan(False)
+            zip64 = (
+                self.central_offset + self.central_size >= ZIP64_LIMIT
+                or len(self.entries) >= ZIP64_COUNT_LIMIT
+                or any(entry.size >= ZIP64_LIMIT for entry in self.entries)
+            )
+        self.zip64 = zip64
+        self._plan(zip64)
+
+    def _plan(self, zip64: bool) -> None:
+        local_extra = ZIP64_LOCAL_EXTRA.size if zip64 else 0
+        central_extra = ZIP64_CENTRAL_EXTRA.size if zip64 else 0
+        self.descriptor_size = DESCRIPTOR64.size if zip64 else DESCRIPTOR.size
+
+        self.header_offsets: List[int] = []
+        self.data_offsets: List[int] = []
+        offset = 0
+        for entry, name in zip(self.entries, self.names):
+            self.header_offsets.append(offset)
+            offset += LOCAL_HEADER.size + len(name) + local_extra
+            self.data_offsets.append(offset)
+            offset += entry.size + self.descriptor_size
+
+        self.central_offset = offset
+        self.central_size = sum(CENTRAL_HEADER.size + len(name) + central_extra for name in self.names)
+        end_size = END_RECORD.size + (END_RECORD64.size + END_LOCATOR64.size if zip64 else 0)
+        self.total_size = self.central_offset + self.central_size + end_size
+
+    @property
+    def version(self) -> int:
+        return VERSION_ZIP64 if self.zip64 else VERSION_DEFAULT
+
+    def local_header(self, index: int) -> bytes:
+        entry, name = self.entries[index], self.names[index]
+        time, date = _dos_datetime(entry.modified)
+        size = ZIP64_LIMIT if self.zip64 else 0
+        extra = ZIP64_LOCAL_EXTRA.pack(0x0001, 16, 0, 0) if self.zip64 else b''
+        return LOCAL_HEADER.pack(
+            0x04034b50, self.version, FLAG_DATA_DESCRIPTOR | FLAG_UTF8, 0,
+            time, date, 0, size, size, len(name), len(extra)
+        ) + name + extra
+
+    def descriptor(self, index: int) -> bytes:
+        entry = self.entries[index]
+        layout = DESCRIPTOR64 if self.zip64 else DESCRIPTOR
+        return layout.pack(0x08074b50, entry.crc32, entry.size, entry.size)
+
+    def central_directory(self) -> bytes:
+        """The central directory and end records; every entry's CRC must be known."""
+        records = []
+        for index, (entry, name) in enumerate(zip(self.entries, self.names)):
+            time, date = _dos_datetime(entry.modified)
+            if self.zip64:
+                size = offset = ZIP64_LIMIT
+                extra = ZIP64_CENTRAL_EXTRA.pack(0x0001, 24, entry.size, entry.size, self.header_offsets[index])
+            else:
+                size, offset, extra = entry.size, self.header_offsets[index], b''
+            records.append(CENTRAL_HEADER.pack(
+                0x02014b50, self.version, self.version, FLAG_DATA_DESCRIPTOR | FLAG_UTF8, 0,
+                time, date, entry.crc32, size, size, len(name), len(extra), 0, 0, 0, 0, offset
+            ) + name + extra)
+
+        count = len(self.entries)
+        if self.zip64:
+            end64_offset = self.central_offset + self.central_size
+            records.append(END_RECORD64.pack(
+                0x06064b50, END_RECORD64.size - 12, VERSION_ZIP64, VERSION_ZIP64, 0, 0,
+                count, count, self.central_size, self.central_offset
+            ))
+            records.append(END_LOCATOR64.pack(0x07064b50, 0, end64_offset, 1))
+            records.append(END_RECORD.pack(
+                0x06054b50, 0, 0, ZIP64_COUNT_LIMIT, ZIP64_COUNT_LIMIT, ZIP64_LIMIT, ZIP64_LIMIT, 0
+            ))
+        else:
+            records.append(END_RECORD.pack(
+                0x06054b50, 0, 0, count, count, self.central_size, self.central_offset, 0
+            ))
+        return b''.join(records)
+
+
+ContentOpener = Callable[[List[int]], Iterator[Tuple[int, Iterable[bytes]]]]
+
+
+def stream_zip(
+    layout: ZipLayout,
+    open_contents: ContentOpener,
+    start: int = 0,
+    end: Optional[int] = None,
+) -> Iterator[bytes]:
+    """
+    Produce bytes ``start`` to ``end`` (inclusive) of an archive.
+
+    Content is only read for entries whose data falls in the range, and for
+    entries whose CRC is unknown but needed by a descriptor or the central
+    directory in the range. CRCs computed along the way are stored on the
+    entries so callers can cache them.
+
+    Args:
+        layout: The archive layout
+        open_contents: Called once with the indexes of the entries to read,
+            in order; returns an iterator of (index, chunks) in that order
+        start: First byte to produce
+        end: Last byte to produce; defaults to the end of the archive
+
+    Raises:
+        ZipSizeMismatch: An entry's content was not the planned size
+    """
+    end = layout.total_size - 1 if end is None else end
+
+    def overlaps(offset: int, length: int) -> bool:
+        return offset <= end and offset + length > start
+
+    def clip(offset: int, data: bytes) -> bytes:
+        return data[max(start - offset, 0):end - offset + 1]
+
+    central_needed = overlaps(layout.central_offset, layout.total_size - layout.central_offset)
+    needed = [
+        index for index, entry in enumerate(layout.entries)
+        if overlaps(layout.data_offsets[index], entry.size) or (entry.crc32 is None and (
+            central_needed
+            or overlaps(layout.data_offsets[index] + entry.size, layout.descriptor_size)
+        ))
+    ]
+    contents = open_contents(needed)
+    pending = iter(needed)
+    try:
+        next_needed = next(pending, None)
+        for index, entry in enumerate(layout.entries):
+            header_offset = layout.header_offsets[index]
+            if header_offset > end:
+                break
+            if overlaps(header_offset, layout.data_offsets[index] - header_offset):
+                yield clip(header_offset, layout.local_header(index))
+
+            data_offset = layout.data_offsets[index]
+            if index == next_needed:
+                content_index, chunks = next(contents)
+                assert content_index == index
+                crc = 0
+                position = data_offset
+                for chunk in chunks:
+                    crc = zlib.crc32(chunk, crc)
+                    if overlaps(position, len(chunk)):
+                        yield clip(position, chunk)
+                    position += len(chunk)
+                if position - data_offset != entry.size:
+                    raise ZipSizeMismatch(index, entry.size, position - data_offset)
+                entry.crc32 = crc
+                next_needed = next(pending, None)
+
+            descriptor_offset = data_offset + entry.size
+            if overlaps(descriptor_offset, layout.descriptor_size):
+                yield clip(descriptor_offset, layout.descriptor(index))
+
+        if central_needed:
+            yield clip(layout.central_offset, layout.central_directory())
+    finally:
+        close = getattr(contents, 'close', None)
+        if close is not None:
+            close()
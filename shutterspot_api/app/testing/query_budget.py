@@ -0,0 +1,78 @@
+"""
+Query budgets for endpoint tests.
+A budget caps the SQL statements an endpoint may execute, so an N+1
+regression fails CI instead of surfacing in production:
+
+    from app.testing.query_budget import assert_query_budget
+
+    def test_gallery_listing(client):
+        with assert_query_budget(3):
+            client.get("/api/photos/gallery/1")
+
+With ``pytest_plugins = ["app.testing.query_budget"]`` in conftest.py,
+``request_within_budget`` is also available as the ``query_budget``
+fixture. Statements are counted on every engine and thread, including the
+one TestClient serves requests on.
+"""
+from contextlib import contextmanager
+from typing import Iterator
+
+import pytest
+
+from app.services.query_stats import QueryStats, capture_queries
+
+
+class QueryBudgetExceeded(AssertionError):
+    """More statements ran than the budget allows."""
+
+
+def _report(stats: QueryStats, max_queries: int) -> str:
+    statements = "\n".join(
+        f"  {number}. {' '.join(statement.split())}"
+        for number, statement in enumerate(stats.statements, start=1)
+    )
+    return f"Expected at most {max_queries} queries, {stats.count} ran:\n{statements}"
+
+
+@contextmanager
+def assert_query_budget(max_queries: int) -> Iterator[QueryStats]:
+    """
+    Fail if the block executes more than ``max_queries`` SQL statements.
+
+    Yields:
+        The statements recorded so far, for further assertions
+
+    Raises:
+        QueryBudgetExceeded: The budget was exceeded; lists every statement
+    """
+    with capture_queries() as stats:
+        yield stats
+    if stats.count > max_queries:
+        raise QueryBudgetExceeded(_report(stats, max_queries))
+
+
+def request_within_budget(client, method: str, url: str, max_queries: int, **kwargs):
+    """
+    Send a request and fail if serving it exceeds the query budget.
+
+    Args:
+        client: TestClient (or any client with a ``request`` method)
+        method: HTTP method
+        url: Request URL
+        max_queries: Most SQL statements the endpoint may execute
+        **kwargs: Extra arguments for ``client.request``
+
+    Returns:
+        The response
+
+    Raises:
+        QueryBudgetExceeded: The budget was exceeded; lists every statement
+    """
+    with assert_query_budget(max_queries):
+        return client.request(method, url, **kwargs)
+
+
+@pytest.fixture
+def query_budget():
+    """``request_within_budget`` as a fixture."""
+    return request_within_budget
@@ -0,0 +1,174 @@
+"""
+Load test for the database engine settings.
+
+Seeds a gallery in a temporary SQLite database, then runs readers that
+page through the gallery with the async listing the API serves, as clients
+browsing it do, against writer threads that insert and update photos in
+batches, as the Drive sync does. Reports throughput and read latency for
+plain engines (rollback journal, default settings) and for the tuned
+engines from ``create_db_engine`` and ``create_async_db_engine`` (WAL with
+pragmas, separate read-only engine).
+
+Usage (from the shutterspot_api directory):
+    python -m benchmarks.db_load_bench --readers 8 --writers 2 --seconds 10
+"""
+import argparse
+import asyncio
+import os
+import statistics
+import tempfile
+import threading
+import time
+from datetime import datetime, timedelta
+
+from sqlalchemy import create_engine, select, update
+from sqlalchemy.exc import OperationalError
+from sqlalchemy.ext.asyncio import AsyncEngine, async_sessionmaker, create_async_engine
+from sqlalchemy.orm import sessionmaker
+
+from app.database.database import create_async_db_engine, create_db_engine
+from app.database.models import Base, Gallery, Photo
+from app.services.photo_pages import SORT_CAPTURED, list_gallery_page_async
+
+
+def seed(engine, photos: int) -> None:
+    """Create the schema and a gallery with ``photos`` photos."""
+    Base.metadata.create_all(bind=engine)
+    start = datetime(2024, 6, 1, 14, 0)
+    with sessionmaker(bind=engine)() as db:
+        gallery = Gallery(title="Load test", status="Active")
+        db.add(gallery)
+        db.flush()
+        db.execute(Photo.__table__.insert(), [
+            {
+                'gallery_id': gallery.id,
+                'filename': f'IMG_{i:05d}.jpg',
+                'drive_file_id': f'file-{i}',
+                'captured_at': start + timedelta(seconds=i),
+                'camera_model': 'X-T5',
+            }
+            for i in range(photos)
+        ])
+        db.commit()
+
+
+def run(write_engine, read_engine: AsyncEngine, readers: int, writers: int, seconds: float, batch: int) -> dict:
+    """
+    Run readers and writers for ``seconds`` and collect their results.
+
+    The readers share an event loop in one thread, as requests do in an API
+    worker; ``read_engine`` is disposed when they finish.
+    """
+    WriteSession = sessionmaker(bind=write_engine)
+    ReadSession = async_sessionmaker(read_engine, expire_on_commit=False)
+    stop = threading.Event()
+    lock = threading.Lock()
+    results = {'reads': 0, 'writes': 0, 'errors': 0, 'latencies': []}
+
+    async def reader() -> None:
+        latencies, reads, errors = [], 0, 0
+        while not stop.is_set():
+            cursor = None
+            started = time.perf_counter()
+            try:
+                async with ReadSession() as db:
+                    # Browse the first few pages by capture time
+                    for _ in range(3):
+                        statement = select(Photo).where(Photo.gallery_id == 1)
+                        _, cursor = await list_gallery_page_async(
+                            db, statement, sort=SORT_CAPTURED, cursor=cursor, limit=100
+                        )
+                reads += 1
+                latencies.append(time.perf_counter() - started)
+            except OperationalError:
+                errors += 1
+        with lock:
+            results['reads'] += reads
+            results['errors'] += errors
+            results['latencies'].extend(latencies)
+
+    async def read() -> None:
+        try:
+            await asyncio.gather(*(reader() for _ in range(readers)))
+        finally:
+            await read_engine.dispose()
+
+    def writer(number: int) -> None:
+        writes, errors, sequence = 0, 0, 0
+        while not stop.is_set():
+            try:
+                with WriteSession() as db:
+                    db.execute(Photo.__table__.insert(), [
+                        {
+                            'gallery_id': 1,
+                            'filename': f'SYNC_{number}_{sequence + i}.jpg',
+                            'drive_file_id': f'sync-{number}-{sequence + i}',
+                            'captured_at': datetime(2024, 6, 2) + timedelta(seconds=sequence + i),
+                        }
+                        for i in range(batch)
+                    ])
+                    db.execute(
+                        update(Photo)
+                        .where(Photo.id.in_(range(1 + sequence % 1000, 1 + sequence % 1000 + batch)))
+                        .values(drive_modified=datetime.utcnow().isoformat())
+                    )
+                    db.commit()
+                writes += 1
+                sequence += batch
+            except OperationalError:
+                errors += 1
+        with lock:
+            results['writes'] += writes
+            results['errors'] += errors
+
+    threads = [threading.Thread(target=asyncio.run, args=(read(),))]
+    threads += [threading.Thread(target=writer, args=(number,)) for number in range(writers)]
+    for thread in threads:
+        thread.start()
+    time.sleep(seconds)
+    stop.set()
+    for thread in threads:
+        thread.join()
+    return results
+
+
+def report(name: str, results: dict, seconds: float) -> None:
+    latencies = sorted(results['latencies'])
+    p50 = statistics.median(latencies) * 1000 if latencies else float('nan')
+    p95 = latencies[int(len(latencies) * 0.95)] * 1000 if latencies else float('nan')
+    print(
+        f"{name:>8} {results['reads'] / seconds:>10.1f} {results['writes'] / seconds:>10.1f}"
+        f" {p50:>9.1f} {p95:>9.1f} {results['errors']:>7}"
+    )
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--photos', type=int, default=5000, help="Photos in the seeded gallery")
+    parser.add_argument('--readers', type=int, default=8)
+    parser.add_argument('--writers', type=int, default=2)
+    parser.add_argument('--batch', type=int, default=50, help="Photos written per sync batch")
+    parser.add_argument('--seconds', type=float, default=10.0)
+    args = parser.parse_args()
+
+    print(f"{args.photos} photos, {args.readers} readers, {args.writers} writers, {args.seconds:.0f} s each")
+    print(f"{'engine':>8} {'reads/s':>10} {'writes/s':>10} {'p50 ms':>9} {'p95 ms':>9} {'errors':>7}")
+
+    with tempfile.TemporaryDirectory() as directory:
+        path = os.path.join(directory, 'plain.db')
+        write_engine = create_engine(f"sqlite:///{path}", connect_args={"check_same_thread": False})
+        read_engine = create_async_engine(f"sqlite+aiosqlite:///{path}")
+        seed(write_engine, args.photos)
+        report("plain", run(write_engine, read_engine, args.readers, args.writers, args.seconds, args.batch), args.seconds)
+        write_engine.dispose()
+
+        url = f"sqlite:///{os.path.join(directory, 'tuned.db')}"
+        write_engine = create_db_engine(url)
+        read_engine = create_async_db_engine(url, read_only=True)
+        seed(write_engine, args.photos)
+        report("tuned", run(write_engine, read_engine, args.readers, args.writers, args.seconds, args.batch), args.seconds)
+        write_engine.dispose()
+
+
+if __name__ == '__main__':
+    main()
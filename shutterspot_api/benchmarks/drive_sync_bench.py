@@ -0,0 +1,81 @@
+"""
+Benchmark for the concurrent Drive sync engine.
+
+Runs the derivative pipeline against a local fake Drive that serves
+in-memory JPEGs with simulated network latency, and reports how throughput
+scales with the size of the download pool.
+
+Usage (from the shutterspot_api directory):
+    python -m benchmarks.drive_sync_bench --files 200 --latency 0.05
+"""
+import argparse
+import io
+import time
+
+from PIL import Image
+
+from app.services.drive_sync import DriveSyncEngine
+
+
+class FakeDrive:
+    """Stand-in for GoogleDriveService that serves a fixed image with latency."""
+
+    def __init__(self, latency: float, width: int, height: int):
+        self.latency = latency
+        image = Image.linear_gradient('L').resize((width, height)).convert('RGB')
+        buffer = io.BytesIO()
+        image.save(buffer, format='JPEG', quality=90)
+        self.payload = buffer.getvalue()
+
+    def download_to(self, user_id: int, file_id: str, fileobj) -> None:
+        time.sleep(self.latency)
+        fileobj.write(self.payload)
+
+    def download_thumbnail_link(self, user_id: int, link: str, size: tuple):
+        return None
+
+
+def run(drive: FakeDrive, files: int, io_workers: int, cpu_workers: int, per_user_limit: int) -> float:
+    """Sync ``files`` fake images and return the throughput in files per second."""
+    engine = DriveSyncEngine(
+        drive,
+        io_workers=io_workers,
+        cpu_workers=cpu_workers,
+        per_user_limit=per_user_limit,
+    )
+    images = ({'id': f'file-{i}', 'name': f'IMG_{i:04d}.jpg'} for i in range(files))
+    try:
+        # Warm up the pools so process start-up is not measured
+        list(engine.fetch_derivatives(1, [{'id': 'warmup'}]))
+        start = time.perf_counter()
+        errors = sum(1 for _, _, error in engine.fetch_derivatives(1, images) if error)
+        elapsed = time.perf_counter() - start
+    finally:
+        engine.shutdown()
+    if errors:
+        raise RuntimeError(f"{errors} files failed during the benchmark")
+    return files / elapsed
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--files', type=int, default=200)
+    parser.add_argument('--latency', type=float, default=0.05, help="Simulated download latency in seconds")
+    parser.add_argument('--width', type=int, default=4000)
+    parser.add_argument('--height', type=int, default=3000)
+    parser.add_argument('--cpu-workers', type=int, default=4)
+    args = parser.parse_args()
+
+    drive = FakeDrive(args.latency, args.width, args.height)
+    print(f"{args.files} files, {len(drive.payload) / 1024:.0f} KiB each, {args.latency * 1000:.0f} ms latency")
+    print(f"{'io_workers':>10} {'files/s':>10} {'speedup':>10}")
+
+    baseline = None
+    for io_workers in (1, 2, 4, 8, 16, 32):
+        throughput = run(drive, args.files, io_workers, args.cpu_workers, per_user_limit=io_workers)
+        baseline = baseline or throughput
+        print(f"{io_workers:>10} {throughput:>10.1f} {throughput / baseline:>9.1f}x")
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,112 @@
+"""
+Benchmark for peak memory while rendering a single thumbnail.
+
+Each strategy runs in a fresh interpreter so its peak RSS is measured in
+isolation:
+
+    baseline  download into BytesIO and fully decode (the original behaviour)
+    spooled   spool the download to disk and decode with JPEG draft mode
+
+Usage (from the shutterspot_api directory):
+    python -m benchmarks.thumbnail_memory_bench --width 7000 --height 5000
+"""
+import argparse
+import io
+import os
+import resource
+import subprocess
+import sys
+import tempfile
+
+from PIL import Image
+
+from app.services.drive_sync import (
+    SpooledDownload,
+    THUMBNAIL_SIZE,
+    cleanup_source,
+    render_thumbnail,
+)
+
+CHUNK_SIZE = 4 * 1024 * 1024
+
+
+def peak_rss_mb() -> float:
+    """
+    Peak resident set size of this process in MiB.
+
+    VmHWM is preferred because ru_maxrss survives exec on Linux and would
+    report the parent's peak.
+    """
+    try:
+        with open('/proc/self/status') as status:
+            for line in status:
+                if line.startswith('VmHWM:'):
+                    return int(line.split()[1]) / 1024
+    except OSError:
+        pass
+    return resource.getrusage(resource.RUSAGE_SELF).ru_maxrss / 1024
+
+
+def stream(path: str, fileobj) -> None:
+    """Copy a file in download-sized chunks, like MediaIoBaseDownload does."""
+    with open(path, 'rb') as original:
+        while chunk := original.read(CHUNK_SIZE):
+            fileobj.write(chunk)
+
+
+def run_baseline(path: str) -> None:
+    file = io.BytesIO()
+    stream(path, file)
+    file.seek(0)
+    image = Image.open(file)
+    image.load()
+    image.thumbnail(THUMBNAIL_SIZE)
+    image.save(io.BytesIO(), format=image.format or 'JPEG')
+
+
+def run_spooled(path: str) -> None:
+    spool = SpooledDownload()
+    stream(path, spool)
+    source = spool.source()
+    try:
+        render_thumbnail(source)
+    finally:
+        cleanup_source(source)
+
+
+STRATEGIES = {'baseline': run_baseline, 'spooled': run_spooled}
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--width', type=int, default=7000)
+    parser.add_argument('--height', type=int, default=5000)
+    parser.add_argument('--child', choices=STRATEGIES, help=argparse.SUPPRESS)
+    parser.add_argument('--path', help=argparse.SUPPRESS)
+    args = parser.parse_args()
+
+    if args.child:
+        before = peak_rss_mb()
+        STRATEGIES[args.child](args.path)
+        print(f"{before:.1f} {peak_rss_mb():.1f}")
+        return
+
+    fd, path = tempfile.mkstemp(suffix='.jpg')
+    os.close(fd)
+    try:
+        Image.effect_noise((args.width, args.height), 64).convert('RGB').save(path, format='JPEG', quality=95)
+        print(f"{args.width}x{args.height} JPEG, {os.path.getsize(path) / 1024 / 1024:.1f} MiB on disk")
+        print(f"{'strategy':>10} {'start MiB':>10} {'peak MiB':>10} {'delta MiB':>10}")
+        for name in STRATEGIES:
+            output = subprocess.run(
+                [sys.executable, '-m', 'benchmarks.thumbnail_memory_bench', '--child', name, '--path', path],
+                check=True, capture_output=True, text=True
+            ).stdout
+            before, peak = map(float, output.split())
+            print(f"{name:>10} {before:>10.1f} {peak:>10.1f} {peak - before:>10.1f}")
+    finally:
+        os.unlink(path)
+
+
+if __name__ == '__main__':
+    main()
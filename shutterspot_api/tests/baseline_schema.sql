@@ -0,0 +1,235 @@
+-- The schema Base.metadata.create_all created on SQLite before migrations were
+-- introduced, i.e. what databases of existing deployments look like.
+
+CREATE TABLE users (
+	id INTEGER NOT NULL, 
+	username VARCHAR, 
+	email VARCHAR, 
+	hashed_password VARCHAR, 
+	name VARCHAR, 
+	role VARCHAR, 
+	settings JSON, 
+	created_at DATETIME DEFAULT (CURRENT_TIMESTAMP), 
+	updated_at DATETIME DEFAULT (CURRENT_TIMESTAMP), 
+	PRIMARY KEY (id)
+);
+
+CREATE UNIQUE INDEX ix_users_username ON users (username);
+
+CREATE UNIQUE INDEX ix_users_email ON users (email);
+
+CREATE INDEX ix_users_id ON users (id);
+
+CREATE TABLE clients (
+	id INTEGER NOT NULL, 
+	name VARCHAR, 
+	email VARCHAR, 
+	phone VARCHAR, 
+	address VARCHAR, 
+	notes TEXT, 
+	created_at DATETIME DEFAULT (CURRENT_TIMESTAMP), 
+	updated_at DATETIME DEFAULT (CURRENT_TIMESTAMP), 
+	PRIMARY KEY (id)
+);
+
+CREATE INDEX ix_clients_name ON clients (name);
+
+CREATE UNIQUE INDEX ix_clients_email ON clients (email);
+
+CREATE INDEX ix_clients_id ON clients (id);
+
+CREATE TABLE email_templates (
+	id INTEGER NOT NULL, 
+	name VARCHAR, 
+	subject VARCHAR, 
+	body TEXT, 
+	category VARCHAR, 
+	content TEXT, 
+	created_at DATETIME DEFAULT (CURRENT_TIMESTAMP), 
+	updated_at DATETIME DEFAULT (CURRENT_TIMESTAMP), 
+	PRIMARY KEY (id)
+);
+
+CREATE INDEX ix_email_templates_name ON email_templates (name);
+
+CREATE INDEX ix_email_templates_category ON email_templates (category);
+
+CREATE INDEX ix_email_templates_id ON email_templates (id);
+
+CREATE TABLE workflows (
+	id INTEGER NOT NULL, 
+	name VARCHAR, 
+	triggers JSON, 
+	actions JSON, 
+	is_active BOOLEAN, 
+	created_at DATETIME DEFAULT (CURRENT_TIMESTAMP), 
+	updated_at DATETIME DEFAULT (CURRENT_TIMESTAMP), 
+	PRIMARY KEY (id)
+);
+
+CREATE INDEX ix_workflows_id ON workflows (id);
+
+CREATE INDEX ix_workflows_name ON workflows (name);
+
+CREATE TABLE shoots (
+	id INTEGER NOT NULL, 
+	client_id INTEGER, 
+	title VARCHAR, 
+	date DATE, 
+	start_time VARCHAR, 
+	end_time VARCHAR, 
+	location VARCHAR, 
+	type VARCHAR, 
+	package VARCHAR, 
+	status VARCHAR, 
+	notes TEXT, 
+	created_at DATETIME DEFAULT (CURRENT_TIMESTAMP), 
+	updated_at DATETIME DEFAULT (CURRENT_TIMESTAMP), 
+	PRIMARY KEY (id), 
+	FOREIGN KEY(client_id) REFERENCES clients (id)
+);
+
+CREATE INDEX ix_shoots_id ON shoots (id);
+
+CREATE INDEX ix_shoots_title ON shoots (title);
+
+CREATE TABLE proposals (
+	id INTEGER NOT NULL, 
+	client_id INTEGER, 
+	title VARCHAR, 
+	packages JSON, 
+	valid_until DATE, 
+	amount FLOAT, 
+	status VARCHAR, 
+	message TEXT, 
+	expiry_date DATE, 
+	created_at DATETIME DEFAULT (CURRENT_TIMESTAMP), 
+	updated_at DATETIME DEFAULT (CURRENT_TIMESTAMP), 
+	PRIMARY KEY (id), 
+	FOREIGN KEY(client_id) REFERENCES clients (id)
+);
+
+CREATE INDEX ix_proposals_title ON proposals (title);
+
+CREATE INDEX ix_proposals_id ON proposals (id);
+
+CREATE TABLE tasks (
+	id INTEGER NOT NULL, 
+	title VARCHAR, 
+	description TEXT, 
+	due_date DATE, 
+	priority VARCHAR, 
+	status VARCHAR, 
+	assigned_to INTEGER, 
+	created_at DATETIME DEFAULT (CURRENT_TIMESTAMP), 
+	updated_at DATETIME DEFAULT (CURRENT_TIMESTAMP), 
+	PRIMARY KEY (id), 
+	FOREIGN KEY(assigned_to) REFERENCES users (id)
+);
+
+CREATE INDEX ix_tasks_title ON tasks (title);
+
+CREATE INDEX ix_tasks_id ON tasks (id);
+
+CREATE TABLE activities (
+	id INTEGER NOT NULL, 
+	type VARCHAR, 
+	description TEXT, 
+	timestamp DATETIME DEFAULT (CURRENT_TIMESTAMP), 
+	user_id INTEGER, 
+	entity_id INTEGER, 
+	entity_type VARCHAR, 
+	PRIMARY KEY (id), 
+	FOREIGN KEY(user_id) REFERENCES users (id)
+);
+
+CREATE INDEX ix_activities_id ON activities (id);
+
+CREATE INDEX ix_activities_type ON activities (type);
+
+CREATE TABLE invoices (
+	id INTEGER NOT NULL, 
+	client_id INTEGER, 
+	shoot_id INTEGER, 
+	invoice_number VARCHAR, 
+	items JSON, 
+	subtotal VARCHAR, 
+	tax VARCHAR, 
+	total VARCHAR, 
+	due_date DATE, 
+	amount FLOAT, 
+	status VARCHAR, 
+	created_at DATETIME DEFAULT (CURRENT_TIMESTAMP), 
+	updated_at DATETIME DEFAULT (CURRENT_TIMESTAMP), 
+	PRIMARY KEY (id), 
+	FOREIGN KEY(client_id) REFERENCES clients (id), 
+	FOREIGN KEY(shoot_id) REFERENCES shoots (id)
+);
+
+CREATE INDEX ix_invoices_id ON invoices (id);
+
+CREATE UNIQUE INDEX ix_invoices_invoice_number ON invoices (invoice_number);
+
+CREATE TABLE galleries (
+	id INTEGER NOT NULL, 
+	client_id INTEGER, 
+	shoot_id INTEGER, 
+	title VARCHAR, 
+	description TEXT, 
+	password VARCHAR, 
+	expiry_date DATE, 
+	images JSON, 
+	status VARCHAR, 
+	created_at DATETIME DEFAULT (CURRENT_TIMESTAMP), 
+	updated_at DATETIME DEFAULT (CURRENT_TIMESTAMP), 
+	PRIMARY KEY (id), 
+	FOREIGN KEY(client_id) REFERENCES clients (id), 
+	FOREIGN KEY(shoot_id) REFERENCES shoots (id)
+);
+
+CREATE INDEX ix_galleries_title ON galleries (title);
+
+CREATE INDEX ix_galleries_id ON galleries (id);
+
+CREATE TABLE photos (
+	id INTEGER NOT NULL, 
+	gallery_id INTEGER, 
+	filename VARCHAR NOT NULL, 
+	drive_file_id VARCHAR, 
+	drive_modified VARCHAR, 
+	thumbnail BLOB, 
+	url VARCHAR, 
+	favorites_count INTEGER, 
+	created_at DATETIME DEFAULT (CURRENT_TIMESTAMP), 
+	updated_at DATETIME DEFAULT (CURRENT_TIMESTAMP), 
+	PRIMARY KEY (id), 
+	FOREIGN KEY(gallery_id) REFERENCES galleries (id)
+);
+
+CREATE INDEX ix_photos_id ON photos (id);
+
+CREATE TABLE drive_connections (
+	id INTEGER NOT NULL, 
+	user_id INTEGER, 
+	gallery_id INTEGER, 
+	drive_folder_id VARCHAR NOT NULL, 
+	drive_folder_name VARCHAR, 
+	auto_sync BOOLEAN, 
+	last_synced DATETIME, 
+	created_at DATETIME DEFAULT (CURRENT_TIMESTAMP), 
+	updated_at DATETIME DEFAULT (CURRENT_TIMESTAMP), 
+	PRIMARY KEY (id), 
+	FOREIGN KEY(user_id) REFERENCES users (id), 
+	FOREIGN KEY(gallery_id) REFERENCES galleries (id)
+);
+
+CREATE INDEX ix_drive_connections_id ON drive_connections (id);
+
+CREATE TABLE photo_favorites (
+	photo_id INTEGER NOT NULL, 
+	user_id INTEGER NOT NULL, 
+	created_at DATETIME DEFAULT (CURRENT_TIMESTAMP), 
+	PRIMARY KEY (photo_id, user_id), 
+	FOREIGN KEY(photo_id) REFERENCES photos (id), 
+	FOREIGN KEY(user_id) REFERENCES users (id)
+);
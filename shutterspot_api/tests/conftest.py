@@ -0,0 +1,109 @@
+"""
+Shared fixtures for the API tests.
+
+Run from the shutterspot_api directory:
+    python -m pytest tests
+
+The app runs against a scratch SQLite database built with the migrations,
+and blobs are stored in a scratch directory. Both are set up before the app
+is imported, so every engine and session points at them.
+"""
+import os
+import shutil
+import tempfile
+
+TEST_ROOT = tempfile.mkdtemp(prefix="shutterspot-tests-")
+os.environ["DATABASE_URL"] = f"sqlite:///{os.path.join(TEST_ROOT, 'test.db')}"
+os.environ.pop("DATABASE_READ_URL", None)
+
+import pytest
+from fastapi.testclient import TestClient
+
+from app.auth.auth import get_current_user, get_optional_user
+from app.database.database import SessionLocal, engine
+from app.database.migrate import migrate
+from app.database.models import Gallery, GalleryFavoriteSelection, Photo, User, photo_favorites
+from app.main import app
+from app.services.blob_store import blob_store
+from app.services.gallery_access import gallery_acls
+
+pytest_plugins = ["app.testing.query_budget"]
+
+# Photos in the seeded gallery; more than a page, so listings are full pages
+GALLERY_PHOTOS = 60
+
+blob_store.root = os.path.join(TEST_ROOT, "blobs")
+
+
+@pytest.fixture(scope="session", autouse=True)
+def database():
+    """Migrate the scratch database and remove it after the run."""
+    with engine.begin() as connection:
+        migrate(connection)
+    yield
+    engine.dispose()
+    shutil.rmtree(TEST_ROOT, ignore_errors=True)
+
+
+@pytest.fixture
+def db():
+    """A session on the scratch database."""
+    with SessionLocal() as session:
+        yield session
+
+
+@pytest.fixture
+def user(db):
+    """A signed-in, non-admin user."""
+    user = User(username="client", email="client@example.com", name="Client", role="user")
+    db.add(user)
+    db.commit()
+    # Detached and loaded, so reading it in a request runs no queries
+    db.refresh(user)
+    db.expunge(user)
+    yield user
+    db.query(User).filter(User.id == user.id).delete()
+    db.commit()
+
+
+@pytest.fixture
+def gallery(db, user):
+    """An active gallery owned by ``user``, with photos that have thumbnails."""
+    digest = blob_store.write(b"thumbnail")
+    gallery = Gallery(client_id=user.id, title="Wedding", status="Active")
+    db.add(gallery)
+    db.flush()
+    db.add_all(
+        Photo(gallery_id=gallery.id, filename=f"IMG_{i:04}.jpg", thumbnail_hash=digest, favorites_count=0)
+        for i in range(GALLERY_PHOTOS)
+    )
+    db.commit()
+    yield gallery
+    photo_ids = db.query(Photo.id).filter(Photo.gallery_id == gallery.id)
+    db.execute(photo_favorites.delete().where(photo_favorites.c.photo_id.in_(photo_ids.scalar_subquery())))
+    db.query(GalleryFavoriteSelection).filter(GalleryFavoriteSelection.gallery_id == gallery.id).delete()
+    db.query(Photo).filter(Photo.gallery_id == gallery.id).delete()
+    db.delete(gallery)
+    db.commit()
+
+
+@pytest.fixture
+def photo(db, gallery):
+    """The first photo of ``gallery``."""
+    return db.query(Photo).filter(Photo.gallery_id == gallery.id).order_by(Photo.id).first()
+
+
+@pytest.fixture
+def client(user):
+    """
+    TestClient signed in as ``user``.
+
+    The client is not used as a context manager, so the sync workers and
+    scheduler started at startup do not run during tests.
+    """
+    app.dependency_overrides[get_current_user] = lambda: user
+    app.dependency_overrides[get_optional_user] = lambda: user
+    # Start every test with a cold access cache, so budgets cover the access check
+    gallery_acls.clear()
+    yield TestClient(app)
+    app.dependency_overrides.clear()
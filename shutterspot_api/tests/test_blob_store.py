@@ -0,0 +1,36 @@
+"""
+Garbage collection of unreferenced blobs.
+"""
+import os
+
+from app.database.models import Blob
+from app.services import blob_store as blob_store_module
+from app.services.blob_store import blob_store
+
+
+def test_collect_garbage_keeps_blobs_referenced_again(db, monkeypatch):
+    unused = blob_store.write(b"unused")
+    reused = blob_store.write(b"reused")
+    blob_store.add_refs(db, [(unused, 6), (reused, 6)])
+    blob_store.release(db, [unused, reused])
+    db.commit()
+
+    # The blob is referenced again after the collector selected it
+    getmtime = os.path.getmtime
+
+    def reference_reused(path):
+        if path == blob_store.path(reused):
+            blob_store.add_refs(db, [(reused, 6)])
+        return getmtime(path)
+
+    monkeypatch.setattr(blob_store_module.os.path, "getmtime", reference_reused)
+
+    removed = blob_store.collect_garbage(db, grace_period=-1)
+
+    assert unused in removed and reused not in removed
+    assert not os.path.exists(blob_store.path(unused))
+    assert blob_store.read(reused) == b"reused"
+    assert db.get(Blob, reused).ref_count == 1
+
+    db.query(Blob).filter(Blob.hash == reused).delete()
+    db.commit()
@@ -0,0 +1,136 @@
+"""
+Drive folder syncs: galleries with several connections, and the sync
+engine's render pool.
+
+Drive is replaced by an in-memory set of folders; downloads return a small
+JPEG, which is rendered in the calling thread unless a test starts the
+render pool.
+"""
+import io
+from concurrent.futures.process import BrokenProcessPool
+
+import pytest
+from PIL import Image
+
+from app.database.models import DriveConnection, Photo, photo_favorites
+from app.services import google_drive
+from app.services.google_drive import GoogleDriveService, SyncInterrupted
+
+
+def _jpeg() -> bytes:
+    buffer = io.BytesIO()
+    Image.new("RGB", (64, 48), "red").save(buffer, "JPEG")
+    return buffer.getvalue()
+
+
+class FakeDrive(GoogleDriveService):
+    """GoogleDriveService over in-memory folders of file ID -> modified time."""
+
+    def __init__(self, folders):
+        super().__init__()
+        self.folders = folders
+        self.sync_engine.cpu_workers = 0
+
+    def get_start_page_token(self, user_id):
+        return "start"
+
+    def iter_tree_image_pages(self, user_id, folder_ids, fields=None, page_size=None, position=None):
+        yield [
+            {"id": file_id, "name": f"{file_id}.jpg", "modifiedTime": modified, "parents": [folder_id]}
+            for folder_id in folder_ids
+            for file_id, modified in self.folders[folder_id].items()
+        ], None
+
+    def download_to(self, user_id, file_id, fileobj):
+        fileobj.write(_jpeg())
+
+
+@pytest.fixture
+def drive(db, user, gallery):
+    """A FakeDrive with two folders, each connected to ``gallery``."""
+    drive = FakeDrive({"ceremony": {"c1": "1", "c2": "1"}, "reception": {"r1": "1"}})
+    connections = [
+        DriveConnection(user_id=user.id, gallery_id=gallery.id, drive_folder_id=folder_id, auto_sync=False)
+        for folder_id in drive.folders
+    ]
+    db.add_all(connections)
+    db.commit()
+    drive.connections = {connection.drive_folder_id: connection.id for connection in connections}
+    yield drive
+    drive._delete_photos(db, [photo_id for photo_id, in db.query(Photo.id).filter(
+        Photo.gallery_id == gallery.id,
+        Photo.drive_file_id != None
+    )])
+    db.query(DriveConnection).filter(DriveConnection.id.in_(drive.connections.values())).delete()
+    db.commit()
+    drive.sync_engine.shutdown()
+
+
+def _drive_files(db, gallery):
+    return dict(db.query(Photo.drive_file_id, Photo.id).filter(
+        Photo.gallery_id == gallery.id,
+        Photo.drive_file_id != None
+    ))
+
+
+def test_full_sync_keeps_other_connections_photos(db, user, gallery, drive):
+    drive.sync_drive_folder(db, drive.connections["ceremony"])
+    drive.sync_drive_folder(db, drive.connections["reception"])
+    photos = _drive_files(db, gallery)
+    assert set(photos) == {"c1", "c2", "r1"}
+    db.execute(photo_favorites.insert().values(photo_id=photos["r1"], user_id=user.id))
+    db.commit()
+
+    del drive.folders["ceremony"]["c2"]
+    result = drive.sync_drive_folder(db, drive.connections["ceremony"], full_rescan=True)
+
+    assert result.removed_ids == [photos["c2"]]
+    assert _drive_files(db, gallery) == {"c1": photos["c1"], "r1": photos["r1"]}
+    assert db.query(photo_favorites).filter(photo_favorites.c.photo_id == photos["r1"]).count() == 1
+
+
+def test_file_in_two_connections_is_synced_once(db, gallery, drive):
+    drive.folders["reception"]["c1"] = "1"
+    drive.sync_drive_folder(db, drive.connections["ceremony"])
+    photos = _drive_files(db, gallery)
+
+    result = drive.sync_drive_folder(db, drive.connections["reception"])
+    drive.folders["reception"]["c1"] = "2"
+    drive.sync_drive_folder(db, drive.connections["reception"], full_rescan=True)
+
+    assert result.photo_ids == [_drive_files(db, gallery)["r1"]]
+    assert db.query(Photo.connection_id, Photo.drive_modified).filter(Photo.id == photos["c1"]).one() == (
+        drive.connections["ceremony"], "1"
+    )
+
+
+def test_resumed_sync_keeps_other_connections_photos(db, gallery, drive, monkeypatch):
+    drive.sync_drive_folder(db, drive.connections["reception"])
+    monkeypatch.setattr(google_drive, "CHECKPOINT_INTERVAL", 1)
+    with pytest.raises(SyncInterrupted):
+        drive.sync_drive_folder(db, drive.connections["ceremony"], should_stop=lambda: True)
+
+    result = drive.sync_drive_folder(db, drive.connections["ceremony"])
+
+    assert result.removed_ids == []
+    assert set(_drive_files(db, gallery)) == {"c1", "c2", "r1"}
+
+
+def test_render_pool_is_replaced_after_a_worker_dies():
+    drive = FakeDrive({})
+    engine = drive.sync_engine
+    engine.cpu_workers = 1
+    try:
+        _, broken = engine._pools()
+        broken.submit(int).result()
+        for process in list(broken._processes.values()):
+            process.kill()
+        with pytest.raises(BrokenProcessPool):
+            broken.submit(int).result()
+
+        results = list(engine.fetch_derivatives(1, [{"id": "f1"}, {"id": "f2"}]))
+
+        assert [error for _, _, error in results] == [None, None]
+        assert engine._cpu_pool is not broken
+    finally:
+        engine.shutdown()
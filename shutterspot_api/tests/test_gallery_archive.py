@@ -0,0 +1,45 @@
+"""
+ZIP downloads of galleries whose photos come from several Drive connections.
+"""
+from app.database.models import DriveConnection, Photo, User
+from app.services.gallery_archive import build_gallery_archive, open_originals
+
+
+class RecordingDrive:
+    """Drive stand-in that records whose credentials fetched each original."""
+
+    def __init__(self):
+        self.downloads = []
+
+    def download_to(self, user_id, file_id, fileobj):
+        self.downloads.append((user_id, file_id))
+        fileobj.write(b"original")
+
+
+def test_originals_are_fetched_with_their_connections_credentials(db, user, gallery):
+    second = User(username="assistant", email="assistant@example.com", name="Assistant", role="admin")
+    db.add(second)
+    db.flush()
+    ceremony = DriveConnection(user_id=user.id, gallery_id=gallery.id, drive_folder_id="ceremony")
+    reception = DriveConnection(user_id=second.id, gallery_id=gallery.id, drive_folder_id="reception")
+    db.add_all([ceremony, reception])
+    db.flush()
+    db.add_all([
+        Photo(gallery_id=gallery.id, connection_id=ceremony.id, filename="c1.jpg", drive_file_id="c1", original_size=8),
+        Photo(gallery_id=gallery.id, connection_id=reception.id, filename="r1.jpg", drive_file_id="r1", original_size=8),
+        Photo(gallery_id=gallery.id, filename="legacy.jpg", drive_file_id="l1", original_size=8),
+    ])
+    db.commit()
+
+    try:
+        drive = RecordingDrive()
+        archive = build_gallery_archive(db, drive, gallery.id)
+        for _, chunks in open_originals(drive, archive)(list(range(len(archive.layout.entries)))):
+            list(chunks)
+
+        assert sorted(drive.downloads) == sorted([(user.id, "c1"), (second.id, "r1"), (user.id, "l1")])
+    finally:
+        db.query(Photo).filter(Photo.gallery_id == gallery.id, Photo.drive_file_id != None).delete()
+        db.query(DriveConnection).filter(DriveConnection.gallery_id == gallery.id).delete()
+        db.delete(second)
+        db.commit()
@@ -0,0 +1,77 @@
+"""
+Migrations bring databases of every age to the schema the models define.
+"""
+import hashlib
+import os
+
+import pytest
+from alembic.autogenerate import compare_metadata
+from alembic.runtime.migration import MigrationContext
+from sqlalchemy import text
+
+from app.database.database import create_db_engine
+from app.database.migrate import migrate
+from app.database.models import Base
+from app.services.blob_store import blob_store
+
+BASELINE_SCHEMA = os.path.join(os.path.dirname(__file__), "baseline_schema.sql")
+THUMBNAIL = b"stored thumbnail"
+
+
+@pytest.fixture
+def scratch_engine(tmp_path):
+    engine = create_db_engine(f"sqlite:///{tmp_path / 'scratch.db'}")
+    yield engine
+    engine.dispose()
+
+
+def create_baseline_database(engine) -> None:
+    """Create the pre-migration schema with a gallery, a thumbnail and a favorite."""
+    with open(BASELINE_SCHEMA) as schema:
+        with engine.connect() as connection:
+            connection.connection.driver_connection.executescript(schema.read())
+    with engine.begin() as connection:
+        connection.execute(text("INSERT INTO users (id, username, email) VALUES (1, 'client', 'client@example.com')"))
+        connection.execute(text("INSERT INTO galleries (id, title, status) VALUES (1, 'Wedding', 'Active')"))
+        connection.execute(
+            text("INSERT INTO photos (id, gallery_id, filename, thumbnail, favorites_count) VALUES (1, 1, 'a.jpg', :thumb, 1)"),
+            {"thumb": THUMBNAIL}
+        )
+        connection.execute(text("INSERT INTO photo_favorites (photo_id, user_id) VALUES (1, 1)"))
+
+
+def schema_differences(connection):
+    return compare_metadata(MigrationContext.configure(connection), Base.metadata)
+
+
+def test_migrate_empty_database(scratch_engine):
+    with scratch_engine.begin() as connection:
+        migrate(connection)
+        assert schema_differences(connection) == []
+
+
+def test_migrate_pre_migration_database(scratch_engine):
+    create_baseline_database(scratch_engine)
+    with scratch_engine.begin() as connection:
+        migrate(connection)
+        assert schema_differences(connection) == []
+
+        # The stored thumbnail moved to the blob store
+        digest = hashlib.sha256(THUMBNAIL).hexdigest()
+        assert connection.execute(text("SELECT thumbnail_hash, thumbnail_size FROM photos")).one() == (digest, len(THUMBNAIL))
+        assert connection.execute(text("SELECT hash, ref_count FROM blobs")).all() == [(digest, 1)]
+        assert blob_store.read(digest) == THUMBNAIL
+
+        # The favorite rollup was built from the existing favorites
+        assert connection.execute(
+            text("SELECT gallery_id, user_id, selected_count FROM gallery_favorite_selections")
+        ).all() == [(1, 1, 1)]
+
+
+def test_migrate_refuses_unknown_schema(scratch_engine):
+    create_baseline_database(scratch_engine)
+    with scratch_engine.begin() as connection:
+        connection.execute(text("DROP TABLE invoices"))
+    with scratch_engine.begin() as connection:
+        with pytest.raises(RuntimeError, match="invoices"):
+            migrate(connection)
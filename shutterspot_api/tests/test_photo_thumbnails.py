@@ -0,0 +1,23 @@
+"""
+Caching of the thumbnail route.
+"""
+
+
+def test_versioned_url_is_immutable(client, photo):
+    response = client.get(f"/api/photos/{photo.id}/thumbnail", params={"v": photo.thumbnail_hash[:16]})
+    assert response.status_code == 200
+    assert response.headers["Cache-Control"] == "public, max-age=31536000, immutable"
+    assert response.headers["ETag"] == f'"{photo.thumbnail_hash}"'
+
+
+def test_outdated_or_unversioned_url_is_revalidated(client, photo):
+    for params in ({}, {"v": "0" * 16}):
+        response = client.get(f"/api/photos/{photo.id}/thumbnail", params=params)
+        assert response.status_code == 200
+        assert response.headers["Cache-Control"] == "public, no-cache"
+        assert response.headers["ETag"] == f'"{photo.thumbnail_hash}"'
+
+
+def test_unknown_variant(client, photo):
+    response = client.get(f"/api/photos/{photo.id}/thumbnail", params={"variant": "poster"})
+    assert response.status_code == 422
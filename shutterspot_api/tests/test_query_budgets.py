@@ -0,0 +1,64 @@
+"""
+Query budgets for the hot photo endpoints.
+
+Each test fails with the full list of statements when an endpoint starts
+running more queries than it needs, e.g. after an N+1 regression.
+"""
+from app.database.models import photo_favorites
+
+
+def test_get_photo(client, photo, query_budget):
+    # The photo and its gallery's access rules in one query
+    response = query_budget(client, "GET", f"/api/photos/{photo.id}", 1)
+    assert response.status_code == 200
+    assert response.json()["id"] == photo.id
+
+
+def test_gallery_listing(client, gallery, query_budget):
+    # Access rules, the Drive connections the view is recorded on, and the page
+    response = query_budget(client, "GET", f"/api/photos/gallery/{gallery.id}", 3)
+    assert response.status_code == 200
+    assert len(response.json()["photos"]) > 1
+
+
+def test_gallery_listing_next_page(client, gallery, query_budget):
+    first = client.get(f"/api/photos/gallery/{gallery.id}", params={"limit": 10}).json()
+    # The cached access rules and the cooled-down view leave only the page
+    response = query_budget(
+        client, "GET", f"/api/photos/gallery/{gallery.id}", 1,
+        params={"limit": 10, "cursor": first["next_cursor"]}
+    )
+    assert response.status_code == 200
+    assert len(response.json()["photos"]) == 10
+
+
+def test_favorite_and_unfavorite(client, db, user, photo, query_budget):
+    # Insert, favorites count and the gallery rollup
+    response = query_budget(client, "POST", f"/api/photos/{photo.id}/favorite", 3)
+    assert response.status_code == 200
+    assert db.query(photo_favorites).filter_by(photo_id=photo.id, user_id=user.id).count() == 1
+
+    # Delete, favorites count, and the rollup updated then pruned of empty rows
+    response = query_budget(client, "DELETE", f"/api/photos/{photo.id}/favorite", 4)
+    assert response.status_code == 200
+    assert db.query(photo_favorites).filter_by(photo_id=photo.id, user_id=user.id).count() == 0
+
+
+def test_favorite_twice(client, photo, query_budget):
+    client.post(f"/api/photos/{photo.id}/favorite")
+    # Nothing inserted, so the existing favorite is looked up
+    response = query_budget(client, "POST", f"/api/photos/{photo.id}/favorite", 2)
+    assert response.status_code == 200
+
+
+def test_thumbnail(client, photo, query_budget):
+    # The photo with its access rules, then its derivatives
+    response = query_budget(client, "GET", f"/api/photos/{photo.id}/thumbnail", 2)
+    assert response.status_code == 200
+    assert response.content == b"thumbnail"
+
+    response = query_budget(
+        client, "GET", f"/api/photos/{photo.id}/thumbnail", 2,
+        headers={"If-None-Match": response.headers["ETag"]}
+    )
+    assert response.status_code == 304
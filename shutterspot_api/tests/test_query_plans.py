@@ -0,0 +1,80 @@
+"""
+The hot queries are served by indexes.
+
+Each query the app runs on a hot path is planned by SQLite against a
+database built with the migrations, so the indexes they create are the
+ones checked. A query that scans a whole table, or sorts its result in a
+temporary B-tree, fails.
+"""
+from datetime import date, datetime
+from typing import List
+
+import pytest
+from sqlalchemy import or_, select
+from sqlalchemy.engine import Connection
+
+from app.database.database import create_db_engine
+from app.database.migrate import migrate
+from app.database.models import DriveConnection, Photo, Proposal, Shoot, photo_favorites
+from app.services.gallery_access import _gallery_access_query, _photo_access_query
+from app.services.photo_pages import LIST_COLUMNS
+
+# Plan details that mean a query reads more than the rows it needs
+SLOW_PLANS = ("SCAN ", "USE TEMP B-TREE")
+
+HOT_QUERIES = {
+    "photo with gallery access": _photo_access_query(1),
+    "gallery access": _gallery_access_query(1),
+    "gallery page by id": select(*LIST_COLUMNS).where(
+        Photo.gallery_id == 1, Photo.id > 100
+    ).order_by(Photo.id).limit(101),
+    "gallery page by capture time": select(*LIST_COLUMNS).where(
+        Photo.gallery_id == 1, Photo.captured_at > datetime(2024, 6, 1)
+    ).order_by(Photo.captured_at, Photo.id).limit(101),
+    "most favorited photos": select(Photo.id, Photo.filename, Photo.favorites_count).where(
+        Photo.gallery_id == 1, Photo.favorites_count > 0
+    ).order_by(Photo.favorites_count.desc(), Photo.id.desc()).limit(20),
+    "sync match of Drive files": select(Photo.drive_file_id, Photo.id).where(
+        Photo.gallery_id == 1, Photo.drive_file_id != None
+    ),
+    "sync removal of unseen files": select(Photo.id).where(
+        Photo.connection_id == 1,
+        Photo.drive_file_id != None,
+        or_(Photo.sync_run == None, Photo.sync_run != "run-id")
+    ),
+    "Drive file lookup": select(Photo.id).where(
+        Photo.gallery_id == 1, Photo.drive_file_id == "file-id"
+    ),
+    "user favorites": select(Photo).join(
+        photo_favorites, Photo.id == photo_favorites.c.photo_id
+    ).where(photo_favorites.c.user_id == 1),
+    "client shoots": select(Shoot).where(Shoot.client_id == 1),
+    "upcoming shoots": select(Shoot).where(Shoot.date >= date(2024, 6, 1)).order_by(Shoot.date),
+    "client proposals": select(Proposal).where(Proposal.client_id == 1),
+    "gallery Drive connections": select(DriveConnection).where(
+        DriveConnection.gallery_id == 1, DriveConnection.auto_sync == True
+    ),
+}
+
+
+@pytest.fixture(scope="module")
+def migrated(tmp_path_factory):
+    """A connection to an empty database built with the migrations."""
+    engine = create_db_engine(f"sqlite:///{tmp_path_factory.mktemp('plans') / 'plans.db'}")
+    with engine.begin() as connection:
+        migrate(connection)
+        yield connection
+    engine.dispose()
+
+
+def query_plan(connection: Connection, statement) -> List[str]:
+    """SQLite's plan for ``statement``, one line per step."""
+    compiled = statement.compile(dialect=connection.dialect, compile_kwargs={"literal_binds": True})
+    return [row[-1] for row in connection.exec_driver_sql(f"EXPLAIN QUERY PLAN {compiled}")]
+
+
+@pytest.mark.parametrize("name", HOT_QUERIES)
+def test_query_uses_indexes(migrated, name):
+    plan = query_plan(migrated, HOT_QUERIES[name])
+    slow = [step for step in plan if step.startswith(SLOW_PLANS)]
+    assert not slow, f"{name} is not served by indexes: {'; '.join(plan)}"
@@ -0,0 +1,30 @@
+"""
+Scheduling of due auto-sync connections.
+"""
+import pytest
+
+from app.database.models import DriveConnection
+from app.services.sync_scheduler import SyncScheduler
+
+
+class FailingQueue:
+    """Job queue whose enqueue fails before the job is committed."""
+
+    def enqueue(self, db, connection_id, user_id, full_rescan=False):
+        raise RuntimeError("database went away")
+
+
+def test_failed_enqueue_leaves_connection_due(db, user, gallery):
+    connection = DriveConnection(user_id=user.id, gallery_id=gallery.id, drive_folder_id="folder")
+    db.add(connection)
+    db.commit()
+
+    try:
+        with pytest.raises(RuntimeError):
+            SyncScheduler(FailingQueue()).tick(db)
+        db.rollback()
+
+        assert db.get(DriveConnection, connection.id).next_sync_at is None
+    finally:
+        db.delete(connection)
+        db.commit()